@@ -0,0 +1,87 @@
+import argparse
+import json
+import logging
+import sys
+from pkg.benchmark.suite import Benchmark, Suite
+
+"""
+    DONP benchmark suite, timing micro-benchmarks of the protocol building blocks and macro-benchmarks
+    of whole poll cycles with warm-up and repetition. Results are written as JSON and may be compared
+    against a stored baseline, exiting with a non-zero status when a benchmark regresses beyond the
+    configured threshold.
+
+        Copyright (c) 2025 Kathy Snell, All rights reserved.
+
+"""
+
+def parse_args(argv: list[str]):
+    """
+    Parses the benchmark command line.
+
+    Args:
+        argv (list[str]): The command line arguments.
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    Raises:
+        SystemExit: If the arguments are invalid.
+    """
+    parser = argparse.ArgumentParser(description="DONP benchmark suite")
+    parser.add_argument("--rtu", default="../modbusRtu.json", help="Modbus RTU protocol file")
+    parser.add_argument("--ascii", default="../modbusAscii.json", help="Modbus ASCII protocol file")
+    parser.add_argument("--output", default="benchmark.json", help="results file")
+    parser.add_argument("--baseline", help="baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown before failing")
+    parser.add_argument("--warmup", type=int, default=3, help="warm-up samples per benchmark")
+    parser.add_argument("--repeat", type=int, default=10, help="timed samples per micro-benchmark")
+    parser.add_argument("--macro-repeat", type=int, default=3, help="timed poll cycles per macro-benchmark")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10, 1000, 100000], help="macro-benchmark message counts")
+    parser.add_argument("--skip-micro", action="store_true", help="skip the micro-benchmarks")
+    parser.add_argument("--skip-macro", action="store_true", help="skip the macro-benchmarks")
+    return parser.parse_args(argv)
+
+def load(path: str):
+    """
+    Loads a JSON file.
+
+    Args:
+        path (str): The file path.
+    Returns:
+        dict: The parsed JSON document.
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def main(argv: list[str]):
+    """
+    Runs the benchmark suite and gates on the baseline, if given.
+
+    Args:
+        argv (list[str]): The command line arguments.
+    Returns:
+        int: The exit status, 1 if a regression was detected, 0 otherwise.
+    Raises:
+        None
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    logger = logging.getLogger("benchmark")
+    logger.setLevel(logging.INFO)
+    benchmark = Benchmark(logger, warmup=args.warmup, repeat=args.repeat)
+    suite = Suite(benchmark, load(args.rtu), load(args.ascii), logger)
+    if not args.skip_micro:
+        suite.run_micro()
+    if not args.skip_macro:
+        suite.run_macro(args.sizes, repeat=args.macro_repeat)
+    benchmark.write(args.output)
+    logger.info("Benchmark: results written to %s", args.output)
+    if args.baseline is not None:
+        regressions = benchmark.compare(load(args.baseline), args.threshold)
+        if len(regressions) > 0:
+            logger.error("Benchmark: %d regression(s) beyond %.1f%%", len(regressions), args.threshold * 100)
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
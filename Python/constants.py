@@ -6,4 +6,18 @@ class Direction(Enum):
 
 class Mode(Enum):
     ASCII = "ascii"
-    HEX = "hex"
\ No newline at end of file
+    HEX = "hex"
+
+class Space(Enum):
+    COILS = "coils"
+    DISCRETE_INPUTS = "discrete_inputs"
+    HOLDING_REGISTERS = "holding_registers"
+    INPUT_REGISTERS = "input_registers"
+
+class Outcome(Enum):
+    SUCCESS = "success"
+    TIMEOUT = "timeout"
+    INVALID = "invalid"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+    EXCEPTION = "exception"
@@ -1,6 +1,27 @@
+import argparse
+import hashlib
 import logging
+import os
+import sys
+import time
+from pkg.component.length import ResponseLengthIndex
+from pkg.component.loader import Loader
 from pkg.component.protocol import Protocol
+from pkg.component.reload import Reloader
+from pkg.component.snapshot import Snapshot
+from constants import Direction, Outcome, Space
+from pkg.transform.change import ChangeDetector, get_values
+from pkg.transform.codegen import Compiler
+from pkg.transport.adaptive import PollController
+from pkg.transport.gateway import Gateway, SimulatedLink
+from pkg.transport.link import LinkModel
+from pkg.transport.monitor import Monitor
+from pkg.transport.pipeline import Pipeline
+from pkg.transport.runtime import Runtime
+from pkg.transport.transaction import RetryPolicy, TransactionEngine
+from pkg.transport.writes import WriteQueue
 import json
+from pkg.observe.metrics import MetricsServer, Registry, TransactionMetrics
 from pkg.observe.statistics import Statistics
 from enum import Enum
 
@@ -22,7 +43,7 @@ class Protocols(Enum):
 
 class DescObjNotatedProtocolApp:
 
-    def __init__(self):
+    def __init__(self, file_path: str = None, snapshot: bool = True, snapshot_dir: str = None, stream: bool = False, lazy: bool = False, responder: bool = False, shared_store: str = None, policy: RetryPolicy = None, threshold: int = 3, cooldown: float = 5.0, codegen: bool = False, changes: bool = False, deadband: float = 0, sink: str = None, pipeline: bool = False, threaded: bool = False, drop: bool = False, metrics_port: int = None, cycles: int = 10, gateway_port: int = None, runtime_files: list = None, writes: list = None, reload: float = None, adaptive: bool = False, budget: float = None, baud: int = None, turnaround: float = 0.0, capture: str = None, monitor: str = None):
         # Setup logger
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')    
         self.logger = logging.getLogger(__name__) 
@@ -31,6 +52,45 @@ class DescObjNotatedProtocolApp:
         self.stats.start_time()
         self.logger.info("Welcome to the DONP (Descriptive Object Notated Protocol) Application!")
         self.protocol = None
+        self.file_path = file_path
+        self.snapshot = snapshot
+        self.snapshot_dir = snapshot_dir
+        self.stream = stream
+        self.lazy = lazy
+        self.responder = responder
+        self.shared_store = shared_store
+        self.store = None
+        self.policy = policy
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.codegen = codegen
+        self.detector = ChangeDetector(self.logger, deadband) if changes else None
+        self.sink_dir = sink
+        self.sink = None
+        self.pipeline = pipeline
+        self.threaded = threaded
+        self.drop = drop
+        self.metrics_port = metrics_port
+        self.metrics = None
+        self.server = None
+        self.cycles = cycles
+        self.gateway_port = gateway_port
+        self.runtime_files = runtime_files
+        self.writes = writes
+        self.write_queue = None
+        self.reload = reload
+        self.reloaders = []
+        self.adaptive = adaptive
+        self.budget = budget
+        self.controller = None
+        self.baud = baud
+        self.turnaround = turnaround
+        self.simulations = []
+        self.capture = capture
+        self.capture_file = None
+        self.monitor = monitor
+        self.runtime = None
+        self.lengths = None
 
     def log(self):
         """
@@ -48,7 +108,10 @@ class DescObjNotatedProtocolApp:
 
     def init_protocol(self):
         """
-        Initializes the protocol by loading the protocol file.
+        Initializes the protocol by loading the protocol file, or its compiled snapshot when it is
+        still valid for the file contents, followed by any further protocol files run alongside it.
+        If any part of the setup fails, everything set up so far is released and the protocol is left
+        uninitialized, so that a half configured protocol is never run.
 
         Args:
             None
@@ -57,17 +120,59 @@ class DescObjNotatedProtocolApp:
         Raises:
             None
         """
-        file = self.open_file()
         try:
-            if file is None:
-                raise ValueError("DONP App: unable to load protocol file")
-            self.protocol = Protocol(file)
+            if self.runtime_files and (self.pipeline or self.gateway_port is not None or self.sink_dir is not None):
+                raise ValueError("DONP App: several protocol files cannot be combined with the pipeline, gateway or sink")
+            if self.reload is not None and (self.pipeline or self.gateway_port is not None):
+                raise ValueError("DONP App: reloading cannot be combined with the pipeline or gateway")
+            if self.adaptive and (self.runtime_files or self.pipeline or self.gateway_port is not None):
+                raise ValueError("DONP App: adaptive polling cannot be combined with several protocol files, the pipeline or gateway")
+            if self.monitor is not None and (self.runtime_files or self.pipeline or self.gateway_port is not None or self.adaptive or self.capture is not None):
+                raise ValueError("DONP App: monitoring cannot be combined with several protocol files, the pipeline, gateway, adaptive polling or a capture")
+            self.protocol = self.load_protocol(self.get_file_path())
+            if self.sink_dir is not None:
+                # Imported on demand, as the sink depends on NumPy
+                from pkg.observe.sink import ResultSink
+                # The pipeline waits for or drops what the sink cannot keep up with itself
+                self.sink = ResultSink(self.sink_dir, self.logger, block=self.pipeline)
+            # The pipeline decodes and stores responses in stages of its own
+            callback = None
+            if not self.pipeline and (self.detector is not None or self.sink is not None):
+                callback = self.on_transaction
+            if self.metrics_port is not None:
+                self.metrics = TransactionMetrics(Registry(self.logger))
+                self.server = MetricsServer(self.metrics.registry, self.logger, port=self.metrics_port)
+                self.server.start()
+            if self.capture is not None:
+                self.capture_file = open(self.capture, "wb")
+            self.lengths = self.prepare_protocol(self.protocol, callback)
+            self.init_reloader(self.protocol, self.get_file_path(), self.lengths)
+            if self.writes:
+                self.write_queue = self.init_writes()
+            if self.adaptive:
+                # Messages are polled on intervals of their own instead of every cycle
+                self.controller = PollController(self.protocol, self.logger, self.budget)
+            if self.runtime_files:
+                # Further protocols share the worker pool and the metrics
+                self.runtime = Runtime(self.logger)
+                self.runtime.add(self.protocol.tag, self.protocol)
+                for file_path in self.runtime_files:
+                    protocol = self.load_protocol(file_path)
+                    self.init_reloader(protocol, file_path, self.prepare_protocol(protocol, callback))
+                    self.runtime.add(protocol.tag, protocol)
         except Exception as e:
-            self.logger.error("DONP App: an exception has occurred: %s", e)    
+            self.logger.error("DONP App: an exception has occurred: %s", e)
+            self.close()
+            self.protocol = None
+            self.runtime = None
+            self.controller = None
+            self.write_queue = None
+            self.reloaders = []
+            self.simulations = []
 
-    def open_file(self):
+    def close(self):
         """
-        Opens and loads the protocol JSON file.
+        Closes the result sink, shared register store, capture file and metrics server, whichever are open.
 
         Args:
             None
@@ -76,19 +181,327 @@ class DescObjNotatedProtocolApp:
         Raises:
             None
         """
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+        if self.store is not None:
+            self.close_store()
+        if self.capture_file is not None:
+            self.capture_file.close()
+            self.capture_file = None
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+
+    def init_reloader(self, protocol, file_path: str, lengths: ResponseLengthIndex):
+        """
+        Sets a reloader on a protocol, applying the changes of its file while running, if reloading is selected.
+
+        Args:
+            protocol (Protocol): The protocol object.
+            file_path (str): The protocol file path.
+            lengths (ResponseLengthIndex): The response length index of the protocol.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        if self.reload is None:
+            return
+        reloader = Reloader(protocol, file_path, self.logger, self.reload, lengths, self.detector)
+        protocol.set_reloader(reloader)
+        self.reloaders.append(reloader)
+
+    def init_writes(self):
+        """
+        Queues the coil and register writes given on the command line, performed in the first poll cycle.
+
+        Args:
+            None
+        Returns:
+            WriteQueue: The write queue.
+        Raises:
+            ValueError: If a write is malformed or addresses an unknown device.
+        """
+        queue = WriteQueue(self.protocol, self.logger, max_delay=0)
+        devices = {device.address: device for device in self.protocol.device}
+        for space, write in self.writes:
+            try:
+                target, value = write.split("=")
+                address, register = (int(part, 0) for part in target.split(":"))
+                value = int(value, 0)
+            except ValueError:
+                raise ValueError(f"DONP App: malformed write {write}, expected device:address=value") from None
+            if address not in devices:
+                raise ValueError(f"DONP App: no device at address {address}")
+            if space == Space.COILS:
+                queue.write_coil(devices[address], register, value != 0)
+            else:
+                queue.write_register(devices[address], register, value)
+        self.protocol.set_write_queue(queue)
+        return queue
+
+    def load_protocol(self, file_path: str):
+        """
+        Loads a protocol file, or its compiled snapshot when it is still valid for the file contents, and
+        tags the protocol with the file name. Streamed and lazy loads bypass snapshots, which hold every
+        device fully built.
+
+        Args:
+            file_path (str): The protocol file path.
+        Returns:
+            Protocol: The protocol object.
+        Raises:
+            ValueError: If the protocol file cannot be loaded.
+        """
+        protocol = None
+        snapshot = None
+        if self.snapshot and not (self.stream or self.lazy):
+            snapshot = Snapshot(file_path, self.logger, self.snapshot_dir)
+            protocol = snapshot.load()
+        if protocol is None:
+            if self.stream or self.lazy:
+                # Devices are decoded one at a time, never holding the whole file
+                protocol = Loader(file_path, self.logger, lazy=self.lazy).load()
+            else:
+                # The snapshot is keyed by the contents parsed, which may differ from the file by now
+                digest = hashlib.sha256()
+                file = self.open_file(file_path, digest)
+                if file is None:
+                    raise ValueError("DONP App: unable to load protocol file")
+                protocol = Protocol(file)
+                if snapshot is not None:
+                    snapshot.save(protocol, snapshot.get_key(digest))
+        protocol.set_tag(os.path.splitext(os.path.basename(file_path))[0])
+        return protocol
+
+    def prepare_protocol(self, protocol, callback=None):
+        """
+        Sets up the seed, code generation, responder, response length index and transaction engine of a
+        protocol, as selected on the command line.
+
+        Args:
+            protocol (Protocol): The protocol object.
+            callback: The function called with every finished transaction, if any.
+        Returns:
+            ResponseLengthIndex: The response length index of the protocol.
+        Raises:
+            ValueError: If the shared store layout does not match the protocol.
+        """
+        # Optional seed for reproducible simulated data, e.g. when comparing implementations
+        seed = os.environ.get("DONP_SEED")
+        if seed is not None:
+            seed = int(seed)
+            protocol.set_seed(seed)
+        if self.codegen:
+            # Generated encoders and decoders replace the interpreted prototype segments
+            protocol.set_compiler(Compiler(protocol, self.logger))
+        if self.baud is not None:
+            # The simulated frames are timed as on a serial line of the given baud rate
+            protocol.simulation.set_link(LinkModel(protocol.conversion.mode, self.logger, self.baud, turnaround=self.turnaround))
+            self.simulations.append(protocol.simulation)
+        if self.capture_file is not None and protocol is self.protocol:
+            # The frames of the protocol are written as they would appear on the line
+            protocol.simulation.set_capture(self.capture_file)
+        if self.responder or self.gateway_port is not None:
+            # Imported on demand, as the responder depends on NumPy
+            from pkg.transport.responder import Responder
+            store = None
+            if self.shared_store is not None and protocol is self.protocol:
+                self.store = self.open_store()
+                store = self.store
+            protocol.set_responder(Responder(protocol, self.logger, seed, store))
+        # Expected response lengths, computed up front unless devices are materialised on first poll
+        lengths = ResponseLengthIndex(protocol, self.logger)
+        if not self.lazy:
+            lengths.build()
+        # Transactions wait for the protocol timeout, are retried and skipped for failing devices
+        protocol.set_engine(TransactionEngine(protocol, self.logger, self.policy, self.threshold, self.cooldown, lengths=lengths, callback=callback, metrics=self.metrics))
+        return lengths
+
+    def on_transaction(self, transaction):
+        """
+        Passes the data bytes of a successful transaction to the change detector, if any, and the
+        values of the device message to the result sink when they changed.
+
+        Args:
+            transaction (Transaction): The finished transaction.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        if transaction.outcome != Outcome.SUCCESS:
+            return
+        message = transaction.message
+        protocol = self.protocol if self.runtime is None else self.runtime.get_protocol(transaction.device.protocol)
+        prototype = protocol.get_prototype(message.name)
+        try:
+            fields = protocol.decode_message(prototype, Direction.RX, transaction.received)
+        except ValueError as e:
+            self.logger.warning("DONP App: unable to decode response to %s: %s", message.name, e)
+            return
+        if "data_bytes" not in fields:
+            return
+        if self.detector is not None:
+            try:
+                change = self.detector.update(message, transaction.device, fields["data_bytes"])
+            except ValueError as e:
+                self.logger.warning("DONP App: unable to detect changes of %s: %s", message.name, e)
+                return
+            if change is None:
+                return
+            self.logger.debug("DONP App: %s %s changed: %s", transaction.device.name, message.name, change.values)
+            values = change.values
+        else:
+            values = get_values(message, fields["data_bytes"])
+        if self.sink is not None:
+            self.sink.append(time.time(), transaction.device.address, getattr(message, "function", 0), getattr(message, "starting_address", 0), values)
+
+    def open_store(self):
+        """
+        Attaches to the named shared register store, or creates it if it does not exist yet, so that
+        other processes can update the device state the responder answers from.
+
+        Args:
+            None
+        Returns:
+            SharedRegisterStore: The shared register store.
+        Raises:
+            ValueError: If the shared store layout does not match the protocol.
+        """
+        from pkg.element.register import get_register_sizes
+        from pkg.transport.shared import SharedRegisterStore
+        sizes = get_register_sizes(self.protocol.device)
+        try:
+            return SharedRegisterStore(sizes, self.logger, name=self.shared_store, create=False)
+        except FileNotFoundError:
+            self.logger.info("DONP App: creating shared register store %s", self.shared_store)
+            return SharedRegisterStore(sizes, self.logger, name=self.shared_store, create=True)
+
+    def close_store(self):
+        """
+        Detaches from the shared register store, destroying it if this application created it.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.store.close()
+        if self.store.created:
+            self.store.unlink()
+        self.store = None
+
+    def get_file_path(self):
+        """
+        Determines the protocol file path, either as selected on the command line or the DONP_PROTOCOL
+        environment variable, or else the file of the active protocol.
+
+        Args:
+            None
+        Returns:
+            str: The protocol file path.
+        Raises:
+            None
+        """
+        if self.file_path is not None:
+            return self.file_path
+        if os.environ.get("DONP_PROTOCOL"):
+            return os.environ["DONP_PROTOCOL"]
         file_path = "../"
         match Protocols.ACTIVE:
             case Protocols.MODBUS_ASCII:
                 file_path = file_path + "modbusAscii.json"
             case Protocols.MODBUS_RTU:
                 file_path = file_path + "modbusRtu.json"
+        return file_path
+
+    def open_file(self, file_path: str = None, digest=None):
+        """
+        Opens and loads the protocol JSON file.
+
+        Args:
+            file_path (str): The protocol file path, defaults to the selected protocol file.
+            digest: A hash object updated with the file contents, if any.
+        Returns:
+            None
+        Raises:
+            None
+        """
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(file_path or self.get_file_path(), "rb") as f:
+                data = f.read()
+            if digest is not None:
+                digest.update(data)
+            return json.loads(data)
         except Exception as e: 
             self.logger.error("DONP App: an exception has occurred: %s", e)
         return None
     
+    def serve_gateway(self):
+        """
+        Serves Modbus TCP clients from the simulated devices of the protocol, until interrupted.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        link = SimulatedLink(self.protocol.responder, self.logger)
+        gateway = Gateway(self.protocol, self.logger, {device.address: link for device in self.protocol.device}, port=self.gateway_port, metrics=self.metrics)
+        gateway.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.logger.info("DONP App: stopping gateway")
+        gateway.stop()
+        gateway.log()
+
+    def run_monitor(self):
+        """
+        Decodes the traffic of other masters from the capture file or pipe to monitor, or standard input
+        for "-", reporting the values of every transaction seen.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        monitor = Monitor(self.protocol, self.logger, self.lengths, link=self.protocol.simulation.link, callback=self.on_record)
+        try:
+            if self.monitor == "-":
+                monitor.run(sys.stdin.buffer)
+            else:
+                with open(self.monitor, "rb") as stream:
+                    monitor.run(stream)
+        except (OSError, KeyboardInterrupt) as e:
+            self.logger.error("DONP App: monitoring stopped: %s", e)
+        monitor.log()
+
+    def on_record(self, record):
+        """
+        Reports the values of a transaction seen by the monitor, and passes them to the result sink, if any.
+
+        Args:
+            record (Record): The record of the transaction.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        device = record.device.name if record.device is not None else record.address
+        self.logger.info("DONP App: %s %s at %s: %s", device, record.message.name, record.starting_address, record.values)
+        if self.sink is not None:
+            self.sink.append(time.time(), record.address, record.function, record.starting_address or 0, record.values)
+
     def run(self):
         """
         Runs the protocol and reports statistics.
@@ -101,12 +514,81 @@ class DescObjNotatedProtocolApp:
             None
         """
         if self.protocol is not None:
-            self.protocol.run()
+            if self.monitor is not None:
+                self.run_monitor()
+            elif self.gateway_port is not None:
+                self.serve_gateway()
+            elif self.runtime is not None:
+                self.runtime.run(self.cycles)
+            elif self.controller is not None:
+                self.controller.run(self.cycles)
+            elif self.pipeline:
+                Pipeline(self.protocol, self.logger, self.detector, self.sink, self.lengths, self.threaded, drop=self.drop).run(self.cycles)
+                if self.protocol.engine is not None:
+                    self.protocol.engine.log()
+            else:
+                self.protocol.run(self.cycles)
             self.stats.stop_time()
+            for simulation in self.simulations:
+                simulation.log()
+            if self.write_queue is not None:
+                self.write_queue.log()
+            for reloader in self.reloaders:
+                reloader.log()
+            if self.detector is not None:
+                self.detector.log()
+            if self.sink is not None:
+                self.sink.close()
+                self.sink = None
             self.stats.log()
+            self.close()
         else:
             self.logger.error("DONP App: Protocol is not initialized, unable to run.")
 
+def parse_args(argv: list[str]):
+    """
+    Parses the application command line.
+
+    Args:
+        argv (list[str]): The command line arguments.
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    Raises:
+        SystemExit: If the arguments are invalid.
+    """
+    parser = argparse.ArgumentParser(description="Descriptive Object Notated Protocol (DONP) application")
+    parser.add_argument("protocol", nargs="*", help="protocol JSON files run together in one runtime, defaults to the active protocol")
+    parser.add_argument("--no-snapshot", action="store_true", help="always parse the protocol JSON file")
+    parser.add_argument("--snapshot-dir", help="directory of compiled protocol snapshots, defaults to the protocol file's")
+    parser.add_argument("--stream", action="store_true", help="decode the device array one device at a time")
+    parser.add_argument("--lazy", action="store_true", help="stream devices and materialise their messages on first poll")
+    parser.add_argument("--responder", action="store_true", help="answer requests from simulated device register maps")
+    parser.add_argument("--shared-store", help="name of a shared memory register store backing the responder")
+    parser.add_argument("--codegen", action="store_true", help="build and decode messages with generated per-prototype functions")
+    parser.add_argument("--changes", action="store_true", help="detect changed values, counting unchanged responses")
+    parser.add_argument("--deadband", type=float, default=0, help="default deadband of changed values (default 0)")
+    parser.add_argument("--sink", help="directory of columnar result files to append the polled values to")
+    parser.add_argument("--pipeline", action="store_true", help="run polls through streaming stages from encoding to the sink")
+    parser.add_argument("--threaded", action="store_true", help="run each pipeline stage in its own thread, connected by bounded queues")
+    parser.add_argument("--drop", action="store_true", help="drop results the sink cannot keep up with instead of waiting")
+    parser.add_argument("--cycles", type=int, default=10, help="number of poll cycles (default 10)")
+    parser.add_argument("--metrics-port", type=int, help="serve OpenMetrics transaction metrics on this localhost port while polling")
+    parser.add_argument("--gateway-port", type=int, help="serve Modbus TCP clients on this localhost port from the simulated devices")
+    parser.add_argument("--write-register", action="append", default=[], metavar="DEVICE:ADDRESS=VALUE", help="write a holding register in the first poll cycle, may be repeated")
+    parser.add_argument("--write-coil", action="append", default=[], metavar="DEVICE:ADDRESS=VALUE", help="write a coil in the first poll cycle, may be repeated")
+    parser.add_argument("--reload", type=float, metavar="SECONDS", help="check the protocol files for changes every SECONDS and apply them while running")
+    parser.add_argument("--adaptive", action="store_true", help="poll each message on an interval adapted to how often its data changes, a cycle being a polling round")
+    parser.add_argument("--budget", type=float, metavar="BYTES", help="bytes per second adaptive polling may use on the bus")
+    parser.add_argument("--baud", type=int, help="report the time the simulated frames would take on a serial line of this baud rate")
+    parser.add_argument("--turnaround", type=float, default=0.0, metavar="MS", help="milliseconds a device takes to answer on the serial line (default 0)")
+    parser.add_argument("--capture", metavar="FILE", help="write the simulated frames to FILE as they would appear on the line")
+    parser.add_argument("--monitor", metavar="FILE", help="passively decode the traffic of other masters from a capture file or pipe, - for standard input")
+    parser.add_argument("--retries", type=int, default=2, help="attempts after a timeout or invalid response (default 2)")
+    parser.add_argument("--backoff", type=float, default=0.01, help="seconds before the first retry, doubled per retry (default 0.01)")
+    parser.add_argument("--breaker-threshold", type=int, default=3, help="consecutive failures before a device is skipped, 0 never skips (default 3)")
+    parser.add_argument("--breaker-cooldown", type=float, default=5.0, help="seconds a failing device is skipped for (default 5)")
+    return parser.parse_args(argv)
+
 if __name__ == '__main__':
     """
         Initializes and runs the Custom MTO Protocol application.
@@ -118,7 +600,8 @@ if __name__ == '__main__':
         Raises:
             None
         """
-    app = DescObjNotatedProtocolApp()
+    args = parse_args(sys.argv[1:])
+    app = DescObjNotatedProtocolApp(args.protocol[0] if args.protocol else None, snapshot=not args.no_snapshot, snapshot_dir=args.snapshot_dir, stream=args.stream, lazy=args.lazy, responder=args.responder, shared_store=args.shared_store, policy=RetryPolicy(args.retries, args.backoff), threshold=args.breaker_threshold, cooldown=args.breaker_cooldown, codegen=args.codegen, changes=args.changes, deadband=args.deadband, sink=args.sink, pipeline=args.pipeline, threaded=args.threaded, drop=args.drop, metrics_port=args.metrics_port, cycles=args.cycles, gateway_port=args.gateway_port, runtime_files=args.protocol[1:], writes=[(Space.HOLDING_REGISTERS, write) for write in args.write_register] + [(Space.COILS, write) for write in args.write_coil], reload=args.reload, adaptive=args.adaptive, budget=args.budget, baud=args.baud, turnaround=args.turnaround / 1000, capture=args.capture, monitor=args.monitor)
     app.init_protocol()
     app.log()
     app.run()
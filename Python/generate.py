@@ -0,0 +1,83 @@
+import argparse
+import sys
+from pkg.benchmark.generator import Generator
+
+"""
+    DONP synthetic protocol generator, emitting seeded and reproducible protocol files with any number
+    of devices and messages per device for scaling tests.
+
+        Copyright (c) 2025 Kathy Snell, All rights reserved.
+
+"""
+
+def parse_weights(text: str, key):
+    """
+    Parses a comma separated list of weighted choices, such as "3:4,4:1" or "int16,float:2".
+
+    Args:
+        text (str): The weighted choices, a missing weight defaults to one.
+        key (callable): Converts each choice to its key type.
+    Returns:
+        dict: The weight of each choice.
+    Raises:
+        ValueError: If a choice or weight is invalid.
+    """
+    weights = {}
+    for item in text.split(","):
+        choice, _, weight = item.partition(":")
+        weights[key(choice.strip())] = float(weight) if weight else 1.0
+    return weights
+
+def parse_args(argv: list[str]):
+    """
+    Parses the generator command line.
+
+    Args:
+        argv (list[str]): The command line arguments.
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    Raises:
+        SystemExit: If the arguments are invalid.
+    """
+    parser = argparse.ArgumentParser(description="DONP synthetic protocol generator")
+    parser.add_argument("output", help="protocol file to write, '-' for standard output")
+    parser.add_argument("--devices", type=int, default=100, help="number of devices")
+    parser.add_argument("--messages", type=int, default=100, help="messages per device")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--mode", choices=("rtu", "ascii"), default="rtu", help="Modbus framing")
+    parser.add_argument("--functions", default="1,2,3:4,4:4", help="weighted function codes, e.g. 3:4,4:1")
+    parser.add_argument("--data-types", default="int16", help="weighted register data types, e.g. int16:3,float")
+    parser.add_argument("--min-length", type=int, default=1, help="smallest message length")
+    parser.add_argument("--max-length", type=int, default=16, help="largest message length")
+    return parser.parse_args(argv)
+
+def main(argv: list[str]):
+    """
+    Generates a synthetic protocol file.
+
+    Args:
+        argv (list[str]): The command line arguments.
+    Returns:
+        int: The exit status.
+    Raises:
+        None
+    """
+    args = parse_args(argv)
+    try:
+        generator = Generator(args.devices, args.messages, seed=args.seed, mode=args.mode,
+                              functions=parse_weights(args.functions, int),
+                              data_types=parse_weights(args.data_types, str.lower),
+                              min_length=args.min_length, max_length=args.max_length)
+        if args.output == "-":
+            generator.write(sys.stdout)
+        else:
+            with open(args.output, "w", encoding="utf-8") as f:
+                count = generator.write(f)
+            print(f"Generated {args.devices} devices with {count} messages in {args.output}", file=sys.stderr)
+    except (ValueError, OSError) as e:
+        print(f"Generator: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,71 @@
+import argparse
+import json
+import logging
+import sys
+from pkg.benchmark.oracle import Oracle
+
+"""
+    DONP differential oracle, fuzzing the accelerated code paths, i.e. compiled encoders and decoders,
+    frame batches, the table driven CRC16 and the bulk ASCII encoding, against the interpreted reference
+    implementation. Divergent cases are minimized and written as JSON reproducers, which may be
+    replayed with --replay, exiting with a non-zero status for as long as they still diverge.
+
+        Copyright (c) 2025 Kathy Snell, All rights reserved.
+
+"""
+
+def parse_args(argv: list[str]):
+    """
+    Parses the oracle command line.
+
+    Args:
+        argv (list[str]): The command line arguments.
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    Raises:
+        SystemExit: If the arguments are invalid.
+    """
+    parser = argparse.ArgumentParser(description="DONP differential oracle")
+    parser.add_argument("--cases", type=int, default=1000, help="number of random cases")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the case generator")
+    parser.add_argument("--limit", type=int, default=1, help="divergent cases to stop after")
+    parser.add_argument("--max-shrinks", type=int, default=2000, help="candidate cases tried while minimizing")
+    parser.add_argument("--output", default="oracle.json", help="reproducer file, written on divergence")
+    parser.add_argument("--replay", help="reproducer file to replay instead of fuzzing")
+    return parser.parse_args(argv)
+
+def main(argv: list[str]):
+    """
+    Fuzzes the fast code paths, or replays a reproducer.
+
+    Args:
+        argv (list[str]): The command line arguments.
+    Returns:
+        int: The exit status, 1 if a divergence was found, 0 otherwise.
+    Raises:
+        None
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    logger = logging.getLogger("oracle")
+    # Corrupted frames make the protocol log warnings, which are expected here
+    logging.getLogger("pkg").setLevel(logging.CRITICAL)
+    oracle = Oracle(logger, seed=args.seed, max_shrinks=args.max_shrinks)
+    if args.replay is not None:
+        with open(args.replay, "r", encoding="utf-8") as f:
+            divergences = [d for reproducer in json.load(f) for d in oracle.check(reproducer["case"])]
+    else:
+        divergences = oracle.run(args.cases, args.limit)
+    for divergence in divergences:
+        logger.error("Oracle: %s diverged at %s: reference %s, fast %s", divergence.check, divergence.where, divergence.reference, divergence.fast)
+    if len(divergences) == 0:
+        logger.info("Oracle: no divergence")
+        return 0
+    if args.replay is None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump([divergence.to_json() for divergence in divergences], f, indent=2)
+        logger.info("Oracle: reproducer written to %s", args.output)
+    return 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
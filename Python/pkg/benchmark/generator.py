@@ -0,0 +1,166 @@
+"""
+    Package 'benchmark' provides mechanism's for measuring and comparing the performance of the DONP implementation.
+"""
+
+import json
+import random
+
+"""
+    Objects of class Generator emit synthetic DONP protocol files of arbitrary size for scaling tests,
+    following the structure documented in donpJson.md.
+
+    Generation is seeded, so the same parameters always produce the same file, and streamed, writing
+    one device at a time so that memory use does not grow with the number of devices or messages.
+"""
+
+# Modbus read function codes supported by the generated prototypes, returning bits or registers
+BIT_FUNCTIONS = (1, 2)
+REGISTER_FUNCTIONS = (3, 4)
+# Data sizes in bytes used to keep each response byte count within a single byte
+DATA_TYPE_BYTES = {"int16": 2, "int32": 4, "float": 4}
+MAX_BYTE_COUNT = 250
+MAX_ADDRESS = 65535
+MAX_SLAVE_ADDRESS = 247
+
+class Generator:
+
+    def __init__(self, devices: int, messages: int, seed: int = 0, mode: str = "rtu", functions: dict = None,
+                 data_types: dict = None, min_length: int = 1, max_length: int = 16):
+        # Ensure the requested shape is valid
+        if devices < 1 or messages < 1:
+            raise ValueError("Generator: devices and messages must be at least one")
+        if min_length < 1 or max_length < min_length:
+            raise ValueError("Generator: invalid register length range")
+        if mode not in ("rtu", "ascii"):
+            raise ValueError(f"Generator: unsupported mode {mode}")
+        # Initialize generator fields
+        self.devices = devices
+        self.messages = messages
+        self.seed = seed
+        self.mode = mode
+        self.functions = functions if functions is not None else {1: 1, 2: 1, 3: 4, 4: 4}
+        self.data_types = data_types if data_types is not None else {"int16": 1}
+        self.min_length = min_length
+        self.max_length = max_length
+        for function in self.functions:
+            if function not in BIT_FUNCTIONS and function not in REGISTER_FUNCTIONS:
+                raise ValueError(f"Generator: unsupported function code {function}")
+        for data_type in self.data_types:
+            if data_type not in DATA_TYPE_BYTES:
+                raise ValueError(f"Generator: unsupported register data type {data_type}")
+
+    def write(self, stream):
+        """
+        Writes the generated protocol to a text stream, one device per line.
+
+        Args:
+            stream: A writable text stream.
+        Returns:
+            int: The number of messages written.
+        Raises:
+            OSError: If the stream cannot be written.
+        """
+        rng = random.Random(self.seed)
+        # Protocol fields and prototypes are small, write them ahead of the device array
+        stream.write('{\n "protocol": {\n')
+        for key, value in self.get_protocol_header().items():
+            stream.write(f'  {json.dumps(key)}: {json.dumps(value)},\n')
+        stream.write('  "device": [\n')
+        functions = list(self.functions)
+        function_weights = list(self.functions.values())
+        data_types = list(self.data_types)
+        data_type_weights = list(self.data_types.values())
+        count = 0
+        for index in range(self.devices):
+            messages = []
+            for _ in range(self.messages):
+                function = rng.choices(functions, function_weights)[0]
+                if function in BIT_FUNCTIONS:
+                    data_type = "bit"
+                else:
+                    data_type = rng.choices(data_types, data_type_weights)[0]
+                length = rng.randint(self.min_length, min(self.max_length, self.get_max_length(data_type)))
+                messages.append({
+                    "name": f"fc{function:02d}",
+                    "function": function,
+                    "starting_address": rng.randint(0, MAX_ADDRESS + 1 - length),
+                    "length": length,
+                    "data_type": data_type,
+                })
+            device = {"name": f"dev{index + 1}", "address": index % MAX_SLAVE_ADDRESS + 1, "message": messages}
+            if index > 0:
+                stream.write(",\n")
+            stream.write("   ")
+            stream.write(json.dumps(device, separators=(",", ":")))
+            count += len(messages)
+        stream.write("\n  ]\n }\n}\n")
+        return count
+
+    def get_max_length(self, data_type: str):
+        """
+        Determines the largest length for a data type whose response still fits the byte count field.
+
+        Args:
+            data_type (str): The message data type.
+        Returns:
+            int: The largest allowed length.
+        Raises:
+            None
+        """
+        if data_type == "bit":
+            return MAX_BYTE_COUNT * 8
+        return MAX_BYTE_COUNT // DATA_TYPE_BYTES[data_type]
+
+    def get_protocol_header(self):
+        """
+        Builds the protocol fields and prototypes for the configured mode and function codes.
+
+        Args:
+            None
+        Returns:
+            dict: The protocol object without its device array.
+        Raises:
+            None
+        """
+        if self.mode == "ascii":
+            header = {"prefix": ":", "suffix": "\r\n", "timeout": 0, "source_address": 0,
+                      "transmission_mode": "ascii", "checksum_calculation": "LRC"}
+            check = ("LRC", 8)
+        else:
+            header = {"prefix": "", "suffix": "", "timeout": 30, "source_address": 0,
+                      "transmission_mode": "hex", "checksum_calculation": "CRC16"}
+            check = ("CRC", 16)
+        header["prototype"] = [self.get_prototype(function, check) for function in sorted(self.functions)]
+        return header
+
+    def get_prototype(self, function: int, check: tuple):
+        """
+        Builds a read prototype for a function code.
+
+        Args:
+            function (int): The function code.
+            check (tuple): The checksum description and size in bits.
+        Returns:
+            dict: The prototype object.
+        Raises:
+            None
+        """
+        error_check = {"name": "error_check", "desc": check[0], "bits": check[1]}
+        return {
+            "name": f"fc{function:02d}",
+            "desc": f"function code {function}",
+            "transmit": [
+                {"name": "slave_address", "desc": "slave address", "bits": 8},
+                {"name": "function", "desc": "function number", "bits": 8},
+                {"name": "starting_address", "desc": "starting address", "bits": 16},
+                {"name": "length", "desc": "quantity of registers", "bits": 16},
+                error_check,
+            ],
+            "receive": [
+                {"name": "slave_address", "desc": "slave address", "bits": 8},
+                {"name": "function", "desc": "function number", "bits": 8},
+                {"name": "byte_count", "desc": "byte count", "bits": 8},
+                {"name": "data_bytes", "desc": "data bytes", "bits": 8},
+                error_check,
+            ],
+        }
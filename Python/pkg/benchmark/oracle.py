@@ -0,0 +1,604 @@
+"""
+    Package 'benchmark' provides mechanism's for measuring and comparing the performance of the DONP implementation.
+"""
+
+import random
+from constants import Direction, Mode
+from pkg.component.protocol import Protocol
+from pkg.transform.codegen import Compiler
+
+# Segment widths in bits drawn for generated fields, sub-byte and odd widths included
+FIELD_BITS = (8, 8, 16, 16, 24, 32, 4, 12)
+# Names of generated fields, including names that are no Python identifiers
+FIELD_NAMES = ("starting_address", "length", "value", "register", "class", "set-point")
+DATA_TYPES = ("int16", "int32", "float", "string", "bit", None)
+PREFIXES = ("", ":", "@", "ab")
+SUFFIXES = ("", "\r\n", "\n", "z")
+# Frame corruptions: flip xors a byte, truncate cuts the frame, insert adds a byte
+CORRUPTIONS = ("flip", "truncate", "insert")
+
+"""
+    Objects of class ReferenceBackend build, decode and checksum frames with the interpreted implementation:
+    Protocol.get_message_from_prototype and append_segments_to_byte_array, Prototype.decode, the bitwise
+    Checksum.calculate_crc16 and calculate_lrc, and Conversion. Its output is the definition of correct.
+"""
+
+class ReferenceBackend:
+
+    def __init__(self, config: dict):
+        # Initialize backend fields
+        self.protocol = Protocol(config)
+
+    def encode(self, direction: Direction, message, device):
+        """
+        Builds a message in the transmission mode of the protocol.
+
+        Args:
+            direction (Direction): The direction of the message (TX or RX).
+            message (Message): The message object.
+            device (Device): The device object.
+        Returns:
+            bytearray: The message.
+        Raises:
+            Exception: Any exception raised while building the message.
+        """
+        protocol = self.protocol
+        return protocol.get_message_from_prototype(protocol.get_prototype(message.name), direction, message, device)
+
+    def build(self, direction: Direction, pairs: list):
+        """
+        Builds the messages of the given pairs back to back.
+
+        Args:
+            direction (Direction): The direction of the messages (TX or RX).
+            pairs (list[tuple[Message, Device]]): The messages and their devices, in order.
+        Returns:
+            tuple[bytes, list[int]]: The frames back to back, and the length of each frame.
+        Raises:
+            Exception: Any exception raised while building a message.
+        """
+        frames = [self.encode(direction, message, device) for message, device in pairs]
+        return b"".join(frames), [len(frame) for frame in frames]
+
+    def decode(self, direction: Direction, name: str, frame: bytearray):
+        """
+        Decodes a message in the transmission mode of the protocol into its segment values.
+
+        Args:
+            direction (Direction): The direction of the message (TX or RX).
+            name (str): The prototype name.
+            frame (bytearray): The message, including prefix and suffix.
+        Returns:
+            dict: The segment values by name.
+        Raises:
+            Exception: Any exception raised while decoding the message.
+        """
+        protocol = self.protocol
+        return protocol.decode_message(protocol.get_prototype(name), direction, frame)
+
+    def crc16(self, data: bytes):
+        """
+        Computes the CRC16 checksum of data.
+
+        Args:
+            data (bytes): The data.
+        Returns:
+            int: The CRC, byte swapped.
+        Raises:
+            None
+        """
+        return self.protocol.checksum.calculate_crc16(data)
+
+"""
+    Objects of class FastBackend perform the same operations as ReferenceBackend with the accelerated code
+    paths: compiled encoders and decoders, frames built into a shared FrameBatch and the table driven CRC16.
+    The LRC and the bulk hexadecimal ASCII encoding of the compiled encoders are checked through the frames
+    they build. A fast path is put under the oracle by overriding the operation it replaces, calling the
+    production code rather than a copy of it.
+"""
+
+class FastBackend(ReferenceBackend):
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+        # Initialize backend fields
+        self.protocol.set_compiler(Compiler(self.protocol, self.protocol.logger))
+
+    def encode(self, direction: Direction, message, device):
+        """
+        Builds a message with the compiled encoder of its prototype.
+
+        Args:
+            direction (Direction): The direction of the message (TX or RX).
+            message (Message): The message object.
+            device (Device): The device object.
+        Returns:
+            bytearray: The message.
+        Raises:
+            Exception: Any exception raised while building the message.
+        """
+        protocol = self.protocol
+        return protocol.encode(protocol.get_prototype(message.name), direction, message, device)
+
+    def build(self, direction: Direction, pairs: list):
+        """
+        Builds the messages of the given pairs into a frame batch.
+
+        Args:
+            direction (Direction): The direction of the messages (TX or RX).
+            pairs (list[tuple[Message, Device]]): The messages and their devices, in order.
+        Returns:
+            tuple[bytes, list[int]]: The frames back to back, and the length of each frame.
+        Raises:
+            Exception: Any exception raised while building a message.
+        """
+        batch = self.protocol.build_frames(direction, pairs)
+        return bytes(batch.buffer), list(batch.lengths)
+
+    def crc16(self, data: bytes):
+        """
+        Computes the CRC16 checksum of data from the lookup table.
+
+        Args:
+            data (bytes): The data.
+        Returns:
+            int: The CRC, byte swapped.
+        Raises:
+            None
+        """
+        return self.protocol.checksum.calculate_crc16_table(data)
+
+"""
+    Objects of class Divergence record an operation whose outcome differs between the reference and the
+    fast backend: the returned value, or the type and text of the raised exception.
+"""
+
+class Divergence:
+
+    __slots__ = ("check", "where", "reference", "fast", "case")
+
+    def __init__(self, check: str, where: str, reference: tuple, fast: tuple, case: dict):
+        self.check = check
+        self.where = where
+        self.reference = reference
+        self.fast = fast
+        self.case = case
+
+    def to_json(self):
+        """
+        Builds a reproducer of the divergence, replayable with Oracle.check.
+
+        Args:
+            None
+        Returns:
+            dict: The divergence and its case.
+        Raises:
+            None
+        """
+        return {"check": self.check, "where": self.where, "reference": list(self.reference), "fast": list(self.fast), "case": self.case}
+
+"""
+    The Oracle class fuzzes the fast code paths against the reference implementation. Every case is a small
+    protocol of random prototypes, devices and messages, with a seed for the simulated data bytes and a list
+    of frame corruptions. Both backends build every message in both directions and as a batch, then decode
+    and checksum the frames built, intact and corrupted. Any difference in output, or in the
+    exception raised, is a divergence.
+
+    Divergent cases are minimized by removing corruptions, devices, messages, prototypes, segments and fields,
+    and by simplifying values and framing, for as long as the same check still diverges. Cases are plain JSON,
+    so the minimized case is a reproducer that replays on its own.
+"""
+
+class Oracle:
+
+    def __init__(self, logger, seed: int = 0, max_shrinks: int = 2000):
+        # Setup logger
+        self.logger = logger
+        # Initialize oracle fields
+        self.seed = seed
+        self.max_shrinks = max_shrinks
+        self.counters = {"cases": 0, "checks": 0, "divergences": 0}
+
+    def run(self, cases: int = 1000, limit: int = 1):
+        """
+        Fuzzes the given number of cases, stopping once enough cases diverged.
+
+        Args:
+            cases (int): The number of cases.
+            limit (int): The number of divergent cases to stop after.
+        Returns:
+            list[Divergence]: The first divergence of each divergent case, on the minimized case.
+        Raises:
+            None
+        """
+        rng = random.Random(self.seed)
+        found = []
+        for _ in range(cases):
+            case = self.generate(rng)
+            self.counters["cases"] += 1
+            divergences = self.check(case)
+            if divergences:
+                self.counters["divergences"] += 1
+                check = divergences[0].check
+                self.logger.warning("Oracle: %s diverged at %s, minimizing", check, divergences[0].where)
+                case = self.minimize(case, check)
+                found.append(next(d for d in self.check(case) if d.check == check))
+                if len(found) >= limit:
+                    break
+        self.log()
+        return found
+
+    def generate(self, rng: random.Random):
+        """
+        Generates a random case.
+
+        Args:
+            rng (random.Random): The random generator.
+        Returns:
+            dict: The case: seed, protocol and corruptions.
+        Raises:
+            None
+        """
+        ascii_mode = rng.random() < 0.5
+        calculation = rng.choice(("CRC16", "LRC"))
+        prototypes = [self.generate_prototype(rng, f"p{index}", calculation) for index in range(rng.randint(1, 3))]
+        devices = []
+        for index in range(rng.randint(1, 2)):
+            address = rng.randrange(256) if rng.random() < 0.95 else rng.choice((256, -1))
+            messages = [self.generate_message(rng, rng.choice(prototypes)) for _ in range(rng.randint(1, 3))]
+            devices.append({"name": f"d{index}", "address": address, "message": messages})
+        corruptions = [[rng.choice(CORRUPTIONS), rng.randrange(64), rng.randrange(1, 256)] for _ in range(rng.randint(0, 3))]
+        return {
+            "seed": rng.randrange(1 << 32),
+            "protocol": {
+                "protocol": {
+                    "prefix": ":" if ascii_mode and rng.random() < 0.8 else rng.choice(PREFIXES),
+                    "suffix": "\r\n" if ascii_mode and rng.random() < 0.8 else rng.choice(SUFFIXES),
+                    "transmission_mode": Mode.ASCII.value if ascii_mode else Mode.HEX.value,
+                    "checksum_calculation": calculation,
+                    "prototype": prototypes,
+                    "device": devices,
+                }
+            },
+            "corruptions": corruptions,
+        }
+
+    def generate_prototype(self, rng: random.Random, name: str, calculation: str):
+        """
+        Generates a random prototype, a Modbus like frame of addressing fields, data and checksum.
+
+        Args:
+            rng (random.Random): The random generator.
+            name (str): The prototype name.
+            calculation (str): The checksum calculation of the protocol.
+        Returns:
+            dict: The prototype.
+        Raises:
+            None
+        """
+        prototype = {"name": name}
+        for direction in Direction:
+            segments = [{"name": "slave_address", "bits": 8}, {"name": "function", "bits": 8}]
+            for field in rng.sample(FIELD_NAMES, rng.randint(0, 3)):
+                segments.append({"name": field, "bits": rng.choice(FIELD_BITS)})
+            if rng.random() < 0.6:
+                segments.append({"name": "byte_count", "bits": 8})
+                segments.append({"name": "data_bytes", "bits": rng.choice((8, 8, 16))})
+            width = 16 if calculation == "CRC16" else 8
+            if rng.random() < 0.1:
+                width = 24 - width
+            segments.append({"name": "error_check", "bits": width})
+            prototype[direction.value] = segments
+        return prototype
+
+    def generate_message(self, rng: random.Random, prototype: dict):
+        """
+        Generates a random message of a prototype. Values mostly fit their segments, some do not, and some
+        are missing.
+
+        Args:
+            rng (random.Random): The random generator.
+            prototype (dict): The prototype.
+        Returns:
+            dict: The message.
+        Raises:
+            None
+        """
+        message = {"name": prototype["name"], "function": rng.randrange(1, 128), "length": rng.randint(0, 12)}
+        data_type = rng.choice(DATA_TYPES)
+        if data_type is not None:
+            message["data_type"] = data_type
+        bits = {segment["name"]: segment["bits"] for direction in Direction for segment in prototype[direction.value]}
+        for field in FIELD_NAMES:
+            if field in bits and field != "length" and rng.random() < 0.95:
+                message[field] = self.generate_value(rng, bits[field])
+        if rng.random() < 0.2:
+            # Explicit data bytes, as of a write request, sometimes of the wrong count
+            count = rng.randint(0, 24)
+            message["data"] = [rng.randrange(256) for _ in range(count)]
+        return message
+
+    def generate_value(self, rng: random.Random, bits: int):
+        """
+        Generates a random segment value, outside the segment range in a few cases.
+
+        Args:
+            rng (random.Random): The random generator.
+            bits (int): The segment width.
+        Returns:
+            int: The value.
+        Raises:
+            None
+        """
+        draw = rng.random()
+        if draw < 0.9:
+            return rng.randrange(1 << bits)
+        if draw < 0.95:
+            return (1 << bits) + rng.randrange(1 << 8)
+        return -rng.randint(1, 255)
+
+    def check(self, case: dict):
+        """
+        Runs a case through both backends.
+
+        Args:
+            case (dict): The case.
+        Returns:
+            list[Divergence]: Every divergence found, empty if the backends agree.
+        Raises:
+            Exception: Any exception raised while loading the protocol of the case.
+        """
+        reference = ReferenceBackend(case["protocol"])
+        fast = FastBackend(case["protocol"])
+        backends = (reference, fast)
+        pairs = [[(message, device) for device in backend.protocol.device for message in device.messages] for backend in backends]
+        divergences = []
+        # Messages, one at a time
+        frames = []
+        for backend in backends:
+            backend.protocol.set_seed(case["seed"])
+        for index, ((ref_message, ref_device), (fast_message, fast_device)) in enumerate(zip(*pairs)):
+            for direction in Direction:
+                expected, frame = self.call(reference.encode, direction, ref_message, ref_device)
+                actual, _ = self.call(fast.encode, direction, fast_message, fast_device)
+                self.compare(divergences, case, "encode", f"message {index} {direction.value}", expected, actual)
+                if frame is not None:
+                    frames.append((f"message {index} {direction.value}", direction, ref_message.name, frame))
+        # Messages, as a batch
+        for direction in Direction:
+            for backend in backends:
+                backend.protocol.set_seed(case["seed"])
+            expected, _ = self.call(reference.build, direction, pairs[0])
+            actual, _ = self.call(fast.build, direction, pairs[1])
+            self.compare(divergences, case, "batch", direction.value, expected, actual)
+        # Frames built, intact and corrupted
+        protocol = reference.protocol
+        for where, direction, name, frame in frames:
+            variants = [(where, frame)]
+            for corruption in case["corruptions"]:
+                variants.append((f"{where} {corruption[0]} {corruption[1]} {corruption[2]}", self.corrupt(frame, corruption)))
+            for label, variant in variants:
+                expected, _ = self.call(reference.decode, direction, name, variant)
+                actual, _ = self.call(fast.decode, direction, name, variant)
+                self.compare(divergences, case, "decode", label, expected, actual)
+                _, message = self.call(protocol.conversion.get_hex_message, variant, protocol.prefix, protocol.suffix)
+                if message is None:
+                    continue
+                data = bytes(message[len(protocol.prefix):])
+                self.compare(divergences, case, "crc16", label, self.call(reference.crc16, data)[0], self.call(fast.crc16, data)[0])
+        return divergences
+
+    def call(self, operation, *args):
+        """
+        Performs an operation, capturing its outcome.
+
+        Args:
+            operation (callable): The operation.
+            args: The arguments of the operation.
+        Returns:
+            tuple: The outcome, ("ok", value) or ("error", type, text), and the returned value or None.
+        Raises:
+            None
+        """
+        try:
+            value = operation(*args)
+        except Exception as e:
+            return ("error", type(e).__name__, str(e)), None
+        return ("ok", self.normalize(value)), value
+
+    def normalize(self, value):
+        """
+        Converts a returned value to a comparable JSON value, bytes as hexadecimal text.
+
+        Args:
+            value: The value.
+        Returns:
+            The JSON value.
+        Raises:
+            None
+        """
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value).hex().upper()
+        if isinstance(value, dict):
+            return {key: self.normalize(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.normalize(item) for item in value]
+        return value
+
+    def compare(self, divergences: list, case: dict, check: str, where: str, expected: tuple, actual: tuple):
+        """
+        Compares the outcomes of an operation on both backends, recording a divergence if they differ.
+
+        Args:
+            divergences (list[Divergence]): The divergences found so far.
+            case (dict): The case.
+            check (str): The name of the check.
+            where (str): The message and frame the operation was performed on.
+            expected (tuple): The outcome of the reference backend.
+            actual (tuple): The outcome of the fast backend.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.counters["checks"] += 1
+        if expected != actual:
+            divergences.append(Divergence(check, where, expected, actual, case))
+
+    def corrupt(self, frame: bytearray, corruption: list):
+        """
+        Applies a corruption to a copy of a frame.
+
+        Args:
+            frame (bytearray): The frame.
+            corruption (list): The kind, position and byte value of the corruption.
+        Returns:
+            bytearray: The corrupted frame.
+        Raises:
+            ValueError: If the kind of corruption is unknown.
+        """
+        kind, position, value = corruption
+        frame = bytearray(frame)
+        match kind:
+            case "flip":
+                if len(frame) > 0:
+                    frame[position % len(frame)] ^= value
+            case "truncate":
+                del frame[position % (len(frame) + 1):]
+            case "insert":
+                frame.insert(position % (len(frame) + 1), value)
+            case _:
+                raise ValueError(f"Oracle: unknown corruption {kind}")
+        return frame
+
+    def minimize(self, case: dict, check: str):
+        """
+        Shrinks a divergent case for as long as the same check still diverges.
+
+        Args:
+            case (dict): The divergent case.
+            check (str): The name of the diverging check.
+        Returns:
+            dict: The minimized case.
+        Raises:
+            None
+        """
+        shrinks = 0
+        progress = True
+        while progress and shrinks < self.max_shrinks:
+            progress = False
+            for candidate in self.get_candidates(case):
+                shrinks += 1
+                if self.diverges(candidate, check):
+                    case = candidate
+                    progress = True
+                    break
+                if shrinks >= self.max_shrinks:
+                    break
+        return case
+
+    def diverges(self, case: dict, check: str):
+        """
+        Checks whether a case diverges in a given check.
+
+        Args:
+            case (dict): The case.
+            check (str): The name of the check.
+        Returns:
+            bool: True if the check diverges, False otherwise, including when the case cannot be loaded.
+        Raises:
+            None
+        """
+        try:
+            return any(divergence.check == check for divergence in self.check(case))
+        except Exception:
+            return False
+
+    def get_candidates(self, case: dict):
+        """
+        Generates the simpler variants of a case, simplest first.
+
+        Args:
+            case (dict): The case.
+        Returns:
+            Generator of dict: The variants.
+        Raises:
+            None
+        """
+        protocol = case["protocol"]["protocol"]
+        # Corruptions
+        for index in range(len(case["corruptions"])):
+            yield self.replace(case, corruptions=case["corruptions"][:index] + case["corruptions"][index + 1:])
+        # Devices and messages
+        devices = protocol["device"]
+        for index in range(len(devices)):
+            if len(devices) > 1:
+                yield self.replace(case, device=devices[:index] + devices[index + 1:])
+            messages = devices[index]["message"]
+            for position in range(len(messages)):
+                if len(messages) > 1:
+                    device = dict(devices[index], message=messages[:position] + messages[position + 1:])
+                    yield self.replace(case, device=devices[:index] + [device] + devices[index + 1:])
+        # Prototypes no message refers to
+        names = {message["name"] for device in devices for message in device["message"]}
+        unused = [prototype for prototype in protocol["prototype"] if prototype["name"] not in names]
+        if unused:
+            yield self.replace(case, prototype=[prototype for prototype in protocol["prototype"] if prototype["name"] in names])
+        # Segments
+        for index, prototype in enumerate(protocol["prototype"]):
+            for direction in Direction:
+                segments = prototype[direction.value]
+                for position in range(len(segments)):
+                    candidate = dict(prototype, **{direction.value: segments[:position] + segments[position + 1:]})
+                    yield self.replace(case, prototype=protocol["prototype"][:index] + [candidate] + protocol["prototype"][index + 1:])
+        # Message fields and values
+        for index, device in enumerate(devices):
+            if device.get("address", 0) != 0:
+                yield self.replace(case, device=devices[:index] + [dict(device, address=0)] + devices[index + 1:])
+            for position, message in enumerate(device["message"]):
+                for key, value in message.items():
+                    if key == "name":
+                        continue
+                    variants = [{k: v for k, v in message.items() if k != key}]
+                    if isinstance(value, int) and value != 0:
+                        variants += [dict(message, **{key: 0}), dict(message, **{key: value // 2})]
+                    if isinstance(value, list) and value:
+                        variants.append(dict(message, **{key: value[:len(value) // 2]}))
+                    for variant in variants:
+                        candidate = dict(device, message=device["message"][:position] + [variant] + device["message"][position + 1:])
+                        yield self.replace(case, device=devices[:index] + [candidate] + devices[index + 1:])
+        # Framing and seed
+        for key in ("prefix", "suffix"):
+            if protocol.get(key):
+                yield self.replace(case, **{key: ""})
+        if case["seed"] != 0:
+            yield dict(case, seed=0)
+
+    def replace(self, case: dict, corruptions: list = None, **fields):
+        """
+        Copies a case, replacing its corruptions or fields of its protocol.
+
+        Args:
+            case (dict): The case.
+            corruptions (list): The corruptions of the copy, or None to keep those of the case.
+            fields: The protocol fields of the copy, such as prototype or device.
+        Returns:
+            dict: The copy.
+        Raises:
+            None
+        """
+        protocol = dict(case["protocol"]["protocol"], **fields)
+        return dict(case, protocol={"protocol": protocol}, corruptions=case["corruptions"] if corruptions is None else corruptions)
+
+    def log(self):
+        """
+        Outputs the oracle counters.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.logger.info("Oracle: %s", ", ".join(f"{name}={count}" for name, count in self.counters.items()))
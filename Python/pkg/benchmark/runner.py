@@ -0,0 +1,273 @@
+"""
+    Package 'benchmark' provides mechanism's for measuring and comparing the performance of the DONP implementation.
+"""
+
+import hashlib
+import math
+import os
+import re
+import statistics
+import subprocess
+import tempfile
+import time
+
+"""
+    Objects of class Implementation describe how to invoke one existing, already built, DONP implementation.
+    An implementation not honouring DONP_SEED and DONP_PROTOCOL always reads the file of its active protocol.
+"""
+
+class Implementation:
+
+    def __init__(self, name: str, directory: str, command: list[str], seeded: bool = False, active: str = None, arguments: list[str] = None):
+        self.name = name
+        self.directory = directory
+        self.command = command
+        # Passed after the command, e.g. to keep an implementation from caching its parsed protocol between runs
+        self.arguments = arguments if arguments is not None else []
+        # Whether the implementation honours DONP_SEED and DONP_PROTOCOL, making its received frames reproducible
+        self.seeded = seeded
+        # The protocol file read by an implementation not honouring DONP_PROTOCOL
+        self.active = active
+
+    def is_available(self):
+        """
+        Checks whether the implementation's executable or script exists.
+
+        Args:
+            None
+        Returns:
+            bool: True if the implementation can be invoked, False otherwise.
+        Raises:
+            None
+        """
+        target = self.command[-1]
+        return os.path.isdir(self.directory) and os.path.exists(os.path.join(self.directory, target))
+
+    def reads(self, protocol: str):
+        """
+        Checks whether the implementation reads the given protocol file.
+
+        Args:
+            protocol (str): The protocol file path.
+        Returns:
+            bool: True if the implementation honours DONP_PROTOCOL or its active protocol is the file, False otherwise.
+        Raises:
+            None
+        """
+        if self.seeded:
+            return True
+        return self.active is not None and os.path.abspath(self.active) == os.path.abspath(protocol)
+
+"""
+    Objects of class Runner invoke each implementation repeatedly, after warm-up runs, with the same protocol
+    file and seed, measuring wall, user and system time and peak resident memory of every child process.
+
+    The frames logged by each implementation are compared to ensure all implementations did the same work.
+    Only the Python implementation honours DONP_SEED and DONP_PROTOCOL so far: the others are left out of the
+    run for any protocol file other than their active one, and out of the receive frame comparison, as their
+    simulated responses are random. Both are listed in the results. Receive frames are thus only compared
+    once two seeded implementations ran, so across languages the comparison covers transmit frames only,
+    as the directions listed in the results say.
+"""
+
+FRAME_PATTERN = re.compile(r"Simulated (TX|RX): ([0-9A-Fa-f]+)")
+
+class Runner:
+
+    def __init__(self, implementations: list[Implementation], protocol: str, seed: int, logger, warmup: int = 1, repeat: int = 10, confidence: float = 0.95):
+        # Setup logger
+        self.logger = logger
+        # Initialize runner fields
+        self.implementations = implementations
+        self.protocol = protocol
+        self.seed = seed
+        self.warmup = warmup
+        self.repeat = repeat
+        self.confidence = confidence
+
+    def run(self):
+        """
+        Runs every available implementation and summarises the measurements.
+
+        Args:
+            None
+        Returns:
+            dict: The results document, including per-run samples, summaries and the frame comparison.
+        Raises:
+            None
+        """
+        results = {
+            "protocol": self.protocol,
+            "protocol_sha256": self.get_file_hash(self.protocol),
+            "seed": self.seed,
+            "warmup": self.warmup,
+            "repeat": self.repeat,
+            "confidence": self.confidence,
+            "implementations": {},
+            "excluded": [],
+        }
+        frames = {}
+        for implementation in self.implementations:
+            if not implementation.is_available():
+                self.logger.warning("Runner: %s is not built, skipping", implementation.name)
+                continue
+            if not implementation.reads(self.protocol):
+                self.logger.warning("Runner: %s ignores DONP_PROTOCOL and reads %s, skipping", implementation.name, implementation.active)
+                results["excluded"].append(implementation.name)
+                continue
+            for _ in range(self.warmup):
+                self.invoke(implementation)
+            runs = []
+            for _ in range(self.repeat):
+                run, output = self.invoke(implementation)
+                runs.append(run)
+                if implementation.name not in frames:
+                    frames[implementation.name] = self.get_frames(output)
+            results["implementations"][implementation.name] = {"runs": runs, "summary": self.summarize(runs)}
+        results["frames"] = self.compare_frames(frames)
+        if results["protocol_sha256"] != self.get_file_hash(self.protocol):
+            self.logger.error("Runner: protocol file %s changed during the run", self.protocol)
+            results["frames"]["identical"] = False
+        return results
+
+    def invoke(self, implementation: Implementation):
+        """
+        Invokes an implementation once, reaping the child directly to obtain its own resource usage.
+
+        Args:
+            implementation (Implementation): The implementation to invoke.
+        Returns:
+            dict, str: The measurements of the run, and its combined output.
+        Raises:
+            RuntimeError: If the implementation exits with a non-zero status.
+        """
+        env = dict(os.environ)
+        env["DONP_SEED"] = str(self.seed)
+        env["DONP_PROTOCOL"] = os.path.abspath(self.protocol)
+        with tempfile.TemporaryFile() as output:
+            begin = time.perf_counter()
+            process = subprocess.Popen(implementation.command + implementation.arguments, cwd=implementation.directory, env=env, stdout=output, stderr=subprocess.STDOUT)
+            _, status, usage = os.wait4(process.pid, 0)
+            wall = time.perf_counter() - begin
+            process.returncode = os.waitstatus_to_exitcode(status)
+            output.seek(0)
+            text = output.read().decode("utf-8", errors="replace")
+        if process.returncode != 0:
+            raise RuntimeError(f"Runner: {implementation.name} exited with status {process.returncode}")
+        # ru_maxrss is reported in kilobytes on Linux
+        run = {"wall": wall, "user": usage.ru_utime, "sys": usage.ru_stime, "max_rss_kb": usage.ru_maxrss}
+        self.logger.debug("Runner: %s %s", implementation.name, run)
+        return run, text
+
+    def summarize(self, runs: list[dict]):
+        """
+        Computes the median and a distribution-free confidence interval of each measurement.
+
+        Args:
+            runs (list[dict]): The measurements of each run.
+        Returns:
+            dict: The summary of each measurement.
+        Raises:
+            None
+        """
+        summary = {}
+        for key in ("wall", "user", "sys", "max_rss_kb"):
+            samples = sorted(run[key] for run in runs)
+            low, high = self.get_median_interval(samples)
+            summary[key] = {"median": statistics.median(samples), "low": low, "high": high, "min": samples[0], "max": samples[-1]}
+        return summary
+
+    def get_median_interval(self, samples: list[float]):
+        """
+        Computes the confidence interval of the median from order statistics, without assuming a distribution.
+        When too few samples are available for the requested confidence, the full range is returned.
+
+        Args:
+            samples (list[float]): The sorted samples.
+        Returns:
+            float, float: The lower and upper bounds.
+        Raises:
+            None
+        """
+        n = len(samples)
+        alpha = 1.0 - self.confidence
+        # Largest rank j such that P(Binomial(n, 0.5) < j) <= alpha / 2
+        rank = 0
+        cumulative = 0.0
+        for j in range(n):
+            cumulative += math.comb(n, j) / 2 ** n
+            if cumulative > alpha / 2:
+                break
+            rank = j + 1
+        if rank == 0:
+            return samples[0], samples[-1]
+        return samples[rank - 1], samples[n - rank]
+
+    def get_frames(self, output: str):
+        """
+        Extracts the logged transmit and receive frames from an implementation's output.
+
+        Args:
+            output (str): The implementation output.
+        Returns:
+            dict: The transmit and receive frames, in order.
+        Raises:
+            None
+        """
+        frames = {"TX": [], "RX": []}
+        for match in FRAME_PATTERN.finditer(output):
+            frames[match.group(1)].append(match.group(2).upper())
+        return frames
+
+    def compare_frames(self, frames: dict):
+        """
+        Compares the frames emitted by each implementation. Transmit frames are fully determined by the
+        protocol file, received frames only for implementations honouring the seed.
+
+        Args:
+            frames (dict): The frames of each implementation.
+        Returns:
+            dict: The comparison, with the directions compared, the implementations diverging from the first
+                one and those whose received frames were not compared.
+        Raises:
+            None
+        """
+        seeded = {implementation.name for implementation in self.implementations if implementation.seeded}
+        compared = [name for name in frames if name in seeded]
+        comparison = {"identical": True, "directions": ["TX", "RX"] if len(compared) > 1 else ["TX"], "reference": None,
+                      "tx_mismatch": [], "rx_mismatch": [], "rx_unchecked": [name for name in frames if name not in seeded]}
+        reference = None
+        rx_reference = None
+        for name, emitted in frames.items():
+            if len(emitted["TX"]) == 0:
+                self.logger.error("Runner: %s logged no frames", name)
+                comparison["tx_mismatch"].append(name)
+                continue
+            if reference is None:
+                reference = emitted
+                comparison["reference"] = name
+            elif emitted["TX"] != reference["TX"]:
+                self.logger.error("Runner: %s transmit frames differ from %s", name, comparison["reference"])
+                comparison["tx_mismatch"].append(name)
+            if name in seeded:
+                if rx_reference is None:
+                    rx_reference = emitted["RX"]
+                elif emitted["RX"] != rx_reference:
+                    self.logger.error("Runner: %s receive frames differ for seed %d", name, self.seed)
+                    comparison["rx_mismatch"].append(name)
+        comparison["identical"] = len(comparison["tx_mismatch"]) == 0 and len(comparison["rx_mismatch"]) == 0
+        return comparison
+
+    def get_file_hash(self, path: str):
+        """
+        Computes the SHA-256 digest of a file.
+
+        Args:
+            path (str): The file path.
+        Returns:
+            str: The hexadecimal digest.
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
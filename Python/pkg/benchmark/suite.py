@@ -0,0 +1,301 @@
+"""
+    Package 'benchmark' provides mechanism's for measuring and comparing the performance of the DONP implementation.
+"""
+
+import copy
+import json
+import platform
+import statistics
+import time
+from constants import Direction
+from pkg.component.batch import FrameBatch
+from pkg.component.protocol import Protocol
+from pkg.transform.codegen import Compiler
+
+FORMAT_VERSION = 1
+
+"""
+    Objects of class Benchmark time callables with warm-up and repetition, collect the results in a
+    machine-readable form, and compare them against a previously stored baseline.
+
+    Micro-benchmarks time a small callable many times per sample (calibrated automatically), while
+    macro-benchmarks time a single call per sample, such as a whole poll cycle.
+"""
+
+class Benchmark:
+
+    def __init__(self, logger, warmup: int = 3, repeat: int = 10, min_sample_time: float = 0.05):
+        # Setup logger
+        self.logger = logger
+        # Initialize benchmark fields
+        self.warmup = warmup
+        self.repeat = repeat
+        self.min_sample_time = min_sample_time
+        self.results = []
+
+    def measure(self, name: str, func, kind: str = "micro", number: int = None, warmup: int = None, repeat: int = None):
+        """
+        Times a callable with warm-up and repetition, and records the result.
+
+        Args:
+            name (str): The benchmark name.
+            func (callable): The callable to time, invoked without arguments.
+            kind (str): The benchmark kind, "micro" or "macro".
+            number (int): Calls per sample, calibrated automatically when None.
+            warmup (int): Warm-up samples, defaults to the configured warm-up.
+            repeat (int): Timed samples, defaults to the configured repetition.
+        Returns:
+            dict: The recorded result.
+        Raises:
+            ValueError: If repeat is less than one.
+        """
+        warmup = self.warmup if warmup is None else warmup
+        repeat = self.repeat if repeat is None else repeat
+        if repeat < 1:
+            raise ValueError("Benchmark: repeat must be at least one")
+        if number is None:
+            number = self.calibrate(func)
+        for _ in range(warmup):
+            self.time_calls(func, number)
+        samples = []
+        for _ in range(repeat):
+            samples.append(self.time_calls(func, number) / number)
+        result = {
+            "name": name,
+            "kind": kind,
+            "number": number,
+            "repeat": repeat,
+            "min": min(samples),
+            "median": statistics.median(samples),
+            "mean": statistics.fmean(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            "samples": samples,
+        }
+        self.results.append(result)
+        self.logger.info("Benchmark: %s median=%.9f seconds (n=%d x %d)", name, result["median"], repeat, number)
+        return result
+
+    def time_calls(self, func, number: int):
+        """
+        Times a number of consecutive calls.
+
+        Args:
+            func (callable): The callable to time.
+            number (int): The number of calls.
+        Returns:
+            float: The total elapsed time in seconds.
+        Raises:
+            None
+        """
+        begin = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - begin
+
+    def calibrate(self, func):
+        """
+        Determines how many calls make a sample last at least the minimum sample time.
+
+        Args:
+            func (callable): The callable to time.
+        Returns:
+            int: The number of calls per sample.
+        Raises:
+            None
+        """
+        number = 1
+        while True:
+            if self.time_calls(func, number) >= self.min_sample_time:
+                return number
+            number *= 10
+
+    def to_json(self):
+        """
+        Builds the machine-readable representation of the recorded results.
+
+        Args:
+            None
+        Returns:
+            dict: The results document.
+        Raises:
+            None
+        """
+        return {
+            "format_version": FORMAT_VERSION,
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": self.results,
+        }
+
+    def write(self, path: str):
+        """
+        Writes the recorded results to a JSON file.
+
+        Args:
+            path (str): The output file path.
+        Returns:
+            None
+        Raises:
+            OSError: If the file cannot be written.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def compare(self, baseline: dict, threshold: float):
+        """
+        Compares the recorded medians against a baseline document.
+
+        Args:
+            baseline (dict): A results document previously produced by to_json.
+            threshold (float): The allowed relative slowdown, e.g. 0.10 for ten percent.
+        Returns:
+            list[dict]: The regressions, one entry per benchmark exceeding the threshold.
+        Raises:
+            ValueError: If the baseline format version is not supported.
+        """
+        if baseline.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Benchmark: unsupported baseline format version {baseline.get('format_version')}")
+        reference = {}
+        for result in baseline.get("results", []):
+            reference[result["name"]] = result
+        regressions = []
+        for result in self.results:
+            base = reference.get(result["name"])
+            if base is None or base["median"] <= 0:
+                self.logger.info("Benchmark: %s has no baseline", result["name"])
+                continue
+            change = (result["median"] - base["median"]) / base["median"]
+            if change > threshold:
+                regressions.append({"name": result["name"], "baseline": base["median"], "current": result["median"], "change": change})
+                self.logger.warning("Benchmark: %s regressed by %.1f%%", result["name"], change * 100)
+            else:
+                self.logger.info("Benchmark: %s changed by %+.1f%%", result["name"], change * 100)
+        return regressions
+
+"""
+    Objects of class Suite register the DONP micro and macro benchmarks against a Benchmark object.
+"""
+
+class Suite:
+
+    def __init__(self, benchmark: Benchmark, rtu: dict, ascii_config: dict, logger):
+        # Setup logger
+        self.logger = logger
+        # Initialize suite fields
+        self.benchmark = benchmark
+        self.rtu = rtu
+        self.ascii_config = ascii_config
+
+    def run_micro(self):
+        """
+        Runs the micro-benchmarks for checksums, conversion, segment encoding and byte counts.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        rtu = Protocol(self.rtu)
+        asc = Protocol(self.ascii_config)
+        device = rtu.device[0]
+        message = device.messages[0]
+        prototype = rtu.get_prototype(message.name)
+        segments = prototype.get_segments(Direction.TX)
+        frame = bytearray(range(256))
+        ascii_frame = asc.get_message_from_prototype(asc.get_prototype(message.name), Direction.TX, asc.device[0].messages[0], asc.device[0])
+        hex_frame = asc.conversion.get_hex_message(ascii_frame, asc.prefix, asc.suffix)
+        self.benchmark.measure("checksum.calculate_crc16[256]", lambda: rtu.checksum.calculate_crc16(frame))
+        self.benchmark.measure("checksum.calculate_lrc[256]", lambda: asc.checksum.calculate_lrc(frame))
+        self.benchmark.measure("conversion.from_hex_to_ascii", lambda: asc.conversion.from_hex_to_ascii(hex_frame, asc.prefix, asc.suffix))
+        self.benchmark.measure("conversion.from_ascii_to_hex", lambda: asc.conversion.from_ascii_to_hex(ascii_frame, asc.prefix, asc.suffix))
+        self.benchmark.measure("protocol.append_segments_to_byte_array", lambda: rtu.append_segments_to_byte_array(bytearray(), segments, message, device))
+        self.benchmark.measure("message.get_data_byte_count", message.get_data_byte_count)
+        # Interpreted and generated encoding and decoding of the same messages
+        compiler = Compiler(rtu, self.logger)
+        rx_frame = rtu.get_message_from_prototype(prototype, Direction.RX, message, device)
+        rx_body = rx_frame[len(rtu.prefix):len(rx_frame) - len(rtu.suffix)]
+        self.benchmark.measure("checksum.calculate_crc16_table[256]", lambda: rtu.checksum.calculate_crc16_table(frame))
+        self.benchmark.measure("protocol.get_message_from_prototype", lambda: rtu.get_message_from_prototype(prototype, Direction.TX, message, device))
+        self.benchmark.measure("compiler.encode", lambda: compiler.encode(prototype, Direction.TX, message, device))
+        self.benchmark.measure("prototype.decode", lambda: prototype.decode(Direction.RX, rx_body))
+        self.benchmark.measure("compiler.decode", lambda: compiler.decode(prototype, Direction.RX, rx_body))
+
+    def run_macro(self, sizes: list[int], repeat: int = None):
+        """
+        Runs whole poll cycles over synthetic fleets of the given message counts.
+
+        Args:
+            sizes (list[int]): The message counts to benchmark.
+            repeat (int): Timed poll cycles per size, defaults to the benchmark repetition.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        for size in sizes:
+            protocol = Protocol(self.get_fleet(self.rtu, size))
+            protocol.set_messages_from_prototype(Direction.TX)
+            self.benchmark.measure(f"protocol.poll_cycle[{size}]", lambda: self.poll_cycle(protocol), kind="macro", number=1, warmup=1, repeat=repeat)
+            # Simulated received messages of a whole cycle in one buffer, reused across cycles
+            batch = FrameBatch()
+            self.benchmark.measure(f"protocol.build_frames[{size}]", lambda: protocol.build_frames(Direction.RX, batch=self.clear(batch)), kind="macro", number=1, warmup=1, repeat=repeat)
+
+    def poll_cycle(self, protocol: Protocol):
+        """
+        Performs one transaction for every message of every device.
+
+        Args:
+            protocol (Protocol): The protocol to poll.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        for device in protocol.device:
+            for msg in device.messages:
+                protocol.transact(msg, device)
+
+    def clear(self, batch: FrameBatch):
+        """
+        Clears a frame batch for reuse.
+
+        Args:
+            batch (FrameBatch): The frame batch.
+        Returns:
+            FrameBatch: The cleared frame batch.
+        Raises:
+            None
+        """
+        batch.clear()
+        return batch
+
+    def get_fleet(self, config: dict, size: int):
+        """
+        Builds a protocol configuration holding exactly the given number of messages, by repeating
+        the messages of the configured devices across additional devices.
+
+        Args:
+            config (dict): The protocol configuration to replicate.
+            size (int): The total number of messages.
+        Returns:
+            dict: The synthetic protocol configuration.
+        Raises:
+            ValueError: If the configuration holds no messages.
+        """
+        fleet = copy.deepcopy(config)
+        template = []
+        for device in config["protocol"]["device"]:
+            template.extend(device["message"])
+        if len(template) == 0:
+            raise ValueError("Suite: unable to build a fleet without messages")
+        devices = []
+        remaining = size
+        while remaining > 0:
+            count = min(len(template), remaining)
+            devices.append({"name": f"dev{len(devices) + 1}", "address": len(devices) % 247 + 1, "message": template[:count]})
+            remaining -= count
+        fleet["protocol"]["device"] = devices
+        return fleet
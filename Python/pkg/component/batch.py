@@ -0,0 +1,114 @@
+"""
+    Package 'component' provides definitions for various objects meeting the definition of a protocol component.
+"""
+
+from array import array
+
+"""
+    Objects of class FrameBatch hold the frames of a poll cycle, or of any list of messages, back to back in a
+    single contiguous buffer, with the offset and length of each frame in two parallel arrays.
+
+    Frames are handed out as memoryviews of the buffer, so that they can be passed to vectorized checksums,
+    to os.writev or socket.sendmsg, or written to a capture file in one call without copying each frame.
+    The buffer must not be resized while views of it are alive.
+"""
+
+class FrameBatch:
+
+    __slots__ = ("buffer", "offsets", "lengths")
+
+    def __init__(self):
+        self.buffer = bytearray()
+        # Unsigned 64 bit offsets and 32 bit lengths
+        self.offsets = array("Q")
+        self.lengths = array("I")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def add(self, start: int):
+        """
+        Records the bytes appended to the buffer since start as the next frame.
+
+        Args:
+            start (int): The buffer length before the frame was appended.
+        Returns:
+            int: The index of the frame.
+        Raises:
+            None
+        """
+        self.offsets.append(start)
+        self.lengths.append(len(self.buffer) - start)
+        return len(self.offsets) - 1
+
+    def append(self, frame: bytes):
+        """
+        Copies a frame to the end of the buffer.
+
+        Args:
+            frame (bytes): The frame.
+        Returns:
+            int: The index of the frame.
+        Raises:
+            None
+        """
+        start = len(self.buffer)
+        self.buffer += frame
+        return self.add(start)
+
+    def get_frame(self, index: int):
+        """
+        Retrieves a frame without copying it.
+
+        Args:
+            index (int): The index of the frame.
+        Returns:
+            memoryview: A view of the frame within the buffer.
+        Raises:
+            IndexError: If there is no frame at the index.
+        """
+        offset = self.offsets[index]
+        return memoryview(self.buffer)[offset:offset + self.lengths[index]]
+
+    def get_frames(self):
+        """
+        Retrieves every frame without copying it, e.g. as the buffers of os.writev or socket.sendmsg.
+        Both calls accept at most os.sysconf("SC_IOV_MAX") buffers at a time.
+
+        Args:
+            None
+        Returns:
+            list[memoryview]: A view of each frame within the buffer.
+        Raises:
+            None
+        """
+        view = memoryview(self.buffer)
+        return [view[offset:offset + length] for offset, length in zip(self.offsets, self.lengths)]
+
+    def write(self, stream):
+        """
+        Writes every frame, back to back, to a binary stream such as a capture file.
+
+        Args:
+            stream: The binary stream.
+        Returns:
+            int: The number of bytes written.
+        Raises:
+            OSError: If the stream cannot be written.
+        """
+        return stream.write(self.buffer)
+
+    def clear(self):
+        """
+        Removes every frame, keeping the batch for reuse in the next poll cycle.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            BufferError: If views of the buffer are still alive.
+        """
+        del self.buffer[:]
+        del self.offsets[:]
+        del self.lengths[:]
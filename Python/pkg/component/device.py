@@ -10,15 +10,20 @@ import json
 
     Required fields: message, which defines the messages associated with the device.
     Optional fields: name, address.
+
+    The protocol field tags the device with the protocol it belongs to, when several protocols run together.
 """
 
 class Device:
 
+    __slots__ = ("logger", "name", "address", "messages", "protocol")
+
     def __init__(self, config: json, logger):
         # Setup logger
         self.logger = logger
         # Initialize device fields
         self.messages = []
+        self.protocol = ""
         # Ensure all required fields are present
         if 'message' in config:
             # Initialize optional prototype fields
@@ -44,7 +49,11 @@ class Device:
                 self.logger.warning("Device: Failed to create message for device: %s", self.name)
 
     def __init_message(self, device: json):
-        self.messages.append(Message(device, self.logger))
+        try:
+            self.messages.append(Message(device, self.logger))
+        except AttributeError as e:
+            # Name the device, as messages of the same prototype are repeated across devices
+            raise AttributeError(f"Device: {self.name}: {e}") from None
         
         
     def log(self):
@@ -61,3 +70,57 @@ class Device:
         self.logger.debug(f"Device: {self.name}, Address: {self.address}")
         for msg in self.messages:
             msg.log()
+
+
+"""
+    Objects of class LazyDevice stand in for a Device whose messages are materialised on first use.
+    The device configuration is validated when the handle is created, then kept as compact JSON text
+    instead of Message objects until the messages are first needed, typically on the first poll.
+"""
+
+class LazyDevice:
+
+    __slots__ = ("logger", "name", "address", "config", "device", "protocol")
+
+    def __init__(self, config: json, logger):
+        # Validate the configuration once, discarding the resulting objects
+        device = Device(config, logger)
+        self.logger = logger
+        self.name = device.name
+        self.address = device.address
+        self.config = json.dumps(config, separators=(",", ":"))
+        self.device = None
+        self.protocol = ""
+
+    @property
+    def messages(self):
+        """
+        Materialises the device on first access and returns its messages.
+
+        Args:
+            None
+        Returns:
+            list[Message]: The device messages.
+        Raises:
+            None
+        """
+        if self.device is None:
+            self.device = Device(json.loads(self.config), self.logger)
+            self.config = None
+        return self.device.messages
+
+    def log(self):
+        """
+        Logs device information.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.logger.debug(f"Device: {self.name}, Address: {self.address}")
+        if self.device is not None:
+            for msg in self.device.messages:
+                msg.log()
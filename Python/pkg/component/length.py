@@ -0,0 +1,251 @@
+"""
+    Package 'component' provides definitions for various objects meeting the definition of a protocol component.
+"""
+
+from constants import Direction, Mode
+
+"""
+    Objects of class FrameLength hold the exact size of a response frame, including prefix, suffix and
+    checksum, in both transmission modes, for the regular response and for an exception response.
+
+    In ascii mode every byte of the frame is sent as two hexadecimal characters, as the Conversion class
+    does. The function code is found at function_offset bytes into the frame in hex mode, and tells a
+    reader which of the two sizes applies as soon as it arrived. Without a function code, function_offset is
+    None and the regular size always applies.
+"""
+
+# Modbus exception responses carry the function code with the high bit set and a one byte exception code
+EXCEPTION_FLAG = 0x80
+EXCEPTION_CODE_BYTES = 1
+
+class FrameLength:
+
+    __slots__ = ("hex", "ascii", "exception_hex", "exception_ascii", "function_offset")
+
+    def __init__(self, size: int, exception_size: int, function_offset: int):
+        self.hex = size
+        self.ascii = size * 2
+        self.exception_hex = exception_size
+        self.exception_ascii = exception_size * 2
+        self.function_offset = function_offset
+
+    def get_size(self, mode: str):
+        """
+        Retrieves the size of the regular response.
+
+        Args:
+            mode (str): The transmission mode.
+        Returns:
+            int: The size in bytes.
+        Raises:
+            None
+        """
+        return self.ascii if mode == Mode.ASCII.value else self.hex
+
+    def get_exception_size(self, mode: str):
+        """
+        Retrieves the size of an exception response.
+
+        Args:
+            mode (str): The transmission mode.
+        Returns:
+            int: The size in bytes.
+        Raises:
+            None
+        """
+        return self.exception_ascii if mode == Mode.ASCII.value else self.exception_hex
+
+    def get_header_size(self, mode: str):
+        """
+        Retrieves the number of bytes to read before the size of the response is known, up to and
+        including the function code.
+
+        Args:
+            mode (str): The transmission mode.
+        Returns:
+            int: The size in bytes.
+        Raises:
+            None
+        """
+        if self.function_offset is None:
+            return 0
+        size = self.function_offset + 1
+        return size * 2 if mode == Mode.ASCII.value else size
+
+    def resolve(self, head: bytes, mode: str):
+        """
+        Determines the size of a response from its first bytes.
+
+        Args:
+            head (bytes): The bytes received so far, at least get_header_size bytes.
+            mode (str): The transmission mode.
+        Returns:
+            int: The size of the response in bytes, or None if too few bytes were received.
+        Raises:
+            ValueError: If the function code is not valid hexadecimal in ascii mode.
+        """
+        if len(head) < self.get_header_size(mode):
+            return None
+        if self.function_offset is None:
+            return self.get_size(mode)
+        if self.get_function(head, mode) & EXCEPTION_FLAG:
+            return self.get_exception_size(mode)
+        return self.get_size(mode)
+
+    def get_function(self, head: bytes, mode: str):
+        """
+        Retrieves the function code of a response from its first bytes.
+
+        Args:
+            head (bytes): The bytes received so far, at least get_header_size bytes.
+            mode (str): The transmission mode.
+        Returns:
+            int: The function code, with the exception flag set for an exception response, or None if the
+            response has no function code or too few bytes were received.
+        Raises:
+            ValueError: If the function code is not valid hexadecimal in ascii mode.
+        """
+        if self.function_offset is None or len(head) < self.get_header_size(mode):
+            return None
+        if mode == Mode.ASCII.value:
+            return int(head[self.function_offset * 2:self.function_offset * 2 + 2], 16)
+        return head[self.function_offset]
+
+"""
+    Objects of class ResponseLengthIndex hold the expected response length of every device message of a
+    protocol, computed from the receive segments of its prototype and the message length and data type.
+    Transports and decoders look up the length by message, or by the request fields when only the request
+    frame is at hand, and complete a frame as soon as its last byte arrived instead of waiting for an idle
+    gap or the timeout.
+"""
+
+class ResponseLengthIndex:
+
+    def __init__(self, protocol, logger):
+        # Setup logger
+        self.logger = logger
+        # Initialize index fields
+        self.protocol = protocol
+        self.messages = {}
+        self.requests = {}
+
+    def build(self):
+        """
+        Computes the response length of every device message. Lazily loaded devices are materialised.
+
+        Args:
+            None
+        Returns:
+            ResponseLengthIndex: The index itself.
+        Raises:
+            None
+        """
+        for device in self.protocol.device:
+            for msg in device.messages:
+                self.add(msg, device)
+        self.logger.debug("ResponseLengthIndex: indexed %d messages", len(self.messages))
+        return self
+
+    def add(self, message, device):
+        """
+        Computes and stores the response length of a message.
+
+        Args:
+            message (Message): The message object.
+            device (Device): The device object.
+        Returns:
+            FrameLength: The response length, or None if the message has no prototype.
+        Raises:
+            None
+        """
+        prototype = self.protocol.get_prototype(message.name)
+        if prototype is None:
+            return None
+        length = self.get_frame_length(prototype, message)
+        self.messages[message] = length
+        if hasattr(message, "function") and hasattr(message, "starting_address") and hasattr(message, "length"):
+            self.requests[(device.address, message.function, message.starting_address, message.length)] = length
+        return length
+
+    def remove(self, message, device):
+        """
+        Drops the response length of a message, e.g. of a device message removed on a reload.
+
+        Args:
+            message (Message): The message object.
+            device (Device): The device object, at the address the message was indexed with.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        length = self.messages.pop(message, None)
+        if hasattr(message, "function") and hasattr(message, "starting_address") and hasattr(message, "length"):
+            key = (device.address, message.function, message.starting_address, message.length)
+            # Another message of the same request may have been indexed since
+            if length is not None and self.requests.get(key) is length:
+                del self.requests[key]
+
+    def get(self, message, device=None):
+        """
+        Retrieves the response length of a message, computing it on first use if the device is given.
+
+        Args:
+            message (Message): The message object.
+            device (Device): The device object, or None to only look up indexed messages.
+        Returns:
+            FrameLength: The response length, or None if unknown.
+        Raises:
+            None
+        """
+        length = self.messages.get(message)
+        if length is None and device is not None:
+            length = self.add(message, device)
+        return length
+
+    def get_by_request(self, address: int, function: int, starting_address: int, length: int):
+        """
+        Retrieves the response length of a request by its fields, as decoded from a request frame.
+
+        Args:
+            address (int): The device address.
+            function (int): The function code.
+            starting_address (int): The starting address.
+            length (int): The quantity of bits or registers.
+        Returns:
+            FrameLength: The response length, or None if no device message matches.
+        Raises:
+            None
+        """
+        return self.requests.get((address, function, starting_address, length))
+
+    def get_frame_length(self, prototype, message):
+        """
+        Computes the response length of a message from the receive segments of its prototype.
+
+        Args:
+            prototype (Prototype): The prototype object.
+            message (Message): The message object.
+        Returns:
+            FrameLength: The response length.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        framing = len(protocol.prefix) + len(protocol.suffix)
+        size = 0
+        header = 0
+        function_offset = None
+        for segment in prototype.get_segments(Direction.RX):
+            if segment.name == "data_bytes":
+                size += (segment.bits * message.get_data_byte_count() + 7) // 8
+            else:
+                size += segment.bits // 8
+            if segment.name == "function":
+                function_offset = size - 1
+                header = size
+        if function_offset is None:
+            # Without a function segment there is no exception response to tell apart
+            return FrameLength(size + framing, size + framing, None)
+        exception_size = header + EXCEPTION_CODE_BYTES + protocol.checksum.get_size_of_checksum()
+        return FrameLength(size + framing, exception_size + framing, function_offset + len(protocol.prefix))
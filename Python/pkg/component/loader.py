@@ -0,0 +1,211 @@
+"""
+    Package 'component' provides definitions for various objects meeting the definition of a protocol component.
+"""
+
+import json
+from pkg.component.device import Device, LazyDevice
+from pkg.component.protocol import Protocol
+
+"""
+    Objects of class Loader build a Protocol object from a protocol file incrementally. The protocol fields
+    and prototypes are decoded as usual, while the device array is decoded and validated one device at a
+    time, so that peak memory while loading is bounded by a single device rather than by the whole file.
+
+    Each device is either materialised straight away, or kept as a lazy handle holding its compact JSON text
+    until its messages are first needed.
+"""
+
+class Loader:
+
+    def __init__(self, path: str, logger, lazy: bool = False, chunk_size: int = 1 << 16):
+        # Setup logger
+        self.logger = logger
+        # Initialize loader fields
+        self.path = path
+        self.lazy = lazy
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.stream = None
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def load(self):
+        """
+        Loads the protocol file.
+
+        Args:
+            None
+        Returns:
+            Protocol: The protocol object.
+        Raises:
+            AttributeError: If a required field is missing.
+            ValueError: If the file is not valid JSON.
+        """
+        header = None
+        devices = None
+        with open(self.path, "r", encoding="utf-8") as stream:
+            self.stream = stream
+            self.buffer = ""
+            self.position = 0
+            self.eof = False
+            self.expect("{")
+            for key in self.read_keys():
+                if key != "protocol":
+                    self.read_value()
+                    continue
+                header = {}
+                self.expect("{")
+                for field in self.read_keys():
+                    if field == "device":
+                        devices = self.read_devices()
+                        # Keep the required field present for validation
+                        header[field] = []
+                    else:
+                        header[field] = self.read_value()
+        self.stream = None
+        if header is None:
+            raise AttributeError("Protocol: protocol object is required")
+        return Protocol({"protocol": header}, devices)
+
+    def read_devices(self):
+        """
+        Decodes the device array one device at a time.
+
+        Args:
+            None
+        Returns:
+            list: The Device objects, or LazyDevice handles in lazy mode.
+        Raises:
+            AttributeError: If a device is invalid.
+            ValueError: If the array is not valid JSON.
+        """
+        devices = []
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return devices
+        while True:
+            config = self.read_value()
+            if self.lazy:
+                devices.append(LazyDevice(config, self.logger))
+            else:
+                devices.append(Device(config, self.logger))
+            if self.next_token() == "]":
+                return devices
+
+    def read_keys(self):
+        """
+        Yields the keys of the current object, leaving the stream at each key's value.
+        The caller must consume each value before the next key is read.
+
+        Args:
+            None
+        Returns:
+            Generator of str: The object keys.
+        Raises:
+            ValueError: If the object is not valid JSON.
+        """
+        if self.peek() == "}":
+            self.position += 1
+            return
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise ValueError(f"Loader: expected an object key at offset {self.position}")
+            self.expect(":")
+            yield key
+            if self.next_token() == "}":
+                return
+
+    def read_value(self):
+        """
+        Decodes the next JSON value, reading further chunks until the value is complete.
+
+        Args:
+            None
+        Returns:
+            The decoded value.
+        Raises:
+            ValueError: If the value is not valid JSON.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # A number may continue in the next chunk, unless followed by another character
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill(max(self.chunk_size, len(self.buffer) - self.position))
+
+    def next_token(self):
+        """
+        Consumes the separator following a value.
+
+        Args:
+            None
+        Returns:
+            str: The separator, one of ",", "]" or "}".
+        Raises:
+            ValueError: If another character is found.
+        """
+        char = self.peek()
+        if char not in (",", "]", "}"):
+            raise ValueError(f"Loader: unexpected character {char!r} at offset {self.position}")
+        self.position += 1
+        return char
+
+    def expect(self, char: str):
+        """
+        Consumes an expected structural character.
+
+        Args:
+            char (str): The expected character.
+        Returns:
+            None
+        Raises:
+            ValueError: If another character is found.
+        """
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Loader: expected {char!r} instead of {found!r} at offset {self.position}")
+        self.position += 1
+
+    def peek(self):
+        """
+        Skips whitespace and returns the next character without consuming it.
+
+        Args:
+            None
+        Returns:
+            str: The next character, or an empty string at the end of the file.
+        Raises:
+            None
+        """
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in " \t\r\n":
+                self.position += 1
+            if self.position < len(self.buffer) or self.eof:
+                return self.buffer[self.position:self.position + 1]
+            self.fill(self.chunk_size)
+
+    def fill(self, size: int):
+        """
+        Discards the consumed part of the buffer and appends the next chunk of the file.
+
+        Args:
+            size (int): The number of characters to read.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        chunk = self.stream.read(size)
+        if len(chunk) == 0:
+            self.eof = True
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
@@ -3,9 +3,14 @@
 """
 
 import json
+import math
+import sys
 
 from enum import Enum
 
+# Optional fields holding a polling interval, or bounding the adaptive one, in seconds
+INTERVAL_FIELDS = ("interval", "min_interval", "max_interval")
+
 class DataType(Enum):
     INT16 = "int16"
     INT32 = "int32"
@@ -17,30 +22,124 @@ class DataType(Enum):
     Objects of class Message represent a specific message within a protocol.
 
 	Required fields: name.
-	Other fields are stored in a dictionary corresponding with protocol elements.
+	The fields corresponding with common protocol elements are stored in slots, any other fields in a
+	side mapping, both reachable as attributes. Large fleets hold millions of messages, so no per-instance
+	dictionary is kept.
+
+	The optional deadband field is a number, or a list with one number per value of the message, and the
+	optional interval, min_interval and max_interval fields are positive numbers of seconds, min_interval at
+	most max_interval.
 
 """
 
 class Message:
 
+    # Fields stored in slots rather than in the side mapping
+    FIELDS = ("name", "function", "starting_address", "length", "data_type")
+    __slots__ = FIELDS + ("logger", "extras", "message_byte_array")
+
     def __init__(self, config: json, logger):
         # Setup logger
         self.logger = logger
         # Ensure all required fields are present
         if 'name' in config:
             # Initialize message fields
-            self.msg_dict = {}
+            self.extras = None
             self.message_byte_array = None
-            # Create a dictionary representation of the message  
-            for item in config:
-                self.msg_dict[item] = config[item]
-            self.__initialize()
+            self.__initialize(config)
+            self.__validate()
         else:
             raise AttributeError("Message: name field is required")
     
-    def __initialize(self):
-        for key in self.msg_dict:
-            setattr(self, key, self.msg_dict[key])
+    def __initialize(self, config: json):
+        for key in config:
+            value = config[key]
+            if key in Message.FIELDS:
+                # Share repeated strings, such as prototype names and data types, between messages
+                if isinstance(value, str):
+                    value = sys.intern(value)
+                setattr(self, key, value)
+            else:
+                if self.extras is None:
+                    self.extras = {}
+                self.extras[key] = value
+
+    def __validate(self):
+        if self.extras is None:
+            return
+        deadband = self.extras.get("deadband")
+        if deadband is not None:
+            deadbands = deadband if isinstance(deadband, list) else [deadband]
+            if not all(is_number(value) and value >= 0 for value in deadbands):
+                raise AttributeError(f"Message: {self.name} deadband must be a non-negative number or a list of them")
+            count = self.get_value_count()
+            if isinstance(deadband, list) and len(deadband) != count:
+                raise AttributeError(f"Message: {self.name} has {len(deadband)} deadbands for {count} values")
+        for key in INTERVAL_FIELDS:
+            value = self.extras.get(key)
+            if value is not None and not (is_number(value) and value > 0):
+                raise AttributeError(f"Message: {self.name} {key} must be a positive number of seconds")
+        if self.extras.get("min_interval", 0) > self.extras.get("max_interval", math.inf):
+            raise AttributeError(f"Message: {self.name} min_interval exceeds max_interval")
+
+    def __getattr__(self, key: str):
+        # Only called when a slot is unset or the key is not a slot, look in the side mapping
+        try:
+            extras = object.__getattribute__(self, "extras")
+        except AttributeError:
+            raise AttributeError(key) from None
+        if extras is not None and key in extras:
+            return extras[key]
+        raise AttributeError(f"Message: no field {key}")
+
+    def __reduce__(self):
+        # Compact pickling for compiled snapshots, unset fields are stored as Ellipsis, which JSON cannot hold
+        state = tuple(getattr(self, key, ...) for key in Message.FIELDS)
+        return (Message.restore, (self.logger, state, self.extras, self.message_byte_array))
+
+    @staticmethod
+    def restore(logger, state: tuple, extras: dict, message_byte_array: bytearray):
+        """
+        Rebuilds a pickled message without validating it again.
+
+        Args:
+            logger: The logger.
+            state (tuple): The slot fields, in the order of Message.FIELDS, Ellipsis if unset.
+            extras (dict): The side mapping of other fields.
+            message_byte_array (bytearray): The message bytearray.
+        Returns:
+            Message: The message object.
+        Raises:
+            None
+        """
+        message = Message.__new__(Message)
+        message.logger = logger
+        message.extras = extras
+        message.message_byte_array = message_byte_array
+        for key, value in zip(Message.FIELDS, state):
+            if value is not ...:
+                setattr(message, key, value)
+        return message
+
+    @property
+    def msg_dict(self):
+        """
+        Builds a dictionary representation of the message fields.
+
+        Args:
+            None
+        Returns:
+            dict: The message fields.
+        Raises:
+            None
+        """
+        fields = {}
+        for key in Message.FIELDS:
+            if hasattr(self, key):
+                fields[key] = getattr(self, key)
+        if self.extras is not None:
+            fields.update(self.extras)
+        return fields
               
     def log(self):
         """
@@ -54,8 +153,8 @@ class Message:
             None
         """
         self.logger.debug(f"Message Name: {self.name}")
-        for key in self.msg_dict:
-            self.logger.debug(f"Message Dictionary Item: {key} Value: {self.msg_dict[key]}")
+        for key, value in self.msg_dict.items():
+            self.logger.debug(f"Message Dictionary Item: {key} Value: {value}")
 
     def set_message(self, msg: bytearray):
         """
@@ -84,8 +183,8 @@ class Message:
         """
         length = self.get_data_length()
         data_type = DataType.INT16.value
-        if self.msg_dict.get("data_type") is not None:
-            data_type = self.msg_dict["data_type"].lower()
+        if getattr(self, "data_type", None) is not None:
+            data_type = self.data_type.lower()
         # Match data type
         if data_type == DataType.INT16.value:
             return length * 2
@@ -96,12 +195,27 @@ class Message:
         if data_type == DataType.STRING.value:
             return length
         if data_type == DataType.BIT.value:
-            if length % 8 != 0:
-                return (length / 8) + 1
-            return (length / 8)
+            # Bits are packed eight to a byte, the last byte padded
+            return (length + 7) // 8
         # Use integer size for default
         return length * 2
     
+    def get_value_count(self):
+        """
+        Determines the number of values in a response to the message, by its data type.
+
+        Args:
+            None.
+        Returns:
+            int: The value count, 1 for a string.
+        Raises:
+            None.
+        """
+        data_type = getattr(self, "data_type", None)
+        if data_type is not None and data_type.lower() == DataType.STRING.value:
+            return 1
+        return self.get_data_length()
+
     def get_data_length(self):
         """
         Safely determines the data length for a given message.
@@ -117,4 +231,17 @@ class Message:
         if self.length is not None:
             length = self.length
         return int(length)
-    
\ No newline at end of file
+    
+
+def is_number(value):
+    """
+    Checks whether a field value is a number, booleans excluded.
+
+    Args:
+        value: The field value.
+    Returns:
+        bool: True if the value is an int or a float, False otherwise.
+    Raises:
+        None
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
@@ -4,9 +4,11 @@
 
 import json
 import logging
+import random
 import secrets
 import time
 from constants import Direction
+from pkg.component.batch import FrameBatch
 from pkg.component.message import Message
 from pkg.component.prototype import Prototype
 from pkg.component.device import Device
@@ -30,7 +32,7 @@ from pkg.transport.simulation import Simulation
 
 class Protocol:
 
-    def __init__(self, protocol: json):
+    def __init__(self, protocol: json, devices: list = None):
         # Setup logging
         self.logger = logging.getLogger(__name__)
         # Initialize protocol from JSON
@@ -61,7 +63,7 @@ class Protocol:
             # Initialize protocol
             self.__initialize(prefix, suffix, timeout, source_address, transmission_mode, checksum_calculation)
             self.__init_prototypes(file)
-            self.__init_devices(file)
+            self.__init_devices(file, devices)
         else:
             raise AttributeError("Protocol: protocol object is required")
 
@@ -74,22 +76,36 @@ class Protocol:
         self.conversion = Conversion(transmission_mode, self.logger)
         self.checksum = Checksum(checksum_calculation, self.conversion, self.logger)
         self.simulation = Simulation(self.conversion, self.logger)
+        self.random = None
+        self.responder = None
+        self.engine = None
+        self.compiler = None
+        self.writes = None
+        self.reloader = None
+        self.tag = ""
     
 
     def __init_prototypes(self, file: json):
         if 'prototype' in file:
             self.prototype = []
-            self.logger.debug(f"Initializing Prototype: {file["prototype"]}")
+            self.prototype_index = {}
+            self.logger.debug("Initializing Prototype: %s", file["prototype"])
             for prototype in file['prototype']:
                 self.prototype.append(Prototype(prototype, self.logger))
+                # Index by name, the first definition wins as with a linear search
+                self.prototype_index.setdefault(self.prototype[-1].name, self.prototype[-1])
         else:
             raise AttributeError("Protocol: prototype object is required")
     
 
-    def __init_devices(self, file: json):
+    def __init_devices(self, file: json, devices: list):
         if 'device' in file:
+            # Devices may already have been built, e.g. by a streaming loader
+            if devices is not None:
+                self.device = devices
+                return
             self.device = []
-            self.logger.debug(f"Initializing Device: {file["device"]}")
+            self.logger.debug("Initializing Device: %s", file["device"])
             for device in file['device']:
                 self.device.append(Device(device, self.logger))
         else:
@@ -109,26 +125,189 @@ class Protocol:
         """
         self.logger.debug(f"Protocol: Prefix: {self.prefix}, Suffix: {self.suffix}, Timeout: {self.timeout}, source_address {self.source_address}")
 
-    def run(self):
+    def set_seed(self, seed: int):
         """
-        Runs the protocol by setting up messages and performing transactions.
+        Seeds the generator of simulated data bytes, making received messages reproducible.
+        By default, data bytes are drawn from a cryptographically secure source.
+
+        Args:
+            seed (int): The seed, or None to restore the secure source.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.random = None if seed is None else random.Random(seed)
+
+    def set_reloader(self, reloader):
+        """
+        Sets a reloader applying the changes of the protocol file at the start of a poll cycle.
+
+        Args:
+            reloader (Reloader): The reloader, or None to stop reloading.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.reloader = reloader
+
+    def set_write_queue(self, writes):
+        """
+        Sets a queue of coil and register writes, flushed at the start of a poll cycle once due.
+
+        Args:
+            writes (WriteQueue): The write queue.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.writes = writes
+
+    def set_tag(self, tag: str):
+        """
+        Tags the protocol and each of its devices, telling them apart when several protocols run together.
+
+        Args:
+            tag (str): The protocol tag.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.tag = tag
+        for device in self.device:
+            device.protocol = tag
+
+    def set_responder(self, responder):
+        """
+        Sets a responder answering transmitted messages from device state, instead of simulating
+        received messages from random data bytes.
+
+        Args:
+            responder (Responder): The responder, or None to simulate received messages.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.responder = responder
+
+    def set_engine(self, engine):
+        """
+        Sets a transaction engine performing the transactions of a run, applying the protocol timeout,
+        retries and per-device circuit breaking.
 
         Args:
+            engine (TransactionEngine): The transaction engine, or None to transact one message at a time.
+        Returns:
+            None
+        Raises:
             None
+        """
+        self.engine = engine
+
+    def set_compiler(self, compiler):
+        """
+        Sets a compiler whose generated encoders build the messages of transactions, instead of
+        interpreting the prototype segments for every message.
+
+        Args:
+            compiler (Compiler): The compiler, or None to interpret the prototype segments.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.compiler = compiler
+
+    def get_random_bytes(self, count: int):
+        """
+        Draws simulated data bytes from the configured source.
+
+        Args:
+            count (int): The number of bytes.
+        Returns:
+            bytes: The random bytes.
+        Raises:
+            None
+        """
+        if self.random is None:
+            return secrets.token_bytes(count)
+        return self.random.randbytes(count)
+
+    def get_data_bytes(self, message: Message, count: int):
+        """
+        Retrieves the data bytes of a message, either given by its optional data field, e.g. the values of
+        a write request, or else drawn as simulated data bytes.
+
+        Args:
+            message (Message): The message object.
+            count (int): The number of bytes.
+        Returns:
+            bytes: The data bytes.
+        Raises:
+            ValueError: If the data field does not hold the given number of bytes.
+        """
+        data = getattr(message, "data", None)
+        if data is None:
+            return self.get_random_bytes(count)
+        if len(data) != count:
+            raise ValueError(f"Protocol: {message.name} has {len(data)} data bytes instead of {count}")
+        return bytes(data)
+
+    def run(self, cycles: int = 10):
+        """
+        Runs the protocol by setting up messages and performing transactions.
+
+        Args:
+            cycles (int): The number of poll cycles.
         Returns:
             None
         Raises:
             None
         """
         self.logger.debug("Protocol: running")
-        # Set messages for transmission - currently assumes client (master) role
-        self.set_messages_from_prototype(Direction.TX)
+        # Messages for transmission are set on first use - currently assumes client (master) role
         # Perform transactions
-        for _ in range(10):
+        for _ in range(cycles):
+            self.poll()
+        if self.writes is not None:
+            self.writes.flush()
+        if self.engine is not None:
+            self.engine.log()
+
+    def poll(self):
+        """
+        Performs a single poll cycle, a transaction for every message of every device, after reloading
+        the protocol file if it changed. The pending writes are performed as soon as they are due, checked
+        between transactions.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            ValueError: If the protocol defines no prototype for the pending writes.
+        """
+        if self.reloader is not None:
+            self.reloader.poll()
+        if self.writes is not None and self.writes.is_due():
+            self.writes.flush()
+        if self.engine is not None:
             for device in self.device:
                 for msg in device.messages:
-                    self.transact(msg, device)
-                    
+                    self.engine.submit(msg, device)
+            self.engine.run()
+            if self.writes is not None:
+                self.writes.tally()
+            return
+        for device in self.device:
+            for msg in device.messages:
+                if self.writes is not None and self.writes.is_due():
+                    self.writes.flush()
+                self.transact(msg, device)
 
     def set_messages_from_prototype(self, direction: Direction):
         """
@@ -178,6 +357,41 @@ class Protocol:
         # Conversion
         return self.conversion.get_converted_message(msg, self.prefix, self.suffix)
     
+    def build_frames(self, direction: Direction = Direction.TX, messages=None, batch: FrameBatch = None):
+        """
+        Constructs the messages of a poll cycle, or of the given messages, back to back in one contiguous
+        buffer. Transmit messages already set on a message are copied, any others are constructed without
+        being set. Received messages are simulated from random data bytes.
+
+        Args:
+            direction (Direction): The direction of the messages (TX or RX).
+            messages: The (message, device) pairs in order, defaults to every message of every device.
+            batch (FrameBatch): The batch to append to, e.g. a cleared batch of the previous cycle.
+        Returns:
+            FrameBatch: The batch holding one frame per message, in order.
+        Raises:
+            ValueError: If a prototype or a segment value cannot be found.
+        """
+        if batch is None:
+            batch = FrameBatch()
+        if messages is None:
+            messages = ((msg, device) for device in self.device for msg in device.messages)
+        buffer = batch.buffer
+        for message, device in messages:
+            start = len(buffer)
+            if direction == Direction.TX and message.message_byte_array is not None:
+                buffer += message.message_byte_array
+            else:
+                prototype = self.get_prototype(message.name)
+                if prototype is None:
+                    raise ValueError(f"Protocol: unable to find prototype for message: {message.name}")
+                if self.compiler is not None:
+                    self.compiler.encode_into(buffer, prototype, direction, message, device)
+                else:
+                    buffer += self.get_message_from_prototype(prototype, direction, message, device)
+            batch.add(start)
+        return batch
+
     # Simulated transaction method
     def transact(self, message: Message, device: Device):
         """
@@ -195,7 +409,8 @@ class Protocol:
         if prototype is None:
             self.logger.error("Protocol: unable to find prototype for message: %s", message.name)
             return False
-        received_msg = self.get_message_from_prototype(prototype, Direction.RX, message, device)
+        self.get_transmit_message(prototype, message, device)
+        received_msg = self.get_received_message(prototype, message, device)
         if received_msg is None:
             self.logger.error("Protocol: no received message for prototype: %s", prototype.name)
             return False
@@ -208,6 +423,80 @@ class Protocol:
         self.logger.warning("Protocol: message transmission failed for message: %s", message.name)
         return False
         
+    def get_transmit_message(self, prototype: Prototype, message: Message, device: Device):
+        """
+        Retrieves the message for transmission, constructing it on first use.
+
+        Args:
+            prototype (Prototype): The prototype object.
+            message (Message): The message object.
+            device (Device): The device object.
+        Returns:
+            bytearray: The message for transmission.
+        Raises:
+            ValueError: If a segment value cannot be found.
+        """
+        if message.message_byte_array is None:
+            message.set_message(self.encode(prototype, Direction.TX, message, device))
+        return message.message_byte_array
+
+    def get_received_message(self, prototype: Prototype, message: Message, device: Device):
+        """
+        Retrieves the message received in answer to a transmitted message, either from the responder
+        or simulated from the prototype.
+
+        Args:
+            prototype (Prototype): The prototype object.
+            message (Message): The message object, already set for transmission.
+            device (Device): The device object.
+        Returns:
+            bytearray: The received message, or None if the request is not answered.
+        Raises:
+            ValueError: If a segment value cannot be found.
+        """
+        if self.responder is not None:
+            return self.responder.respond(message.message_byte_array)
+        return self.encode(prototype, Direction.RX, message, device)
+
+    def encode(self, prototype: Prototype, direction: Direction, message: Message, device: Device):
+        """
+        Constructs a message with the compiled encoder of the prototype if a compiler is set, and
+        else by applying the prototype definition as get_message_from_prototype does.
+
+        Args:
+            prototype (Prototype): The prototype object.
+            direction (Direction): The direction of the message (TX or RX).
+            message (Message): The message object.
+            device (Device): The device object.
+        Returns:
+            bytearray: The constructed message bytearray.
+        Raises:
+            ValueError: If a segment value cannot be found.
+        """
+        if self.compiler is not None:
+            return self.compiler.encode(prototype, direction, message, device)
+        return self.get_message_from_prototype(prototype, direction, message, device)
+
+    def decode_message(self, prototype: Prototype, direction: Direction, msg: bytearray):
+        """
+        Decodes a message in the configured transmission mode into its segment values, with the compiled
+        decoder of the prototype if a compiler is set.
+
+        Args:
+            prototype (Prototype): The prototype object.
+            direction (Direction): The direction of the message (TX or RX).
+            msg (bytearray): The message bytearray, including prefix and suffix.
+        Returns:
+            dict: The integer value of each segment by name, and the data bytes as bytes.
+        Raises:
+            ValueError: If the message does not match the prototype.
+        """
+        message = self.conversion.get_hex_message(msg, self.prefix, self.suffix)
+        body = message[len(self.prefix):len(message) - len(self.suffix)]
+        if self.compiler is not None:
+            return self.compiler.decode(prototype, direction, body)
+        return prototype.decode(direction, body)
+
     # Helper method
     def get_prototype(self, name: str):
         """
@@ -220,10 +509,7 @@ class Protocol:
         Raises:
             None
         """
-        for prototype in self.prototype:
-            if prototype.name == name:
-                return prototype
-        return None
+        return self.prototype_index.get(name)
     
     def append_str_to_byte_array(self, msg: bytearray, addition: str):
         """
@@ -299,14 +585,11 @@ class Protocol:
             array.append(self.checksum.calculate_checksum(msg, self.prefix))
             return array, segment.bits
         if segment.name == "byte_count":            
-            array.append(int(message.get_data_byte_count()))
+            array.append(message.get_data_byte_count())
             return array, segment.bits
         if segment.name == "data_bytes":            
-            b = segment.bits * int(message.get_data_byte_count())
-            while b > 0:
-                rand = secrets.randbelow(256)
-                array.append(rand)
-                b -= 8
+            b = segment.bits * message.get_data_byte_count()
+            array.extend(self.get_data_bytes(message, (b + 7) // 8))
             return array, segment.bits
         # Get value from message based on segment name
         if hasattr(message, segment.name):
@@ -15,6 +15,8 @@ import json
 
 class Prototype:
 
+    __slots__ = ("logger", "name", "desc", "tx", "rx")
+
     def __init__(self, prototype: json, logger):
         # Setup logger
         self.logger = logger
@@ -87,4 +89,32 @@ class Prototype:
             return self.rx
         else:
             raise ValueError(f"Invalid direction specified {direction}")
-   
\ No newline at end of file
+
+    def decode(self, direction: Direction, data: bytes):
+        """
+        Decodes a message in hexadecimal format, excluding prefix and suffix, into its segment values.
+        Data bytes span as many bytes as the preceding byte count segment specifies.
+
+        Args:
+            direction (Direction): The direction of the message.
+            data (bytes): The message bytes.
+        Returns:
+            dict: The integer value of each segment by name, and the data bytes as bytes.
+        Raises:
+            ValueError: If the message length does not match the segments.
+        """
+        fields = {}
+        offset = 0
+        for segment in self.get_segments(direction):
+            if segment.name == "data_bytes":
+                size = (segment.bits * fields.get("byte_count", 0) + 7) // 8
+                fields[segment.name] = bytes(data[offset:offset + size])
+            else:
+                size = segment.bits // 8
+                fields[segment.name] = int.from_bytes(data[offset:offset + size], "big")
+            offset += size
+            if offset > len(data):
+                raise ValueError(f"Prototype: {self.name} message too short for segment {segment.name}")
+        if offset != len(data):
+            raise ValueError(f"Prototype: {self.name} message has {len(data) - offset} unexpected bytes")
+        return fields
@@ -0,0 +1,452 @@
+"""
+    Package 'component' provides definitions for various objects meeting the definition of a protocol component.
+"""
+
+import json
+import os
+import time
+from pkg.component.device import Device, LazyDevice
+from pkg.component.prototype import Prototype
+
+
+"""
+    Objects of class Changes describe the difference between a reloaded protocol file and the running protocol:
+    the devices in their new order, the devices and messages added, removed and changed, and the prototypes
+    whose definition changed.
+"""
+
+class Changes:
+
+    def __init__(self):
+        self.devices = []
+        self.added = []
+        self.removed = []
+        self.changed = []
+        self.prototypes = set()
+        self.prototype = None
+        self.prototype_index = None
+        self.kept = 0
+        self.timeout = None
+
+    def is_empty(self):
+        """
+        Checks whether the reloaded file changes anything that is applied.
+
+        Args:
+            None
+        Returns:
+            bool: True if nothing changed, False otherwise.
+        Raises:
+            None
+        """
+        return not (self.added or self.removed or self.changed or self.prototypes or self.timeout is not None)
+
+"""
+    The Reloader class watches the protocol file of a running protocol and applies its changes in place.
+    The file is checked by its modification time, size and inode, at most once per interval, at the start
+    of a poll cycle. A changed file is parsed and validated in full, then compared with the running protocol:
+
+    - Devices are matched by name, and messages within a device by their fields. Unchanged devices and
+      messages are kept as they are, with their cached frames, response lengths and change detection state.
+    - Added messages and devices are built, removed ones are dropped along with their state, and the messages
+      of a device whose address changed are built again.
+    - Messages of prototypes whose segments changed are built again with the new definition.
+    - A changed timeout is applied. Changes of the prefix, suffix, transmission mode, checksum calculation or
+      source address affect every frame and require a restart, they are reported and ignored.
+
+    A file that cannot be parsed or validated, e.g. while it is still being written, leaves the running
+    protocol untouched until the file changes again. Reloading runs on the thread polling the protocol,
+    between poll cycles, so no transaction ever sees a half applied change.
+"""
+
+class Reloader:
+
+    def __init__(self, protocol, file_path: str, logger, interval: float = 1.0, lengths=None, detector=None, clock=time.monotonic):
+        # Setup logger
+        self.logger = logger
+        # Initialize reloader fields
+        self.protocol = protocol
+        self.file_path = file_path
+        self.interval = interval
+        self.lengths = lengths
+        self.detector = detector
+        self.clock = clock
+        self.checked = clock()
+        self.stamp = self.get_stamp()
+        self.fingerprints = {}
+        self.counters = {"reloads": 0, "rejected": 0, "added": 0, "removed": 0, "changed": 0, "kept": 0}
+
+    def get_stamp(self):
+        """
+        Retrieves the modification time, size and inode of the protocol file.
+
+        Args:
+            None
+        Returns:
+            tuple: The stamp, or None if the file cannot be read.
+        Raises:
+            None
+        """
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def poll(self):
+        """
+        Reloads the protocol file if the interval passed since the last check and the file changed.
+
+        Args:
+            None
+        Returns:
+            Changes: The changes applied, or None if the file was not reloaded.
+        Raises:
+            None
+        """
+        now = self.clock()
+        if now - self.checked < self.interval:
+            return None
+        self.checked = now
+        stamp = self.get_stamp()
+        if stamp is None or stamp == self.stamp:
+            return None
+        self.stamp = stamp
+        return self.reload()
+
+    def reload(self):
+        """
+        Parses the protocol file and applies its changes to the running protocol.
+
+        Args:
+            None
+        Returns:
+            Changes: The changes applied, or None if the file is invalid.
+        Raises:
+            None
+        """
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                file = json.load(f)["protocol"]
+            changes = self.get_changes(file)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            self.counters["rejected"] += 1
+            self.logger.error("Reloader: keeping the running protocol, %s is invalid: %s", self.file_path, e)
+            return None
+        if not changes.is_empty():
+            self.apply(changes)
+        self.counters["reloads"] += 1
+        self.counters["kept"] += changes.kept
+        self.logger.info("Reloader: %s reloaded, %d devices added, %d removed, %d changed, %d prototypes changed", self.file_path,
+                         len(changes.added), len(changes.removed), len(changes.changed), len(changes.prototypes))
+        return changes
+
+    def get_changes(self, file: dict):
+        """
+        Compares a parsed protocol file with the running protocol. New objects are built and validated,
+        but nothing is applied yet.
+
+        Args:
+            file (dict): The protocol object of the file.
+        Returns:
+            Changes: The changes.
+        Raises:
+            AttributeError: If a prototype, device or message of the file is invalid.
+            KeyError: If the file has no prototype or device array.
+        """
+        protocol = self.protocol
+        changes = Changes()
+        for field, value in self.get_framing().items():
+            if field in file and file[field] != value:
+                self.logger.warning("Reloader: %s changed, a restart is required to apply it", field)
+        if file.get("timeout", protocol.timeout) != protocol.timeout:
+            changes.timeout = file["timeout"]
+        # Prototypes, by name, the first definition winning as in the protocol index
+        prototypes = [Prototype(prototype, self.logger) for prototype in file["prototype"]]
+        index = {}
+        for prototype in prototypes:
+            index.setdefault(prototype.name, prototype)
+        for name in set(index) | set(protocol.prototype_index):
+            if self.get_signature(index.get(name)) != self.get_signature(protocol.prototype_index.get(name)):
+                changes.prototypes.add(name)
+        if changes.prototypes:
+            changes.prototype = prototypes
+            changes.prototype_index = index
+        # Devices, by name
+        running = {}
+        for key, device in self.get_keys(protocol.device):
+            running[key] = device
+        configs = [config for config in file["device"] if config is not None]
+        for key, config in self.get_keys(configs, lambda config: config.get("name", "")):
+            device = running.pop(key, None)
+            fingerprint = self.get_config_fingerprint(config)
+            if device is None:
+                device = Device(config, self.logger)
+                device.protocol = protocol.tag
+                self.fingerprints[device] = fingerprint
+                changes.added.append(device)
+            elif fingerprint != self.get_fingerprint(device):
+                changes.changed.append((device, fingerprint) + self.match(device, config))
+            else:
+                changes.kept += 1
+            changes.devices.append(device)
+        changes.removed = list(running.values())
+        return changes
+
+    def match(self, device, config: dict):
+        """
+        Matches the messages of a changed device configuration with the running messages of the device.
+
+        Args:
+            device (Device): The running device.
+            config (dict): The new device configuration.
+        Returns:
+            tuple: The new address, the messages in their new order, the messages added and the messages removed.
+        Raises:
+            AttributeError: If the device configuration is invalid.
+        """
+        fresh = Device(config, self.logger)
+        running = {}
+        for message in device.messages:
+            running.setdefault(self.get_message_fingerprint(message.msg_dict), []).append(message)
+        messages = []
+        added = []
+        for message in fresh.messages:
+            candidates = running.get(self.get_message_fingerprint(message.msg_dict))
+            if candidates:
+                messages.append(candidates.pop(0))
+            else:
+                messages.append(message)
+                added.append(message)
+        removed = [message for candidates in running.values() for message in candidates]
+        return fresh.address, messages, added, removed
+
+    def apply(self, changes: Changes):
+        """
+        Applies changes to the running protocol, its response lengths, compiled functions, change detection,
+        responder and circuit breakers.
+
+        Args:
+            changes (Changes): The changes.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        if changes.timeout is not None:
+            protocol.timeout = changes.timeout
+            if protocol.engine is not None:
+                protocol.engine.timeout = max(changes.timeout, 0) / 1000
+        if changes.prototypes:
+            protocol.prototype = changes.prototype
+            protocol.prototype_index = changes.prototype_index
+            if protocol.compiler is not None:
+                for name in changes.prototypes:
+                    protocol.compiler.forget(name)
+        for device in changes.removed:
+            for message in self.get_messages(device):
+                self.forget(message, device)
+            self.fingerprints.pop(device, None)
+        for device, fingerprint, address, messages, added, removed in changes.changed:
+            for message in removed:
+                self.forget(message, device)
+            if address != device.address:
+                # Every frame carries the device address
+                for message in messages:
+                    if message not in added:
+                        self.forget(message, device)
+                self.set_address(device, address)
+            device.messages[:] = messages
+            self.fingerprints[device] = fingerprint
+        protocol.device[:] = changes.devices
+        if changes.prototypes:
+            for device in protocol.device:
+                for message in self.get_messages(device):
+                    if message.name in changes.prototypes:
+                        self.forget(message, device)
+        if self.lengths is not None:
+            # Also indexed by request, for lookups from request frames
+            for device in protocol.device:
+                for message in self.get_messages(device):
+                    if self.lengths.get(message) is None:
+                        self.lengths.add(message, device)
+        if protocol.responder is not None:
+            protocol.responder.refresh()
+        if protocol.engine is not None:
+            addresses = {device.address for device in protocol.device}
+            for address in list(protocol.engine.breakers):
+                if address not in addresses:
+                    del protocol.engine.breakers[address]
+        self.counters["added"] += len(changes.added)
+        self.counters["removed"] += len(changes.removed)
+        self.counters["changed"] += len(changes.changed)
+
+    def forget(self, message, device):
+        """
+        Drops the cached frame, response length and change detection state of a message.
+
+        Args:
+            message (Message): The message object.
+            device (Device): The device object, at the address the message was indexed with.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        message.message_byte_array = None
+        if self.lengths is not None:
+            self.lengths.remove(message, device)
+        if self.detector is not None:
+            self.detector.forget(message)
+
+    def get_framing(self):
+        """
+        Retrieves the protocol fields every built frame depends on, a change of which cannot be applied
+        while running.
+
+        Args:
+            None
+        Returns:
+            dict: The running value of each field, by its name in the protocol file.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        return {
+            "prefix": protocol.prefix,
+            "suffix": protocol.suffix,
+            "transmission_mode": protocol.conversion.mode,
+            "checksum_calculation": protocol.checksum.calculation,
+            "source_address": protocol.source_address,
+        }
+
+    def get_messages(self, device):
+        """
+        Retrieves the messages of a device, none for a lazily loaded device not materialised yet, which
+        has no state to keep or drop.
+
+        Args:
+            device (Device): The device object, possibly lazily loaded.
+        Returns:
+            list[Message]: The messages.
+        Raises:
+            None
+        """
+        if isinstance(device, LazyDevice) and device.device is None:
+            return []
+        return device.messages
+
+    def set_address(self, device, address: int):
+        """
+        Changes the address of a running device.
+
+        Args:
+            device (Device): The device object, possibly lazily loaded.
+            address (int): The new address.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        device.address = address
+        if isinstance(device, LazyDevice):
+            device.device.address = address
+
+    def get_keys(self, items: list, get_name=None):
+        """
+        Pairs devices, or device configurations, with their key: the name, and the number of earlier
+        devices of the same name, so that unnamed and duplicate devices are matched in order.
+
+        Args:
+            items (list): The devices or device configurations.
+            get_name (callable): Retrieves the name of an item, defaults to its name attribute.
+        Returns:
+            list[tuple[tuple, object]]: The key and item of each item.
+        Raises:
+            None
+        """
+        seen = {}
+        keys = []
+        for item in items:
+            name = get_name(item) if get_name is not None else item.name
+            count = seen.get(name, 0)
+            seen[name] = count + 1
+            keys.append(((name, count), item))
+        return keys
+
+    def get_fingerprint(self, device):
+        """
+        Retrieves the fingerprint of a running device, computing it on first use.
+
+        Args:
+            device (Device): The device object, possibly lazily loaded.
+        Returns:
+            tuple: The address and the fingerprint of each message.
+        Raises:
+            None
+        """
+        fingerprint = self.fingerprints.get(device)
+        if fingerprint is None:
+            if isinstance(device, LazyDevice) and device.device is None:
+                # Compared without materialising the messages
+                fingerprint = self.get_config_fingerprint(json.loads(device.config))
+            else:
+                fingerprint = (device.address, tuple(self.get_message_fingerprint(message.msg_dict) for message in device.messages))
+            self.fingerprints[device] = fingerprint
+        return fingerprint
+
+    def get_config_fingerprint(self, config: dict):
+        """
+        Computes the fingerprint of a device configuration.
+
+        Args:
+            config (dict): The device configuration.
+        Returns:
+            tuple: The address and the fingerprint of each message.
+        Raises:
+            None
+        """
+        messages = config.get("message", [])
+        return (config.get("address", 0), tuple(self.get_message_fingerprint(message) for message in messages if message is not None))
+
+    def get_message_fingerprint(self, fields: dict):
+        """
+        Computes the fingerprint of a message, its fields as canonical JSON text.
+
+        Args:
+            fields (dict): The message fields.
+        Returns:
+            str: The fingerprint.
+        Raises:
+            TypeError: If a field cannot be represented as JSON.
+        """
+        return json.dumps(fields, sort_keys=True, separators=(",", ":"))
+
+    def get_signature(self, prototype):
+        """
+        Retrieves the segments a prototype builds and decodes messages with.
+
+        Args:
+            prototype (Prototype): The prototype object, or None.
+        Returns:
+            tuple: The name and width of each segment of each direction, or None without a prototype.
+        Raises:
+            None
+        """
+        if prototype is None:
+            return None
+        return tuple(tuple((segment.name, segment.bits) for segment in segments) for segments in (prototype.tx, prototype.rx))
+
+    def log(self):
+        """
+        Outputs the reloader counters.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.logger.info("Reloader: %s", ", ".join(f"{name}={count}" for name, count in self.counters.items()))
@@ -0,0 +1,109 @@
+"""
+    Package 'component' provides definitions for various objects meeting the definition of a protocol component.
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+
+"""
+    Objects of class Snapshot store a compiled copy of a validated Protocol object next to its JSON source,
+    so later starts can load the protocol without parsing and validating the JSON again.
+
+    A snapshot is keyed by the SHA-256 digest of the source file and by the snapshot format version, and
+    is only used while both still match. The format version must be increased whenever the layout of the
+    protocol objects changes. Snapshots are pickles, so they are as trusted as the directory they live in.
+"""
+
+MAGIC = b"DONP"
+FORMAT_VERSION = 10
+EXTENSION = ".donpc"
+
+class Snapshot:
+
+    def __init__(self, source: str, logger, directory: str = None):
+        # Setup logger
+        self.logger = logger
+        # Initialize snapshot fields
+        self.source = source
+        if directory is None:
+            directory = os.path.dirname(os.path.abspath(source))
+        self.path = os.path.join(directory, os.path.basename(source) + EXTENSION)
+
+    def get_key(self, digest=None):
+        """
+        Computes the key identifying a snapshot of the given source contents, or else of the current
+        source contents, reading the source in chunks so that large files are never held in memory.
+
+        Args:
+            digest: The SHA-256 digest of the source contents as parsed, or None to read the source.
+        Returns:
+            bytes: The snapshot key.
+        Raises:
+            OSError: If the source file cannot be read.
+        """
+        if digest is None:
+            digest = hashlib.sha256()
+            with open(self.source, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        else:
+            digest = digest.copy()
+        # Pickled objects are only guaranteed to load on the interpreter version that wrote them
+        digest.update(f"{FORMAT_VERSION}:{sys.version_info.major}.{sys.version_info.minor}".encode())
+        return digest.digest()
+
+    def load(self):
+        """
+        Loads the snapshot if it was compiled from the current source contents.
+
+        Args:
+            None
+        Returns:
+            Protocol: The protocol object, or None if there is no valid snapshot.
+        Raises:
+            None
+        """
+        try:
+            key = self.get_key()
+            with open(self.path, "rb") as f:
+                header = f.read(len(MAGIC) + len(key))
+                if header != MAGIC + key:
+                    self.logger.info("Snapshot: %s is stale, recompiling", self.path)
+                    return None
+                protocol = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning("Snapshot: unable to load %s: %s", self.path, e)
+            return None
+        self.logger.info("Snapshot: loaded %s", self.path)
+        return protocol
+
+    def save(self, protocol, key: bytes):
+        """
+        Saves the protocol object as the snapshot of the source contents it was parsed from. The snapshot is
+        written to a temporary file first and then renamed, so a concurrent start never reads a partial snapshot.
+
+        Args:
+            protocol (Protocol): The validated protocol object.
+            key (bytes): The snapshot key of the parsed source contents, as get_key computes it.
+        Returns:
+            bool: True if the snapshot was written, False otherwise.
+        Raises:
+            None
+        """
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(MAGIC + key)
+                pickle.dump(protocol, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, self.path)
+        except Exception as e:
+            self.logger.warning("Snapshot: unable to save %s: %s", self.path, e)
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return False
+        self.logger.info("Snapshot: saved %s", self.path)
+        return True
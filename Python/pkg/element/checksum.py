@@ -11,6 +11,34 @@ class Mode(Enum):
     ASCII = "ascii"
     HEX = "hex"
 
+# CRC16 lookup table for the reflected polynomial, built on first use and shared by all Checksum objects
+CRC16_TABLE = None
+
+def get_crc16_table():
+    """
+    Retrieves the CRC16 lookup table, building it on first use.
+
+    Args:
+        None
+    Returns:
+        tuple[int]: The CRC of each byte value.
+    Raises:
+        None
+    """
+    global CRC16_TABLE
+    if CRC16_TABLE is None:
+        table = []
+        for byte in range(256):
+            crc = byte
+            for _ in range(8):
+                if (crc & 0x0001) != 0:
+                    crc = (crc >> 1) ^ 0xA001
+                else:
+                    crc >>= 1
+            table.append(crc)
+        CRC16_TABLE = tuple(table)
+    return CRC16_TABLE
+
 """
     Objects of class Checksum handle checksum calculations and validations for protocol messages. 
     Checksum objects are equipped with a Conversion member to manage data representation during 
@@ -85,6 +113,25 @@ class Checksum:
         # Return little-endian CRC16
         return struct.unpack('<H', struct.pack('>H', crc))[0] & 0xFFFF
     
+    def calculate_crc16_table(self, data: bytearray):
+        """
+        Computes the CRC16 checksum for the given message a byte at a time from the lookup table,
+        giving the same result as calculate_crc16.
+
+        Args:
+            data (bytearray): The data bytearray.
+        Returns:
+            integer: The calculated CRC.
+        Raises:
+            None
+        """
+        table = get_crc16_table()
+        crc = 0xFFFF
+        for b in data:
+            crc = (crc >> 8) ^ table[(crc ^ b) & 0xFF]
+        # Return little-endian CRC16
+        return ((crc & 0xFF) << 8) | (crc >> 8)
+
     def validate_checksum_in_message(self, message: bytearray, suffix: str, prefix: str):
         """
         Validates the checksum of a message.
@@ -0,0 +1,204 @@
+import numpy as np
+from constants import Space
+
+"""
+    Package 'element' provides definitions for various objects meeting the definition of a single entity
+	used within communication protocols.
+"""
+
+# Modbus function codes and the space they access
+FUNCTION_SPACES = {
+    1: Space.COILS,
+    2: Space.DISCRETE_INPUTS,
+    3: Space.HOLDING_REGISTERS,
+    4: Space.INPUT_REGISTERS,
+    5: Space.COILS,
+    6: Space.HOLDING_REGISTERS,
+    15: Space.COILS,
+    16: Space.HOLDING_REGISTERS,
+}
+
+BIT_SPACES = (Space.COILS, Space.DISCRETE_INPUTS)
+
+def get_register_count(message, space: Space):
+    """
+    Determines the number of bits or registers a message accesses, from its data type.
+
+    Args:
+        message (Message): The message object.
+        space (Space): The space accessed by the message.
+    Returns:
+        int: The number of bits or registers.
+    Raises:
+        None
+    """
+    if space in BIT_SPACES:
+        return message.get_data_length()
+    return (message.get_data_byte_count() + 1) // 2
+
+def get_register_sizes(devices: list):
+    """
+    Determines the size of each space of each device address, covering every range the device messages access.
+
+    Args:
+        devices (list[Device]): The devices.
+    Returns:
+        dict: The size of each space by space, by device address.
+    Raises:
+        None
+    """
+    sizes = {}
+    for device in devices:
+        device_sizes = sizes.setdefault(device.address, {})
+        for msg in device.messages:
+            if not hasattr(msg, "function") or not hasattr(msg, "starting_address"):
+                continue
+            space = FUNCTION_SPACES.get(msg.function)
+            if space is None:
+                continue
+            end = msg.starting_address + get_register_count(msg, space)
+            device_sizes[space] = max(device_sizes.get(space, 0), end)
+    return sizes
+
+"""
+    Objects of class RegisterMap hold the data of a single device in four contiguous arrays, one per space:
+    coils and discrete inputs as one byte per bit, holding and input registers as 16 bit words.
+
+    Reads and writes operate on whole slices, so requests are served without looping over registers.
+    The arrays may be provided by the caller, e.g. as views of shared memory.
+"""
+
+class RegisterMap:
+
+    def __init__(self, sizes: dict, logger, arrays: dict = None):
+        # Setup logger
+        self.logger = logger
+        # Initialize register arrays
+        if arrays is not None:
+            self.arrays = arrays
+        else:
+            self.arrays = {}
+            for space in Space:
+                dtype = np.uint8 if space in BIT_SPACES else np.uint16
+                self.arrays[space] = np.zeros(sizes.get(space, 0), dtype=dtype)
+
+    def get_space(self, function: int):
+        """
+        Retrieves the space accessed by a function code.
+
+        Args:
+            function (int): The function code.
+        Returns:
+            Space: The space, or None if the function code does not access a space.
+        Raises:
+            None
+        """
+        return FUNCTION_SPACES.get(function)
+
+    def is_valid(self, space: Space, start: int, count: int):
+        """
+        Checks whether a range lies within a space.
+
+        Args:
+            space (Space): The space.
+            start (int): The first address.
+            count (int): The number of bits or registers.
+        Returns:
+            bool: True if the range is valid, False otherwise.
+        Raises:
+            None
+        """
+        return count > 0 and start >= 0 and start + count <= len(self.arrays[space])
+
+    def read(self, space: Space, start: int, count: int):
+        """
+        Retrieves a view of a range of bits or registers.
+
+        Args:
+            space (Space): The space.
+            start (int): The first address.
+            count (int): The number of bits or registers.
+        Returns:
+            numpy.ndarray: A view of the range.
+        Raises:
+            IndexError: If the range is not within the space.
+        """
+        if not self.is_valid(space, start, count):
+            raise IndexError(f"RegisterMap: range {start}+{count} outside of {space.value}")
+        return self.arrays[space][start:start + count]
+
+    def write(self, space: Space, start: int, values):
+        """
+        Writes a range of bits or registers.
+
+        Args:
+            space (Space): The space.
+            start (int): The first address.
+            values: The values, any sequence or array.
+        Returns:
+            None
+        Raises:
+            IndexError: If the range is not within the space.
+        """
+        values = np.asarray(values)
+        self.read(space, start, len(values))[:] = values
+
+    def read_bytes(self, space: Space, start: int, count: int):
+        """
+        Retrieves a range in its Modbus data byte representation: bits packed least significant bit
+        first, registers as big-endian words.
+
+        Args:
+            space (Space): The space.
+            start (int): The first address.
+            count (int): The number of bits or registers.
+        Returns:
+            bytes: The data bytes.
+        Raises:
+            IndexError: If the range is not within the space.
+        """
+        view = self.read(space, start, count)
+        if space in BIT_SPACES:
+            return np.packbits(view, bitorder="little").tobytes()
+        return view.astype(">u2").tobytes()
+
+    def write_bytes(self, space: Space, start: int, count: int, data: bytes):
+        """
+        Writes a range from its Modbus data byte representation.
+
+        Args:
+            space (Space): The space.
+            start (int): The first address.
+            count (int): The number of bits or registers.
+            data (bytes): The data bytes.
+        Returns:
+            None
+        Raises:
+            IndexError: If the range is not within the space.
+            ValueError: If there are too few data bytes.
+        """
+        view = self.read(space, start, count)
+        if space in BIT_SPACES:
+            bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=count, bitorder="little")
+            if len(bits) < count:
+                raise ValueError("RegisterMap: too few data bytes")
+            view[:] = bits
+        else:
+            if len(data) < count * 2:
+                raise ValueError("RegisterMap: too few data bytes")
+            view[:] = np.frombuffer(data, dtype=">u2", count=count)
+
+    def randomize(self, rng):
+        """
+        Fills every space with random values.
+
+        Args:
+            rng (numpy.random.Generator): The random generator.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        for space, array in self.arrays.items():
+            high = 2 if space in BIT_SPACES else 1 << 16
+            array[:] = rng.integers(0, high, size=len(array), dtype=array.dtype)
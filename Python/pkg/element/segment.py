@@ -12,6 +12,8 @@ import json
 """
 
 class Segment:
+
+    __slots__ = ("logger", "name", "desc", "bits")
     
     def __init__(self, seg: json, logger):
         self.logger = logger
@@ -0,0 +1,461 @@
+"""
+    Package 'observe' provides mechanism's for observing and logging system statistics during application runtime.
+"""
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from constants import Outcome
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Latency buckets in seconds, covering serial lines at low baud rates
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+"""
+    Objects of class Metric describe a family of counters, gauges or histograms with the same name and
+    label names. Samples are updated through the registry the metric belongs to.
+"""
+
+class Metric:
+
+    __slots__ = ("registry", "name", "help", "kind", "labels", "buckets")
+
+    def __init__(self, registry, name: str, help: str, kind: str, labels: tuple, buckets: tuple = None):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = labels
+        self.buckets = buckets
+
+    def inc(self, labels: tuple, amount: float = 1):
+        """
+        Increases a counter.
+
+        Args:
+            labels (tuple): The label values, in the order of the label names.
+            amount (float): The amount to add.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        shard = self.registry.get_shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def set(self, labels: tuple, value: float):
+        """
+        Sets a gauge.
+
+        Args:
+            labels (tuple): The label values, in the order of the label names.
+            value (float): The value.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        # Gauges hold the last value set by any thread, a single assignment needs no shard
+        self.registry.gauges[(self.name, labels)] = value
+
+    def observe(self, labels: tuple, value: float):
+        """
+        Records an observation in a histogram.
+
+        Args:
+            labels (tuple): The label values, in the order of the label names.
+            value (float): The observed value.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        shard = self.registry.get_shard()
+        key = (self.name, labels)
+        counts = shard.get(key)
+        if counts is None:
+            # One count per bucket and the overflow bucket, followed by the sum
+            counts = [0] * (len(self.buckets) + 2)
+            shard[key] = counts
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+"""
+    Objects of class Registry hold counters, gauges and histograms, and render them in the OpenMetrics
+    text format.
+
+    Every thread updates a shard of its own, a plain dictionary only that thread writes to, so updates
+    take no lock. The shards are merged when the metrics are rendered, typically on a scrape.
+"""
+
+class Registry:
+
+    def __init__(self, logger, namespace: str = "donp"):
+        # Setup logger
+        self.logger = logger
+        # Initialize registry fields
+        self.namespace = namespace
+        self.metrics = {}
+        self.gauges = {}
+        self.shards = []
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labels: tuple = ()):
+        """
+        Registers a counter.
+
+        Args:
+            name (str): The name, without namespace and _total suffix.
+            help (str): The description.
+            labels (tuple): The label names.
+        Returns:
+            Metric: The counter.
+        Raises:
+            ValueError: If another metric has the same name.
+        """
+        return self.register(Metric(self, f"{self.namespace}_{name}", help, "counter", labels))
+
+    def gauge(self, name: str, help: str, labels: tuple = ()):
+        """
+        Registers a gauge.
+
+        Args:
+            name (str): The name, without namespace.
+            help (str): The description.
+            labels (tuple): The label names.
+        Returns:
+            Metric: The gauge.
+        Raises:
+            ValueError: If another metric has the same name.
+        """
+        return self.register(Metric(self, f"{self.namespace}_{name}", help, "gauge", labels))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        """
+        Registers a histogram.
+
+        Args:
+            name (str): The name, without namespace.
+            help (str): The description.
+            labels (tuple): The label names.
+            buckets (tuple): The upper bounds of the buckets, in increasing order.
+        Returns:
+            Metric: The histogram.
+        Raises:
+            ValueError: If another metric has the same name.
+        """
+        return self.register(Metric(self, f"{self.namespace}_{name}", help, "histogram", labels, tuple(sorted(buckets))))
+
+    def register(self, metric: Metric):
+        """
+        Adds a metric to the registry.
+
+        Args:
+            metric (Metric): The metric.
+        Returns:
+            Metric: The metric.
+        Raises:
+            ValueError: If another metric has the same name.
+        """
+        if metric.name in self.metrics:
+            raise ValueError(f"Registry: metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def get_shard(self):
+        """
+        Retrieves the shard of the calling thread, creating it on first use.
+
+        Args:
+            None
+        Returns:
+            dict: The shard.
+        Raises:
+            None
+        """
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = {}
+            self.local.shard = shard
+            with self.lock:
+                self.shards.append(shard)
+            return shard
+
+    def collect(self):
+        """
+        Merges the shards of all threads.
+
+        Args:
+            None
+        Returns:
+            dict: The merged value of each sample by metric name and label values.
+        Raises:
+            None
+        """
+        with self.lock:
+            shards = list(self.shards)
+        merged = {}
+        for shard in shards:
+            # Copied in a single step, as its thread may add samples meanwhile
+            for key, value in shard.copy().items():
+                if isinstance(value, list):
+                    total = merged.get(key)
+                    if total is None:
+                        merged[key] = list(value)
+                    else:
+                        for i, count in enumerate(value):
+                            total[i] += count
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        merged.update(self.gauges.copy())
+        return merged
+
+    def render(self):
+        """
+        Renders every metric in the OpenMetrics text format.
+
+        Args:
+            None
+        Returns:
+            str: The exposition.
+        Raises:
+            None
+        """
+        samples = {}
+        for (name, labels), value in self.collect().items():
+            samples.setdefault(name, []).append((labels, value))
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.append(f"# HELP {name} {metric.help}")
+            for labels, value in sorted(samples.get(name, []), key=lambda sample: sample[0]):
+                label_text = [f'{label}="{escape(value_text)}"' for label, value_text in zip(metric.labels, labels)]
+                if metric.kind == "counter":
+                    lines.append(f"{name}_total{format_labels(label_text)} {value}")
+                elif metric.kind == "gauge":
+                    lines.append(f"{name}{format_labels(label_text)} {value}")
+                else:
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + ("+Inf",), value):
+                        cumulative += count
+                        bucket = label_text + ['le="%s"' % bound]
+                        lines.append(f"{name}_bucket{format_labels(bucket)} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(label_text)} {value[-1]}")
+                    lines.append(f"{name}_count{format_labels(label_text)} {cumulative}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+def escape(value):
+    """
+    Escapes a label value for the OpenMetrics text format.
+
+    Args:
+        value: The label value.
+    Returns:
+        str: The escaped value.
+    Raises:
+        None
+    """
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(labels: list):
+    """
+    Formats the label pairs of a sample.
+
+    Args:
+        labels (list[str]): The label pairs.
+    Returns:
+        str: The label set, empty if there are no labels.
+    Raises:
+        None
+    """
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+"""
+    Objects of class TransactionMetrics register and update transaction metrics, labelled by protocol tag,
+    device address and function code: transactions, bytes sent and received, checksum failures, timeouts,
+    exception responses, skipped transactions and latency, and whether the circuit breaker of a device is open.
+"""
+
+class TransactionMetrics:
+
+    def __init__(self, registry: Registry):
+        # Initialize metric fields
+        self.registry = registry
+        labels = ("protocol", "device", "function")
+        self.transactions = registry.counter("transactions", "Transactions attempted.", labels)
+        self.sent = registry.counter("sent_bytes", "Bytes transmitted.", labels)
+        self.received = registry.counter("received_bytes", "Bytes received.", labels)
+        self.invalid = registry.counter("checksum_failures", "Responses failing validation.", labels)
+        self.timeouts = registry.counter("timeouts", "Requests not answered by their deadline.", labels)
+        self.exceptions = registry.counter("exceptions", "Requests answered with an exception response.", labels)
+        self.skipped = registry.counter("skipped", "Transactions skipped while the circuit breaker was open.", labels)
+        self.latency = registry.histogram("latency_seconds", "Time from transmission to a valid response.", labels)
+        self.breaker = registry.gauge("breaker_open", "Whether the circuit breaker of a device is open.", ("protocol", "device"))
+
+    def record_sent(self, labels: tuple, size: int):
+        """
+        Records a transmitted request.
+
+        Args:
+            labels (tuple): The protocol tag, device address and function code.
+            size (int): The request length in bytes.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.transactions.inc(labels)
+        self.sent.inc(labels, size)
+
+    def record_received(self, labels: tuple, size: int, latency: float):
+        """
+        Records a received response that passed validation.
+
+        Args:
+            labels (tuple): The protocol tag, device address and function code.
+            size (int): The response length in bytes.
+            latency (float): The time from transmission to reception, in seconds.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.received.inc(labels, size)
+        self.latency.observe(labels, latency)
+
+    def record_failure(self, labels: tuple, outcome, size: int = 0):
+        """
+        Records a failed attempt or a skipped transaction.
+
+        Args:
+            labels (tuple): The protocol tag, device address and function code.
+            outcome (Outcome): The outcome, TIMEOUT, INVALID, EXCEPTION or SKIPPED.
+            size (int): The length in bytes of the response received, if any.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        if size:
+            self.received.inc(labels, size)
+        if outcome == Outcome.TIMEOUT:
+            self.timeouts.inc(labels)
+        elif outcome == Outcome.INVALID:
+            self.invalid.inc(labels)
+        elif outcome == Outcome.EXCEPTION:
+            self.exceptions.inc(labels)
+        elif outcome == Outcome.SKIPPED:
+            self.skipped.inc(labels)
+
+    def set_breaker(self, protocol: str, device: int, open: bool):
+        """
+        Records whether the circuit breaker of a device is open.
+
+        Args:
+            protocol (str): The protocol tag.
+            device (int): The device address.
+            open (bool): Whether the breaker is open.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.breaker.set((protocol, device), 1 if open else 0)
+
+"""
+    The MetricsServer class serves the metrics of a registry in the OpenMetrics text format over HTTP, from
+    a background thread. It binds to localhost by default, and renders the metrics on every scrape only.
+"""
+
+class MetricsServer:
+
+    def __init__(self, registry: Registry, logger, host: str = "127.0.0.1", port: int = 9464):
+        # Setup logger
+        self.logger = logger
+        # Initialize server fields
+        self.registry = registry
+        self.server = ThreadingHTTPServer((host, port), self.get_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def get_handler(self):
+        """
+        Builds the request handler class serving the registry.
+
+        Args:
+            None
+        Returns:
+            type: The request handler class.
+        Raises:
+            None
+        """
+        registry = self.registry
+        logger = self.logger
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("MetricsServer: " + format, *args)
+
+        return Handler
+
+    @property
+    def port(self):
+        """
+        Retrieves the port the server listens on, useful when bound to port 0.
+
+        Args:
+            None
+        Returns:
+            int: The port.
+        Raises:
+            None
+        """
+        return self.server.server_address[1]
+
+    def start(self):
+        """
+        Starts serving from a background thread.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, name="MetricsServer", daemon=True)
+        self.thread.start()
+        self.logger.info("MetricsServer: serving http://%s:%d/metrics", self.server.server_address[0], self.port)
+
+    def stop(self):
+        """
+        Stops serving and closes the socket.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,349 @@
+"""
+    Package 'observe' provides mechanism's for observing and logging system statistics during application runtime.
+"""
+
+import json
+import math
+import os
+import queue
+import threading
+import numpy as np
+
+FORMAT_VERSION = 1
+INDEX_FILE = "index.json"
+
+# Row columns and their little-endian types, the values of all rows are kept in one further column
+COLUMNS = {
+    "timestamp": "<f8",
+    "device": "<u2",
+    "function": "<u2",
+    "starting_address": "<u4",
+    "value_offset": "<u8",
+    "value_count": "<u4",
+}
+VALUES = "values"
+VALUES_TYPE = "<f8"
+
+"""
+    Objects of class ResultBatch hold preallocated column buffers for a fixed number of rows, and for the
+    values of those rows in a single flat buffer.
+"""
+
+class ResultBatch:
+
+    __slots__ = ("columns", "values", "rows", "count")
+
+    def __init__(self, rows: int, values: int):
+        self.columns = {name: np.empty(rows, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.values = np.empty(values, dtype=VALUES_TYPE)
+        self.rows = 0
+        self.count = 0
+
+    def is_full(self, values: int):
+        """
+        Checks whether a row with the given number of values no longer fits.
+
+        Args:
+            values (int): The number of values of the row.
+        Returns:
+            bool: True if the row does not fit, False otherwise.
+        Raises:
+            None
+        """
+        return self.rows == len(self.columns["timestamp"]) or self.count + values > len(self.values)
+
+"""
+    Objects of class ResultSink store poll results as rows of timestamp, device address, function code,
+    starting address and values, in an append-only columnar format: one raw little-endian file per column in
+    a directory, with an index recording the row and value counts written.
+
+    Rows are accumulated in preallocated column buffers and full batches are handed to a writer thread, so
+    appending a row never waits for the disk. When the writer falls behind, further batches are allocated up
+    to max_batches. Beyond that the rows of a full batch are dropped and counted, or with block set, appending
+    waits for the writer, e.g. for a pipeline deciding itself whether to wait or drop. Values are stored as 64
+    bit floats, string values as NaN.
+
+    A batch that fails to be written, e.g. on a full disk, may be partly in some column files already. The sink
+    then fails: nothing more is written, further rows are dropped and counted, and the column files are cut
+    back to the indexed counts when the sink is closed.
+"""
+
+class ResultSink:
+
+    def __init__(self, directory: str, logger, batch_rows: int = 4096, values_per_row: int = 8, max_batches: int = 4, block: bool = False):
+        # Setup logger
+        self.logger = logger
+        # Initialize sink fields
+        self.directory = directory
+        self.batch_rows = batch_rows
+        self.batch_values = batch_rows * values_per_row
+        self.max_batches = max(max_batches, 2)
+        self.block = block
+        self.free = queue.Queue()
+        self.pending = queue.Queue()
+        self.error = None
+        self.dropped = 0
+        # Rows of batches handed to the writer after it failed, counted on the writer thread
+        self.lost = 0
+        os.makedirs(directory, exist_ok=True)
+        self.index = self.__init_index()
+        self.values_total = self.index["values"]
+        self.files = self.__init_files()
+        self.batch = ResultBatch(self.batch_rows, self.batch_values)
+        self.allocated = 1
+        self.writer = threading.Thread(target=self.write_batches, name="ResultSink", daemon=True)
+        self.writer.start()
+
+    def __init_index(self):
+        # Continue an existing result directory, or start a new one
+        index = read_index(self.directory)
+        if index is None:
+            columns = dict(COLUMNS)
+            columns[VALUES] = VALUES_TYPE
+            return {"format_version": FORMAT_VERSION, "rows": 0, "values": 0, "columns": columns}
+        if index.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"ResultSink: unsupported result format in {self.directory}")
+        # Earlier sinks listed every batch written, which only the totals are needed of
+        index.pop("batches", None)
+        return index
+
+    def __init_files(self):
+        # Drop anything written after the last indexed batch, e.g. by an interrupted run
+        files = {}
+        for name, dtype in self.index["columns"].items():
+            path = get_column_path(self.directory, name)
+            count = self.index["values"] if name == VALUES else self.index["rows"]
+            f = open(path, "ab")
+            f.truncate(count * np.dtype(dtype).itemsize)
+            files[name] = f
+        return files
+
+    def append(self, timestamp: float, device: int, function: int, starting_address: int, values: tuple):
+        """
+        Appends a row, handing the current batch to the writer thread once it is full.
+
+        Args:
+            timestamp (float): The time of the response, in seconds since the epoch.
+            device (int): The device address.
+            function (int): The function code.
+            starting_address (int): The starting address.
+            values (tuple): The values.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        if self.error is not None:
+            # The sink failed, see write_batches
+            self.dropped += 1
+            return
+        count = len(values)
+        if count > self.batch_values:
+            self.logger.warning("ResultSink: dropping row of %d values, more than a batch holds", count)
+            self.dropped += 1
+            return
+        batch = self.batch
+        if batch.is_full(count):
+            self.flush()
+            batch = self.batch
+        row = batch.rows
+        columns = batch.columns
+        columns["timestamp"][row] = timestamp
+        columns["device"][row] = device
+        columns["function"][row] = function
+        columns["starting_address"][row] = starting_address
+        columns["value_offset"][row] = self.values_total + batch.count
+        columns["value_count"][row] = count
+        try:
+            batch.values[batch.count:batch.count + count] = values
+        except ValueError:
+            batch.values[batch.count:batch.count + count] = [math.nan if isinstance(value, str) else value for value in values]
+        batch.rows += 1
+        batch.count += count
+
+    def flush(self):
+        """
+        Hands the current batch to the writer thread, without waiting for it to be written. Once max_batches
+        are in use the rows of the batch are dropped instead, unless the sink blocks, waiting for a free batch.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        batch = self.batch
+        if batch.rows == 0:
+            return
+        # Reuse a batch the writer is done with, or allocate another one rather than wait
+        try:
+            free = self.free.get_nowait()
+        except queue.Empty:
+            free = None
+        if free is None and self.allocated < self.max_batches:
+            free = ResultBatch(self.batch_rows, self.batch_values)
+            self.allocated += 1
+        if free is None and not self.block:
+            # The writer is behind by max_batches, keep the memory bounded
+            self.dropped += batch.rows
+            batch.rows = 0
+            batch.count = 0
+            return
+        self.values_total += batch.count
+        self.pending.put(batch)
+        self.batch = free if free is not None else self.free.get()
+
+    def write_batches(self):
+        """
+        Writes the batches handed over, until the sink is closed, and none after a write failed. Runs on the
+        writer thread.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        while True:
+            batch = self.pending.get()
+            if batch is None:
+                return
+            if self.error is not None:
+                self.lost += batch.rows
+            else:
+                try:
+                    self.write(batch)
+                except OSError as e:
+                    self.logger.error("ResultSink: unable to write results to %s, dropping further rows: %s", self.directory, e)
+                    self.lost += batch.rows
+                    self.error = e
+            batch.rows = 0
+            batch.count = 0
+            self.free.put(batch)
+
+    def write(self, batch: ResultBatch):
+        """
+        Appends a batch to the column files, then records it in the index.
+
+        Args:
+            batch (ResultBatch): The batch.
+        Returns:
+            None
+        Raises:
+            OSError: If a file cannot be written.
+        """
+        # Written straight from the column buffers, without copying them
+        for name, column in batch.columns.items():
+            self.files[name].write(memoryview(column[:batch.rows]))
+        self.files[VALUES].write(memoryview(batch.values[:batch.count]))
+        for f in self.files.values():
+            f.flush()
+        index = self.index
+        index["rows"] += batch.rows
+        index["values"] += batch.count
+        # The index only ever lists complete batches
+        temporary = os.path.join(self.directory, INDEX_FILE + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(temporary, os.path.join(self.directory, INDEX_FILE))
+
+    def close(self):
+        """
+        Writes the remaining rows and waits for the writer thread to finish. If a write failed, the column
+        files are cut back to the rows and values recorded in the index.
+
+        Args:
+            None
+        Returns:
+            int: The number of rows stored in the directory.
+        Raises:
+            None
+        """
+        # The last rows are waited for rather than dropped
+        self.block = True
+        self.flush()
+        self.pending.put(None)
+        self.writer.join()
+        for f in self.files.values():
+            try:
+                f.close()
+            except OSError as e:
+                self.logger.error("ResultSink: unable to close %s: %s", f.name, e)
+        if self.error is not None:
+            self.truncate()
+        self.logger.info("ResultSink: %d rows in %s, dropped=%d", self.index["rows"], self.directory, self.dropped + self.lost)
+        return self.index["rows"]
+
+    def truncate(self):
+        """
+        Cuts every column file back to the rows or values recorded in the index, dropping the part of a
+        batch that failed to be written.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        for name, dtype in self.index["columns"].items():
+            count = self.index["values"] if name == VALUES else self.index["rows"]
+            try:
+                os.truncate(get_column_path(self.directory, name), count * np.dtype(dtype).itemsize)
+            except OSError as e:
+                self.logger.error("ResultSink: unable to truncate column %s: %s", name, e)
+
+def get_column_path(directory: str, name: str):
+    """
+    Determines the file of a column.
+
+    Args:
+        directory (str): The result directory.
+        name (str): The column name.
+    Returns:
+        str: The column file path.
+    Raises:
+        None
+    """
+    return os.path.join(directory, name + ".bin")
+
+def read_index(directory: str):
+    """
+    Reads the index of a result directory.
+
+    Args:
+        directory (str): The result directory.
+    Returns:
+        dict: The index, or None if the directory holds no results.
+    Raises:
+        ValueError: If the index is not valid JSON.
+    """
+    try:
+        with open(os.path.join(directory, INDEX_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def open_column(directory: str, name: str):
+    """
+    Memory-maps a single column of a result directory, read-only and without reading the other columns.
+
+    Args:
+        directory (str): The result directory.
+        name (str): The column name, one of the row columns or values.
+    Returns:
+        numpy.ndarray: The column, covering the indexed rows or values only.
+    Raises:
+        KeyError: If there is no such column.
+        FileNotFoundError: If the directory holds no results.
+    """
+    index = read_index(directory)
+    if index is None:
+        raise FileNotFoundError(f"ResultSink: no results in {directory}")
+    dtype = index["columns"][name]
+    count = index["values"] if name == VALUES else index["rows"]
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(get_column_path(directory, name), dtype=dtype, mode="r", shape=(count,))
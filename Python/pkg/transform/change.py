@@ -0,0 +1,181 @@
+"""
+	Package 'transform' provides mechanism's for converting data between different formats.
+"""
+
+import struct
+import threading
+from pkg.component.message import DataType
+
+# Struct format and size of each register based data type, big-endian as sent
+TYPE_FORMATS = {
+    DataType.INT16.value: ("h", 2),
+    DataType.INT32.value: ("i", 4),
+    DataType.FLOAT.value: ("f", 4),
+}
+
+def get_values(message, data: bytes):
+    """
+    Decodes the data bytes of a response into the typed values of a message, by its data type.
+
+    Args:
+        message (Message): The message object.
+        data (bytes): The data bytes of the response.
+    Returns:
+        tuple: The values: integers for int16, int32 and bit, floats for float, a single str for string.
+    Raises:
+        None
+    """
+    data_type = getattr(message, "data_type", None)
+    data_type = DataType.INT16.value if data_type is None else data_type.lower()
+    if data_type == DataType.BIT.value:
+        # Bits are packed least significant bit first
+        count = min(message.get_data_length(), len(data) * 8)
+        return tuple((data[i >> 3] >> (i & 7)) & 1 for i in range(count))
+    if data_type == DataType.STRING.value:
+        return (bytes(data).rstrip(b"\x00").decode("ascii", "replace"),)
+    code, size = TYPE_FORMATS.get(data_type, TYPE_FORMATS[DataType.INT16.value])
+    count = len(data) // size
+    return struct.unpack_from(f">{count}{code}", data)
+
+"""
+    Objects of class Change describe a reported change of the values of a device message.
+"""
+
+class Change:
+
+    __slots__ = ("message", "device", "values", "previous", "changed")
+
+    def __init__(self, message, device, values: tuple, previous: tuple, changed: tuple):
+        self.message = message
+        self.device = device
+        self.values = values
+        self.previous = previous
+        self.changed = changed
+
+"""
+    Objects of class ChangeDetector keep the last response of every device message, and report a response
+    only when its values changed. An unchanged response is recognised by comparing its data bytes with the
+    previous ones, before any value is decoded. Otherwise the values are decoded by data type, and a value
+    only counts as changed once it moved further than its deadband from the value last reported.
+
+    Deadbands are taken from the optional deadband field of a message, either a single number for every
+    value or a list with one number per value, and else from the default deadband.
+
+    A detector may be shared by the protocols of a runtime, whose poll cycles run on several threads, so
+    its state is only changed under a lock.
+"""
+
+class ChangeDetector:
+
+    def __init__(self, logger, deadband: float = 0):
+        # Setup logger
+        self.logger = logger
+        # Initialize detector fields
+        self.deadband = deadband
+        self.payloads = {}
+        self.reported = {}
+        self.counters = {"polled": 0, "unchanged": 0, "suppressed": 0, "changed": 0}
+        self.lock = threading.Lock()
+
+    def get_deadbands(self, message, count: int):
+        """
+        Retrieves the deadband of each value of a message.
+
+        Args:
+            message (Message): The message object.
+            count (int): The number of values.
+        Returns:
+            list[float]: The deadband of each value.
+        Raises:
+            ValueError: If a list of deadbands does not have one deadband per value.
+        """
+        deadband = getattr(message, "deadband", self.deadband)
+        if isinstance(deadband, list):
+            if len(deadband) != count:
+                raise ValueError(f"ChangeDetector: {message.name} has {len(deadband)} deadbands for {count} values")
+            return deadband
+        return [deadband] * count
+
+    def update(self, message, device, data: bytes):
+        """
+        Compares the data bytes of a response with the previous response of the same device message.
+
+        Args:
+            message (Message): The message object.
+            device (Device): The device object.
+            data (bytes): The data bytes of the response.
+        Returns:
+            Change: The change, or None if no value changed beyond its deadband.
+        Raises:
+            ValueError: If a list of deadbands does not have one deadband per value.
+        """
+        with self.lock:
+            self.counters["polled"] += 1
+            previous_data = self.payloads.get(message)
+            if previous_data is not None and previous_data == data:
+                self.counters["unchanged"] += 1
+                return None
+            values = get_values(message, data)
+            previous = self.reported.get(message)
+            if previous is None or len(previous) != len(values):
+                changed = tuple(range(len(values)))
+            else:
+                # Compared before the data bytes are recorded, which a deadband error leaves untouched
+                changed = tuple(self.get_changed(message, values, previous))
+                self.payloads[message] = bytes(data)
+                if len(changed) == 0:
+                    # Still recorded as the latest data bytes, the reported values stay the reference
+                    self.counters["suppressed"] += 1
+                    return None
+            self.payloads[message] = bytes(data)
+            self.reported[message] = values
+            self.counters["changed"] += 1
+            return Change(message, device, values, previous, changed)
+
+    def get_changed(self, message, values: tuple, previous: tuple):
+        """
+        Yields the index of every value that moved beyond its deadband.
+
+        Args:
+            message (Message): The message object.
+            values (tuple): The new values.
+            previous (tuple): The values last reported.
+        Returns:
+            Generator of int: The indexes of the changed values.
+        Raises:
+            ValueError: If a list of deadbands does not have one deadband per value.
+        """
+        deadbands = self.get_deadbands(message, len(values))
+        for index, (value, reported, deadband) in enumerate(zip(values, previous, deadbands)):
+            if value == reported:
+                continue
+            if isinstance(value, str) or not abs(value - reported) <= deadband:
+                yield index
+
+    def forget(self, message):
+        """
+        Drops the state of a device message, so that its next response is reported.
+
+        Args:
+            message (Message): The message object.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        with self.lock:
+            self.payloads.pop(message, None)
+            self.reported.pop(message, None)
+
+    def log(self):
+        """
+        Outputs the detector counters.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.logger.info("ChangeDetector: %s", ", ".join(f"{name}={count}" for name, count in self.counters.items()))
@@ -0,0 +1,377 @@
+"""
+	Package 'transform' provides mechanism's for converting data between different formats.
+"""
+
+import keyword
+from constants import Direction, Mode
+
+"""
+    The Compiler class generates a specialised Python function for each prototype and direction, in the
+    way namedtuple and dataclasses generate their methods: the source is assembled as text and executed.
+    Encoders build a message exactly as Protocol.get_message_from_prototype does, and decoders split a
+    message exactly as Prototype.decode does, with every segment offset, width and the checksum call written
+    out in a straight line instead of interpreted segment by segment.
+
+    The generated source is kept for inspection. Prototypes whose segments cannot be expressed in a straight
+    line, such as fields narrower than a byte, are not compiled and use the interpreted path, as does any
+    message whose values do not fit their segments, so the output always matches the interpreted path.
+"""
+
+class Compiler:
+
+    def __init__(self, protocol, logger):
+        # Setup logger
+        self.logger = logger
+        # Initialize compiler fields
+        self.protocol = protocol
+        self.encoders = {}
+        self.writers = {}
+        self.decoders = {}
+        self.sources = {}
+
+    def encode(self, prototype, direction: Direction, message, device):
+        """
+        Builds a message with the compiled encoder of a prototype, or with the interpreted path if the
+        prototype or the message values cannot be compiled.
+
+        Args:
+            prototype (Prototype): The prototype object.
+            direction (Direction): The direction of the message (TX or RX).
+            message (Message): The message object.
+            device (Device): The device object.
+        Returns:
+            bytearray: The constructed message bytearray.
+        Raises:
+            ValueError: If a segment value cannot be found.
+        """
+        key = (prototype.name, direction)
+        encoder = self.encoders.get(key, ...)
+        if encoder is ...:
+            encoder = self.compile_encoder(prototype, direction)
+        if encoder is not None:
+            try:
+                return encoder(message, device)
+            except (AttributeError, OverflowError, TypeError):
+                # Missing or out of range values, the interpreted path reports or truncates them
+                pass
+        return self.protocol.get_message_from_prototype(prototype, direction, message, device)
+
+    def encode_into(self, buffer: bytearray, prototype, direction: Direction, message, device):
+        """
+        Appends a message to a buffer with the compiled encoder of a prototype, or with the interpreted
+        path if the prototype or the message values cannot be compiled.
+
+        Args:
+            buffer (bytearray): The buffer to append to.
+            prototype (Prototype): The prototype object.
+            direction (Direction): The direction of the message (TX or RX).
+            message (Message): The message object.
+            device (Device): The device object.
+        Returns:
+            int: The length of the appended message.
+        Raises:
+            ValueError: If a segment value cannot be found.
+        """
+        key = (prototype.name, direction)
+        writer = self.writers.get(key, ...)
+        if writer is ...:
+            writer = self.compile_encoder(prototype, direction, into=True)
+        start = len(buffer)
+        if writer is not None:
+            try:
+                return writer(buffer, message, device)
+            except (AttributeError, OverflowError, TypeError):
+                # Values are packed before anything is appended, but never leave a partial message behind
+                del buffer[start:]
+        buffer += self.protocol.get_message_from_prototype(prototype, direction, message, device)
+        return len(buffer) - start
+
+    def decode(self, prototype, direction: Direction, data: bytes):
+        """
+        Decodes a message in hexadecimal format, excluding prefix and suffix, with the compiled decoder
+        of a prototype.
+
+        Args:
+            prototype (Prototype): The prototype object.
+            direction (Direction): The direction of the message.
+            data (bytes): The message bytes.
+        Returns:
+            dict: The integer value of each segment by name, and the data bytes as bytes.
+        Raises:
+            ValueError: If the message length does not match the segments.
+        """
+        decoder = self.decoders.get((prototype.name, direction))
+        if decoder is None:
+            decoder = self.compile_decoder(prototype, direction)
+        return decoder(data)
+
+    def forget(self, name: str):
+        """
+        Drops the compiled functions of a prototype, e.g. after its definition changed on a reload,
+        so that they are compiled again on next use.
+
+        Args:
+            name (str): The prototype name.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        for direction in Direction:
+            self.encoders.pop((name, direction), None)
+            self.writers.pop((name, direction), None)
+            self.decoders.pop((name, direction), None)
+            for kind in ("encode", "encode_into", "decode"):
+                self.sources.pop((kind, name, direction), None)
+
+    def get_source(self, prototype, direction: Direction, kind: str = "encode"):
+        """
+        Retrieves the generated source of a compiled function.
+
+        Args:
+            prototype (Prototype): The prototype object.
+            direction (Direction): The direction of the function.
+            kind (str): One of encode, encode_into or decode.
+        Returns:
+            str: The source, or None if the function was not compiled.
+        Raises:
+            None
+        """
+        return self.sources.get((kind, prototype.name, direction))
+
+    def compile_encoder(self, prototype, direction: Direction, into: bool = False):
+        """
+        Generates and compiles the encoder of a prototype and direction.
+
+        Args:
+            prototype (Prototype): The prototype object.
+            direction (Direction): The direction of the message (TX or RX).
+            into (bool): Whether the encoder appends to a given buffer rather than returning a new message.
+        Returns:
+            callable: The encoder taking a message and a device, preceded by the buffer if appending,
+            or None if the prototype cannot be compiled.
+        Raises:
+            None
+        """
+        kind = "encode_into" if into else "encode"
+        source = self.get_encoder_source(prototype, direction, into)
+        encoder = None
+        if source is not None:
+            namespace = self.get_namespace()
+            encoder = self.execute(source, namespace, (kind, prototype.name, direction))
+        else:
+            self.logger.debug("Compiler: %s %s is interpreted", prototype.name, direction.value)
+        (self.writers if into else self.encoders)[(prototype.name, direction)] = encoder
+        return encoder
+
+    def compile_decoder(self, prototype, direction: Direction):
+        """
+        Generates and compiles the decoder of a prototype and direction.
+
+        Args:
+            prototype (Prototype): The prototype object.
+            direction (Direction): The direction of the message.
+        Returns:
+            callable: The decoder taking the message bytes.
+        Raises:
+            None
+        """
+        source = self.get_decoder_source(prototype, direction)
+        decoder = self.execute(source, {}, ("decode", prototype.name, direction))
+        self.decoders[(prototype.name, direction)] = decoder
+        return decoder
+
+    def execute(self, source: str, namespace: dict, key: tuple):
+        """
+        Executes generated source and retrieves the function it defines.
+
+        Args:
+            source (str): The source of a single function.
+            namespace (dict): The globals of the function.
+            key (tuple): The kind, prototype name and direction the source is kept by.
+        Returns:
+            callable: The function.
+        Raises:
+            None
+        """
+        self.sources[key] = source
+        code = compile(source, f"<donp {key[0]} {key[1]} {key[2].value}>", "exec")
+        exec(code, namespace)
+        return namespace[key[0]]
+
+    def get_namespace(self):
+        """
+        Builds the globals of generated encoders: the protocol framing and data byte source.
+
+        Args:
+            None
+        Returns:
+            dict: The namespace.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        return {
+            "PREFIX": self.get_framing(protocol.prefix),
+            "SUFFIX": self.get_framing(protocol.suffix),
+            "data_bytes": protocol.get_data_bytes,
+            "crc16": protocol.checksum.calculate_crc16_table,
+        }
+
+    def get_framing(self, text: str):
+        """
+        Converts a prefix or suffix to bytes as Protocol.append_str_to_byte_array does.
+
+        Args:
+            text (str): The prefix or suffix.
+        Returns:
+            bytes: The framing bytes.
+        Raises:
+            ValueError: If a character does not fit a byte.
+        """
+        return bytes(ord(char.upper()) for char in text)
+
+    def get_value_expression(self, name: str):
+        """
+        Retrieves the expression reading a segment value from the message.
+
+        Args:
+            name (str): The segment name.
+        Returns:
+            str: The expression.
+        Raises:
+            None
+        """
+        if name.isidentifier() and not keyword.iskeyword(name) and not name.startswith("__"):
+            return f"message.{name}"
+        return f"getattr(message, {name!r})"
+
+    def get_encoder_source(self, prototype, direction: Direction, into: bool = False):
+        """
+        Generates the source of the encoder of a prototype and direction. Every value is read and packed
+        before the random data bytes are drawn, so falling back to the interpreted path never draws them twice.
+
+        Args:
+            prototype (Prototype): The prototype object.
+            direction (Direction): The direction of the message (TX or RX).
+            into (bool): Whether the encoder appends to a given buffer rather than returning a new message.
+        Returns:
+            str: The source, or None if the prototype cannot be compiled.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        segments = prototype.get_segments(direction)
+        if segments is None:
+            return None
+        calculation = protocol.checksum.calculation
+        checksum_size = protocol.checksum.get_size_of_checksum()
+        try:
+            self.get_framing(protocol.prefix + protocol.suffix)
+        except ValueError:
+            return None
+        prefix = len(protocol.prefix)
+        # Checksums exclude the prefix, and in a shared buffer every message before this one
+        if into:
+            data = f"msg[start + {prefix}:]" if prefix else "msg[start:]"
+        else:
+            data = f"msg[{prefix}:]" if prefix else "msg"
+        values = []
+        body = []
+        for index, segment in enumerate(segments):
+            if segment.bits <= 0 or segment.bits % 8 != 0:
+                return None
+            width = segment.bits // 8
+            if segment.name == "error_check":
+                if calculation.startswith("LRC"):
+                    # Two's complement of the byte sum, as Checksum.calculate_lrc computes it
+                    expression = f"(-sum({data})) & 0xFF"
+                elif calculation.startswith("CRC") and checksum_size > 0:
+                    expression = f"crc16({data})"
+                else:
+                    return None
+                # A checksum wider than its segment is truncated by the interpreted path
+                if calculation.startswith("CRC") and width < checksum_size:
+                    return None
+                body.append(f"    msg += ({expression}).to_bytes({width}, 'big')")
+            elif segment.name == "data_bytes":
+                values.append(f"    c{index} = message.get_data_byte_count()")
+                body.append(f"    r{index} = data_bytes(message, ({segment.bits} * c{index} + 7) // 8)")
+                if width == 1:
+                    body.append(f"    msg += r{index}")
+                else:
+                    body.append(f"    for b in r{index}:")
+                    body.append(f"        msg += b.to_bytes({width}, 'big')")
+            else:
+                if segment.name == "slave_address":
+                    expression = "device.address"
+                elif segment.name == "byte_count":
+                    expression = "message.get_data_byte_count()"
+                else:
+                    expression = self.get_value_expression(segment.name)
+                values.append(f"    v{index} = {expression}.to_bytes({width}, 'big')")
+                body.append(f"    msg += v{index}")
+        lines = ["def encode_into(msg, message, device):" if into else "def encode(message, device):"]
+        lines.append(f"    # {prototype.name!r} {direction.value}")
+        lines.extend(values)
+        if into:
+            lines.append("    start = len(msg)")
+            lines.append("    msg += PREFIX")
+        else:
+            lines.append("    msg = bytearray(PREFIX)")
+        lines.extend(body)
+        lines.append("    msg += SUFFIX")
+        # Every byte, prefix and suffix included, is sent as two uppercase hexadecimal characters
+        ascii_mode = protocol.conversion.mode == Mode.ASCII.value
+        if into:
+            if ascii_mode:
+                lines.append("    msg[start:] = msg[start:].hex().upper().encode()")
+            lines.append("    return len(msg) - start")
+        elif ascii_mode:
+            lines.append("    return bytearray(msg.hex().upper().encode())")
+        else:
+            lines.append("    return msg")
+        return "\n".join(lines) + "\n"
+
+    def get_decoder_source(self, prototype, direction: Direction):
+        """
+        Generates the source of the decoder of a prototype and direction. Offsets are constants up to
+        the data bytes, whose size depends on the byte count, and relative to their end thereafter.
+
+        Args:
+            prototype (Prototype): The prototype object.
+            direction (Direction): The direction of the message.
+        Returns:
+            str: The source.
+        Raises:
+            ValueError: If the direction is invalid.
+        """
+        name = prototype.name
+        lines = ["def decode(data):", f"    # {name!r} {direction.value}", "    n = len(data)", "    fields = {}"]
+        offset = 0
+        base = None
+        for segment in prototype.get_segments(direction):
+            start = str(offset) if base is None else f"{base} + {offset}" if offset else base
+            short = repr(f"Prototype: {name} message too short for segment {segment.name}")
+            if segment.name == "data_bytes":
+                lines.append(f"    o = {start} + ({segment.bits} * fields.get('byte_count', 0) + 7) // 8")
+                lines.append("    if o > n:")
+                lines.append(f"        raise ValueError({short})")
+                lines.append(f"    fields[{segment.name!r}] = bytes(data[{start}:o])")
+                base = "o"
+                offset = 0
+                continue
+            size = segment.bits // 8
+            offset += size
+            end = str(offset) if base is None else f"{base} + {offset}"
+            lines.append(f"    if {end} > n:")
+            lines.append(f"        raise ValueError({short})")
+            if size == 1:
+                lines.append(f"    fields[{segment.name!r}] = data[{start}]")
+            else:
+                lines.append(f"    fields[{segment.name!r}] = int.from_bytes(data[{start}:{end}], 'big')")
+        end = str(offset) if base is None else f"{base} + {offset}"
+        lines.append(f"    if {end} != n:")
+        lines.append(f"        raise ValueError({'Prototype: ' + name + ' message has '!r} + str(n - ({end})) + ' unexpected bytes')")
+        lines.append("    return fields")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,276 @@
+"""
+    Package 'transport' provides mechanism's for the transmission and reception of protocol data.
+"""
+
+import heapq
+import time
+from constants import Outcome
+
+"""
+    Objects of class Schedule hold the polling state of a single device message: its interval and bounds,
+    when it is due next, the last response received, the bytes an exchange costs on the bus, and the share
+    of recent polls that returned changed data.
+"""
+
+class Schedule:
+
+    __slots__ = ("message", "device", "min_interval", "max_interval", "interval", "due", "last", "cost", "rate", "polls", "changes")
+
+    def __init__(self, message, device, interval: float, min_interval: float, max_interval: float, due: float):
+        self.message = message
+        self.device = device
+        self.min_interval = getattr(message, "min_interval", min_interval)
+        self.max_interval = max(getattr(message, "max_interval", max_interval), self.min_interval)
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        self.due = due
+        self.last = None
+        self.cost = None
+        self.rate = 0.0
+        self.polls = 0
+        self.changes = 0
+
+    def __lt__(self, other):
+        return self.due < other.due
+
+"""
+    The PollController class polls every device message on an interval of its own, instead of polling every
+    message in every cycle. The response to each poll is compared with the previous response of the same
+    message: the interval is shortened when the data changed and lengthened when it did not, within the
+    min_interval and max_interval of the message in seconds, or else the controller defaults. Static points are
+    thus polled rarely and volatile ones often.
+
+    With a budget set, polls are limited to that many bytes per second on the bus, requests and responses
+    together, by a token bucket holding at most a second's worth of bytes. When more polls are due than the
+    budget allows, the most overdue relative to their interval are sent first, the others wait for the budget.
+    Polls are performed through the transaction engine of the protocol, which is required.
+"""
+
+class PollController:
+
+    def __init__(self, protocol, logger, budget: float = None, interval: float = 1.0, min_interval: float = 0.1, max_interval: float = 60.0,
+                 decrease: float = 0.5, increase: float = 1.5, clock=time.monotonic, sleep=time.sleep):
+        # Setup logger
+        self.logger = logger
+        # Ensure polls can be observed
+        if protocol.engine is None:
+            raise ValueError("PollController: the protocol requires a transaction engine")
+        # Initialize controller fields
+        self.protocol = protocol
+        self.budget = budget
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.decrease = decrease
+        self.increase = increase
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = budget
+        self.refilled = clock()
+        self.schedules = {}
+        self.heap = []
+        self.counters = {"polls": 0, "changed": 0, "unchanged": 0, "failed": 0, "deferred": 0}
+        self.refresh()
+
+    def refresh(self):
+        """
+        Schedules the device messages of the protocol, keeping the state of messages already scheduled,
+        e.g. after a reload changed the devices.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        now = self.clock()
+        schedules = {}
+        for device in self.protocol.device:
+            for msg in device.messages:
+                schedule = self.schedules.get(msg)
+                if schedule is None:
+                    schedule = Schedule(msg, device, self.interval, self.min_interval, self.max_interval, now)
+                # The device object may have been replaced
+                schedule.device = device
+                schedules[msg] = schedule
+        self.schedules = schedules
+        self.heap = list(schedules.values())
+        heapq.heapify(self.heap)
+
+    def run(self, cycles: int = 10):
+        """
+        Performs the given number of polling rounds, waiting between rounds until the next message is due.
+
+        Args:
+            cycles (int): The number of rounds.
+        Returns:
+            None
+        Raises:
+            ValueError: If the protocol defines no prototype for the pending writes.
+        """
+        for cycle in range(cycles):
+            delay = self.poll()
+            if delay > 0 and cycle < cycles - 1:
+                self.sleep(delay)
+        if self.protocol.writes is not None:
+            self.protocol.writes.flush()
+        self.protocol.engine.log()
+        self.log()
+
+    def poll(self):
+        """
+        Performs a single polling round: every message that is due, as far as the budget allows.
+
+        Args:
+            None
+        Returns:
+            float: The seconds until the next message is due.
+        Raises:
+            ValueError: If the protocol defines no prototype for the pending writes.
+        """
+        protocol = self.protocol
+        if protocol.reloader is not None and protocol.reloader.poll() is not None:
+            self.refresh()
+        if protocol.writes is not None and protocol.writes.is_due():
+            protocol.writes.flush()
+        now = self.clock()
+        due = []
+        while self.heap and self.heap[0].due <= now:
+            due.append(heapq.heappop(self.heap))
+        # The most overdue relative to their interval first, then the most volatile
+        due.sort(key=lambda schedule: ((schedule.due - now) / schedule.interval, -schedule.rate))
+        self.refill(now)
+        polls = []
+        wait = None
+        for schedule in due:
+            cost = self.get_cost(schedule)
+            # A poll costing more than the bucket holds is sent once the bucket is full
+            needed = cost if self.budget is None else min(cost, self.budget)
+            if self.budget is not None and self.tokens < needed:
+                # Stays due, keeping its place among the overdue polls
+                self.counters["deferred"] += 1
+                heapq.heappush(self.heap, schedule)
+                wait = min((needed - self.tokens) / self.budget, wait if wait is not None else float("inf"))
+                continue
+            if self.budget is not None:
+                self.tokens -= cost
+            polls.append((schedule, protocol.engine.submit(schedule.message, schedule.device)))
+        protocol.engine.run()
+        now = self.clock()
+        for schedule, transaction in polls:
+            self.observe(schedule, transaction, now)
+            heapq.heappush(self.heap, schedule)
+        if wait is not None:
+            return wait
+        if not self.heap:
+            return 0.0
+        return max(self.heap[0].due - self.clock(), 0.0)
+
+    def refill(self, now: float):
+        """
+        Adds the bytes the budget allows since the last refill to the token bucket.
+
+        Args:
+            now (float): The current time in seconds.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        if self.budget is not None:
+            self.tokens = min(self.tokens + (now - self.refilled) * self.budget, self.budget)
+        self.refilled = now
+
+    def get_cost(self, schedule: Schedule):
+        """
+        Retrieves the bytes a poll of a message costs on the bus, as last observed, or else estimated
+        from its request, built on first use, and its expected response.
+
+        Args:
+            schedule (Schedule): The schedule of the message.
+        Returns:
+            int: The bytes of the request and response.
+        Raises:
+            None
+        """
+        if schedule.cost is None:
+            protocol = self.protocol
+            message = schedule.message
+            prototype = protocol.get_prototype(message.name)
+            try:
+                size = len(protocol.get_transmit_message(prototype, message, schedule.device)) if prototype is not None else 0
+            except ValueError:
+                # Reported by the transaction engine when polled
+                size = 0
+            lengths = protocol.engine.lengths
+            length = lengths.get(message, schedule.device) if lengths is not None else None
+            schedule.cost = size + (length.get_size(protocol.conversion.mode) if length is not None else size)
+        return schedule.cost
+
+    def observe(self, schedule: Schedule, transaction, now: float):
+        """
+        Adapts the interval of a message to the outcome of its poll.
+
+        Args:
+            schedule (Schedule): The schedule of the message.
+            transaction (Transaction): The finished transaction.
+            now (float): The current time in seconds.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.counters["polls"] += 1
+        schedule.polls += 1
+        if transaction.outcome != Outcome.SUCCESS:
+            # Failing devices are paced by the circuit breaker, keep the interval
+            self.counters["failed"] += 1
+            schedule.due = now + schedule.interval
+            return
+        received = bytes(transaction.received)
+        request = schedule.message.message_byte_array
+        schedule.cost = (len(request) if request is not None else 0) + len(received)
+        # The first response has nothing to compare with
+        if schedule.last is not None:
+            changed = received != schedule.last
+            if changed:
+                self.counters["changed"] += 1
+                schedule.changes += 1
+                schedule.interval = max(schedule.interval * self.decrease, schedule.min_interval)
+            else:
+                self.counters["unchanged"] += 1
+                schedule.interval = min(schedule.interval * self.increase, schedule.max_interval)
+            # Exponentially weighted share of polls returning changed data
+            schedule.rate += 0.2 * ((1.0 if changed else 0.0) - schedule.rate)
+        schedule.last = received
+        schedule.due = now + schedule.interval
+
+    def get_demand(self):
+        """
+        Computes the bytes per second the current intervals ask of the bus.
+
+        Args:
+            None
+        Returns:
+            float: The bytes per second.
+        Raises:
+            None
+        """
+        return sum(self.get_cost(schedule) / schedule.interval for schedule in self.schedules.values())
+
+    def log(self):
+        """
+        Outputs the controller counters, the bus demand and the spread of the intervals.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.logger.info("PollController: %s", ", ".join(f"{name}={count}" for name, count in self.counters.items()))
+        if self.schedules:
+            intervals = sorted(schedule.interval for schedule in self.schedules.values())
+            self.logger.info("PollController: demand %.1f bytes/s, budget %s, intervals min=%.3f s median=%.3f s max=%.3f s", self.get_demand(),
+                             "none" if self.budget is None else f"{self.budget:g} bytes/s", intervals[0], intervals[len(intervals) // 2], intervals[-1])
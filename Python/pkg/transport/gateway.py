@@ -0,0 +1,637 @@
+"""
+    Package 'transport' provides mechanism's for the transmission and reception of protocol data.
+"""
+
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from constants import Mode, Outcome
+
+# Modbus TCP application protocol header: transaction identifier, protocol identifier, length and unit identifier
+MBAP = struct.Struct(">HHHB")
+MBAP_SIZE = MBAP.size
+MAX_PDU = 253
+
+# Modbus exception codes returned by the gateway itself
+SERVER_DEVICE_BUSY = 0x06
+GATEWAY_PATH_UNAVAILABLE = 0x0A
+GATEWAY_TARGET_FAILED = 0x0B
+EXCEPTION_FLAG = 0x80
+
+# Function codes answered with a fixed length, echoing the address and quantity or value written
+FIXED_RESPONSES = (0x05, 0x06, 0x0F, 0x10)
+
+"""
+    Objects of class Request hold a single request of a TCP client waiting for its serial link.
+"""
+
+class Request:
+
+    __slots__ = ("client", "transaction", "unit", "pdu")
+
+    def __init__(self, client, transaction: int, unit: int, pdu: bytes):
+        self.client = client
+        self.transaction = transaction
+        self.unit = unit
+        self.pdu = pdu
+
+"""
+    Objects of class Client hold the connection of a single TCP client, with preallocated buffers for the
+    requests read from it and the responses written to it. Responses may be written by any link worker,
+    so writing is serialised by a lock.
+"""
+
+class Client:
+
+    __slots__ = ("sock", "address", "rx", "tx", "lock", "closed")
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.rx = bytearray(MBAP_SIZE + MAX_PDU)
+        self.tx = bytearray(MBAP_SIZE + MAX_PDU)
+        self.lock = threading.Lock()
+        self.closed = False
+
+"""
+    Objects of class FairQueue queue the requests of many clients for a single serial link. Every client has
+    a queue of its own, holding at most limit requests, and clients are served round-robin, so a client
+    sending requests back to back cannot starve the others.
+"""
+
+class FairQueue:
+
+    def __init__(self, limit: int = 16):
+        self.limit = limit
+        self.queues = {}
+        self.active = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def put(self, key, item):
+        """
+        Queues an item of a client.
+
+        Args:
+            key: The client.
+            item: The item.
+        Returns:
+            bool: True if the item was queued, False if the queue of the client is full or closed.
+        Raises:
+            None
+        """
+        with self.condition:
+            if self.closed:
+                return False
+            items = self.queues.get(key)
+            if items is None:
+                items = deque()
+                self.queues[key] = items
+            if len(items) >= self.limit:
+                return False
+            if len(items) == 0:
+                self.active.append(key)
+            items.append(item)
+            self.condition.notify()
+            return True
+
+    def get(self):
+        """
+        Waits for the next item, taking one item of each client in turn.
+
+        Args:
+            None
+        Returns:
+            The item, or None once the queue is closed.
+        Raises:
+            None
+        """
+        with self.condition:
+            while not self.active:
+                if self.closed:
+                    return None
+                self.condition.wait()
+            key = self.active.popleft()
+            items = self.queues[key]
+            item = items.popleft()
+            if items:
+                self.active.append(key)
+            else:
+                del self.queues[key]
+            return item
+
+    def close(self):
+        """
+        Closes the queue, waking every waiting consumer once the queued items are taken.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+"""
+    Objects of class SimulatedLink stand in for a serial line, answering each request from the register maps of
+    the protocol's responder.
+"""
+
+class SimulatedLink:
+
+    def __init__(self, responder, logger):
+        # Setup logger
+        self.logger = logger
+        # Initialize link fields
+        self.responder = responder
+
+    def exchange(self, frame):
+        """
+        Transmits a request and waits for its response.
+
+        Args:
+            frame (bytes-like): The request, in the protocol's transmission mode.
+        Returns:
+            bytearray: The response in the protocol's transmission mode, or None if there is none.
+        Raises:
+            None
+        """
+        return self.responder.respond(bytearray(frame))
+
+"""
+    Objects of class StreamLink exchange frames over a binary stream, such as a serial port opened with a read
+    timeout. A response is read in two steps: its header, then the remainder whose length the header gives,
+    so no inter-frame silence needs to be detected.
+"""
+
+class StreamLink:
+
+    def __init__(self, stream, protocol, logger):
+        # Setup logger
+        self.logger = logger
+        # Initialize link fields
+        self.stream = stream
+        self.protocol = protocol
+        # Every byte is sent as two characters in ASCII mode
+        self.width = 2 if protocol.conversion.mode == Mode.ASCII.value else 1
+        self.framing = len(protocol.prefix) + protocol.checksum.get_size_of_checksum() + len(protocol.suffix)
+
+    def exchange(self, frame):
+        """
+        Transmits a request and waits for its response.
+
+        Args:
+            frame (bytes-like): The request, in the protocol's transmission mode.
+        Returns:
+            bytearray: The response in the protocol's transmission mode, or None if it timed out or its
+                length cannot be determined.
+        Raises:
+            OSError: If the stream cannot be written or read.
+        """
+        protocol = self.protocol
+        self.stream.write(frame)
+        self.stream.flush()
+        # Slave address, function code and the byte following them
+        head = self.read((len(protocol.prefix) + 3) * self.width)
+        if head is None:
+            return None
+        body = protocol.conversion.get_hex_message(bytearray(head), protocol.prefix, protocol.suffix)[len(protocol.prefix):]
+        size = get_response_size(body[1], body[2])
+        if size is None:
+            self.logger.warning("StreamLink: unable to frame response to function %d", body[1])
+            return None
+        rest = self.read((size + self.framing - len(protocol.prefix) - 3) * self.width)
+        if rest is None:
+            return None
+        return bytearray(head) + rest
+
+    def read(self, count: int):
+        """
+        Reads a number of bytes from the stream.
+
+        Args:
+            count (int): The number of bytes.
+        Returns:
+            bytes: The bytes, or None if the stream timed out first.
+        Raises:
+            OSError: If the stream cannot be read.
+        """
+        data = bytearray()
+        while len(data) < count:
+            chunk = self.stream.read(count - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+def get_response_size(function: int, third: int):
+    """
+    Determines the length of a response body from its function code and the byte following it.
+
+    Args:
+        function (int): The function code.
+        third (int): The byte following the function code, the byte count of read responses.
+    Returns:
+        int: The length of the slave address, function code and data, or None if unknown.
+    Raises:
+        None
+    """
+    if function & EXCEPTION_FLAG:
+        return 3
+    if 0x01 <= function <= 0x04:
+        return 3 + third
+    if function in FIXED_RESPONSES:
+        return 6
+    return None
+
+"""
+    The Gateway class accepts Modbus TCP clients on a local socket and forwards their requests to serial links,
+    framing them for the protocol's transmission mode, RTU or ASCII, and answering with the serial response
+    framed as Modbus TCP again.
+
+    Every link has a worker thread and a fair queue, so any number of clients share a link, served in turn,
+    while the link performs a single exchange at a time. Responses are written back to the requesting client
+    with the transaction identifier of its request, so a client may pipeline requests. Only the framing is
+    rewritten, the PDU is copied between preallocated buffers as it is. Requests for unknown units, full
+    client queues and failed exchanges are answered with Modbus gateway exceptions.
+"""
+
+class Gateway:
+
+    def __init__(self, protocol, logger, links: dict, host: str = "127.0.0.1", port: int = 502, limit: int = 16, backlog: int = 128, metrics=None):
+        # Setup logger
+        self.logger = logger
+        # Initialize gateway fields
+        self.protocol = protocol
+        self.links = links
+        self.limit = limit
+        self.metrics = metrics
+        self.prefix = bytearray(protocol.append_str_to_byte_array(bytearray(), protocol.prefix))
+        self.suffix = bytearray(protocol.append_str_to_byte_array(bytearray(), protocol.suffix))
+        self.checksum_size = protocol.checksum.get_size_of_checksum()
+        self.ascii = protocol.conversion.mode == Mode.ASCII.value
+        self.calculate = self.__init_checksum()
+        self.queues = {}
+        self.buffers = {}
+        self.workers = []
+        self.counters = {"requests": 0, "busy": 0, "unavailable": 0}
+        for outcome in (Outcome.SUCCESS, Outcome.TIMEOUT, Outcome.INVALID):
+            self.counters[outcome.value] = 0
+        # Counters are updated by the client and link worker threads
+        self.lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer((host, port), self.get_handler(), bind_and_activate=False)
+        self.server.daemon_threads = True
+        self.server.allow_reuse_address = True
+        # Many clients connecting at once must not overflow the listen backlog
+        self.server.request_queue_size = backlog
+        self.server.server_bind()
+        self.server.server_activate()
+        self.thread = None
+
+    def __init_checksum(self):
+        # The table driven CRC gives the same result as the bitwise one
+        checksum = self.protocol.checksum
+        if checksum.calculation.startswith("CRC"):
+            return checksum.calculate_crc16_table
+        if checksum.calculation.startswith("LRC"):
+            return checksum.calculate_lrc
+        raise ValueError(f"Gateway: unsupported checksum calculation: {checksum.calculation}")
+
+    def get_handler(self):
+        """
+        Builds the request handler class serving each client connection.
+
+        Args:
+            None
+        Returns:
+            type: The request handler class.
+        Raises:
+            None
+        """
+        gateway = self
+
+        class Handler(socketserver.BaseRequestHandler):
+
+            def handle(self):
+                gateway.serve(Client(self.request, self.client_address))
+
+        return Handler
+
+    @property
+    def port(self):
+        """
+        Retrieves the port the gateway listens on, useful when bound to port 0.
+
+        Args:
+            None
+        Returns:
+            int: The port.
+        Raises:
+            None
+        """
+        return self.server.server_address[1]
+
+    def start(self):
+        """
+        Starts a worker thread for every link, and accepts clients from a background thread.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        for link in {id(link): link for link in self.links.values()}.values():
+            queue = FairQueue(self.limit)
+            self.queues[id(link)] = queue
+            # Requests are framed in place, ASCII frames are then converted from the framed bytes
+            self.buffers[id(link)] = bytearray(len(self.prefix) + 1 + MAX_PDU + self.checksum_size + len(self.suffix))
+            worker = threading.Thread(target=self.forward, args=(link, queue), name="Gateway-link", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="Gateway", daemon=True)
+        self.thread.start()
+        self.logger.info("Gateway: serving Modbus TCP on %s:%d for units %s", self.server.server_address[0], self.port, sorted(self.links))
+
+    def stop(self):
+        """
+        Stops accepting clients and waits for the link workers to finish the queued requests.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        for queue in self.queues.values():
+            queue.close()
+        for worker in self.workers:
+            worker.join()
+        if self.thread is not None:
+            self.thread.join()
+
+    def serve(self, client: Client):
+        """
+        Reads the requests of a client until it disconnects, queueing each for the link of its unit.
+        Runs on the thread of the client connection.
+
+        Args:
+            client (Client): The client.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        view = memoryview(client.rx)
+        try:
+            while self.receive(client, view[:MBAP_SIZE]):
+                transaction, protocol_id, length, unit = MBAP.unpack_from(client.rx)
+                if protocol_id != 0 or length < 2 or length > MAX_PDU + 1:
+                    self.logger.warning("Gateway: invalid MBAP header from %s, closing connection", client.address)
+                    break
+                if not self.receive(client, view[MBAP_SIZE:MBAP_SIZE + length - 1]):
+                    break
+                self.submit(client, transaction, unit, bytes(view[MBAP_SIZE:MBAP_SIZE + length - 1]))
+        except OSError as e:
+            self.logger.debug("Gateway: connection from %s failed: %s", client.address, e)
+        finally:
+            with client.lock:
+                client.closed = True
+
+    def receive(self, client: Client, view: memoryview):
+        """
+        Fills a part of the receive buffer of a client.
+
+        Args:
+            client (Client): The client.
+            view (memoryview): The part of the receive buffer.
+        Returns:
+            bool: True if it was filled, False if the client disconnected.
+        Raises:
+            OSError: If the connection failed.
+        """
+        received = 0
+        while received < len(view):
+            count = client.sock.recv_into(view[received:])
+            if count == 0:
+                return False
+            received += count
+        return True
+
+    def submit(self, client: Client, transaction: int, unit: int, pdu: bytes):
+        """
+        Queues a request for the link of its unit, answering at once if it cannot be queued.
+
+        Args:
+            client (Client): The client.
+            transaction (int): The transaction identifier.
+            unit (int): The unit identifier, the slave address on the serial line.
+            pdu (bytes): The function code and data.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.count("requests")
+        request = Request(client, transaction, unit, pdu)
+        link = self.links.get(unit)
+        if link is None:
+            self.count("unavailable")
+            self.reply_exception(request, GATEWAY_PATH_UNAVAILABLE)
+        elif not self.queues[id(link)].put(client, request):
+            self.count("busy")
+            self.reply_exception(request, SERVER_DEVICE_BUSY)
+
+    def forward(self, link, queue: FairQueue):
+        """
+        Exchanges the queued requests over a link, one at a time. Runs on the worker thread of the link.
+
+        Args:
+            link: The link, exchanging frames in the protocol's transmission mode.
+            queue (FairQueue): The requests for the link.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        buffer = self.buffers[id(link)]
+        while True:
+            request = queue.get()
+            if request is None:
+                return
+            if request.client.closed:
+                continue
+            labels = (self.protocol.tag, request.unit, request.pdu[0])
+            frame = self.frame(buffer, request)
+            if self.metrics is not None:
+                self.metrics.record_sent(labels, len(frame))
+            sent = time.monotonic()
+            try:
+                rx = link.exchange(frame)
+            except OSError as e:
+                self.logger.error("Gateway: exchange with unit %d failed: %s", request.unit, e)
+                rx = None
+            if rx is None:
+                self.finish(request, labels, Outcome.TIMEOUT)
+                continue
+            pdu = self.unframe(rx, request)
+            if pdu is None:
+                self.finish(request, labels, Outcome.INVALID, len(rx))
+                continue
+            self.count(Outcome.SUCCESS.value)
+            if self.metrics is not None:
+                self.metrics.record_received(labels, len(rx), time.monotonic() - sent)
+            self.reply(request, pdu)
+
+    def frame(self, buffer: bytearray, request: Request):
+        """
+        Frames a request for the serial line in the preallocated buffer of its link.
+
+        Args:
+            buffer (bytearray): The frame buffer of the link.
+            request (Request): The request.
+        Returns:
+            bytes-like: The frame in the protocol's transmission mode.
+        Raises:
+            None
+        """
+        view = memoryview(buffer)
+        start = len(self.prefix)
+        view[:start] = self.prefix
+        view[start] = request.unit
+        end = start + 1 + len(request.pdu)
+        view[start + 1:end] = request.pdu
+        view[end:end + self.checksum_size] = self.calculate(view[start:end]).to_bytes(self.checksum_size, "big")
+        end += self.checksum_size
+        view[end:end + len(self.suffix)] = self.suffix
+        end += len(self.suffix)
+        if self.ascii:
+            protocol = self.protocol
+            return protocol.conversion.get_converted_message(bytearray(view[:end]), protocol.prefix, protocol.suffix)
+        return view[:end]
+
+    def unframe(self, rx: bytearray, request: Request):
+        """
+        Validates a serial response and extracts its PDU.
+
+        Args:
+            rx (bytearray): The response in the protocol's transmission mode.
+            request (Request): The request it answers.
+        Returns:
+            memoryview: The function code and data, or None if the response is invalid.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        try:
+            message = protocol.conversion.get_hex_message(rx, protocol.prefix, protocol.suffix)
+        except (ValueError, IndexError):
+            self.logger.warning("Gateway: malformed response from unit %d", request.unit)
+            return None
+        start = len(self.prefix)
+        end = len(message) - len(self.suffix) - self.checksum_size
+        if end < start + 2 or message[start] != request.unit:
+            self.logger.warning("Gateway: unexpected response from unit %d", request.unit)
+            return None
+        view = memoryview(message)
+        if self.calculate(view[start:end]) != int.from_bytes(view[end:end + self.checksum_size], "big"):
+            self.logger.warning("Gateway: checksum invalid in response from unit %d", request.unit)
+            return None
+        return view[start + 1:end]
+
+    def finish(self, request: Request, labels: tuple, outcome: Outcome, size: int = 0):
+        """
+        Answers a request whose exchange failed with a gateway target exception.
+
+        Args:
+            request (Request): The request.
+            labels (tuple): The metric labels, protocol tag, unit and function code.
+            outcome (Outcome): The outcome, TIMEOUT or INVALID.
+            size (int): The length of the invalid response, if any.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.count(outcome.value)
+        if self.metrics is not None:
+            self.metrics.record_failure(labels, outcome, size)
+        self.reply_exception(request, GATEWAY_TARGET_FAILED)
+
+    def reply_exception(self, request: Request, code: int):
+        """
+        Answers a request with a Modbus exception.
+
+        Args:
+            request (Request): The request.
+            code (int): The exception code.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.reply(request, bytes(((request.pdu[0] | EXCEPTION_FLAG) & 0xFF, code)))
+
+    def reply(self, request: Request, pdu):
+        """
+        Writes a response to the client of a request, framed with the MBAP header of the request.
+
+        Args:
+            request (Request): The request.
+            pdu (bytes-like): The function code and data of the response.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        client = request.client
+        size = len(pdu)
+        with client.lock:
+            if client.closed:
+                return
+            MBAP.pack_into(client.tx, 0, request.transaction, 0, size + 1, request.unit)
+            view = memoryview(client.tx)
+            view[MBAP_SIZE:MBAP_SIZE + size] = pdu
+            try:
+                client.sock.sendall(view[:MBAP_SIZE + size])
+            except OSError as e:
+                self.logger.debug("Gateway: unable to reply to %s: %s", client.address, e)
+                client.closed = True
+
+    def count(self, name: str):
+        """
+        Increments a gateway counter.
+
+        Args:
+            name (str): The counter name.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        with self.lock:
+            self.counters[name] += 1
+
+    def log(self):
+        """
+        Outputs the gateway counters.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        with self.lock:
+            counters = dict(self.counters)
+        self.logger.info("Gateway: %s", ", ".join(f"{name}={count}" for name, count in counters.items()))
@@ -0,0 +1,310 @@
+"""
+    Package 'transport' provides mechanism's for the transmission and reception of protocol data.
+"""
+
+from constants import Mode
+
+# Parity bits per character by parity setting
+PARITY_BITS = {"N": 0, "E": 1, "O": 1}
+# Above this baud rate the Modbus serial line inter-frame gap is fixed instead of 3.5 characters
+FIXED_GAP_BAUD = 19200
+FIXED_GAP = 0.00175
+GAP_CHARACTERS = 3.5
+# Modbus serial line devices are addressed 1 to 247
+MAX_DEVICES = 247
+
+"""
+    Objects of class LinkModel compute how long frames and transactions take on a serial line. A character
+    is a start bit, the data bits, the parity bit, if any, and the stop bits, by default 8E1 in hex (RTU)
+    mode and 7E1 in ascii mode. In ascii mode every byte of a frame, prefix and suffix included, is already
+    sent as two characters, as the Conversion class does, so the frame length is the character count in
+    both modes.
+
+    Hex mode frames are separated by a silent interval of 3.5 characters, fixed at 1.75 ms above 19200
+    baud, while ascii mode frames are delimited by their prefix and suffix and need none. A device answers
+    a request after its turnaround time, the default or that of its address.
+"""
+
+class LinkModel:
+
+    def __init__(self, mode: str, logger, baud: int = 9600, data_bits: int = None, parity: str = "E", stop_bits: int = 1,
+                 turnaround: float = 0.0, turnarounds: dict = None):
+        # Setup logger
+        self.logger = logger
+        # Validate the character framing
+        if baud <= 0:
+            raise ValueError(f"LinkModel: invalid baud rate {baud}")
+        if parity not in PARITY_BITS:
+            raise ValueError(f"LinkModel: invalid parity {parity}, expected one of {', '.join(PARITY_BITS)}")
+        # Initialize link fields
+        self.mode = mode
+        self.baud = baud
+        self.data_bits = data_bits if data_bits is not None else (7 if mode == Mode.ASCII.value else 8)
+        self.parity = parity
+        self.stop_bits = stop_bits
+        self.turnaround = turnaround
+        self.turnarounds = turnarounds if turnarounds is not None else {}
+        self.character_bits = 1 + self.data_bits + PARITY_BITS[parity] + stop_bits
+        self.character_time = self.character_bits / baud
+
+    def get_frame_time(self, size: int):
+        """
+        Computes the time a frame takes on the line, without the gap following it.
+
+        Args:
+            size (int): The frame length in bytes, i.e. characters.
+        Returns:
+            float: The time in seconds.
+        Raises:
+            None
+        """
+        return size * self.character_time
+
+    def get_gap(self):
+        """
+        Retrieves the silent interval required between two frames.
+
+        Args:
+            None
+        Returns:
+            float: The time in seconds.
+        Raises:
+            None
+        """
+        if self.mode == Mode.ASCII.value:
+            return 0.0
+        if self.baud > FIXED_GAP_BAUD:
+            return FIXED_GAP
+        return GAP_CHARACTERS * self.character_time
+
+    def get_turnaround(self, address: int = None):
+        """
+        Retrieves the time a device takes to start answering a request.
+
+        Args:
+            address (int): The device address, or None for the default.
+        Returns:
+            float: The time in seconds.
+        Raises:
+            None
+        """
+        return self.turnarounds.get(address, self.turnaround)
+
+    def get_transaction_time(self, request: int, response: int, address: int = None):
+        """
+        Computes the time a transaction holds the line: the request, the gap, the device turnaround,
+        the response and the gap before the next request.
+
+        Args:
+            request (int): The request length in bytes.
+            response (int): The response length in bytes, 0 if the device does not answer.
+            address (int): The device address, or None for the default turnaround.
+        Returns:
+            float: The time in seconds.
+        Raises:
+            None
+        """
+        gap = self.get_gap()
+        time = self.get_frame_time(request) + gap
+        if response > 0:
+            time += self.get_turnaround(address) + self.get_frame_time(response) + gap
+        return time
+
+    def describe(self):
+        """
+        Describes the line settings, e.g. "19200 baud 8E1, 11 bits per character".
+
+        Args:
+            None
+        Returns:
+            str: The description.
+        Raises:
+            None
+        """
+        return f"{self.baud} baud {self.data_bits}{self.parity}{self.stop_bits}, {self.character_bits} bits per character"
+
+"""
+    Objects of class Demand hold what polling a single device message asks of the line: the request and
+    response lengths, the time a poll takes and how often the message is polled.
+"""
+
+class Demand:
+
+    __slots__ = ("device", "message", "request", "response", "time", "interval")
+
+    def __init__(self, device, message, request: int, response: int, time: float, interval: float):
+        self.device = device
+        self.message = message
+        self.request = request
+        self.response = response
+        self.time = time
+        self.interval = interval
+
+    def get_utilisation(self):
+        """
+        Computes the share of the line the message takes at its interval.
+
+        Args:
+            None
+        Returns:
+            float: The share, 1.0 being the whole line.
+        Raises:
+            None
+        """
+        return self.time / self.interval
+
+"""
+    The CapacityPlanner class sizes the polling of a protocol against a link model. Every device message is
+    polled once per schedule interval, or per its own interval field in seconds, and its transaction time is
+    computed from its request frame and expected response length. The report gives the time a cycle
+    polling every message once takes, and so the achievable poll rate, the line utilisation of the schedule
+    and how many devices like the average one fit on the line at the target utilisation, leaving the rest
+    for retries and writes.
+"""
+
+class CapacityPlanner:
+
+    def __init__(self, protocol, link: LinkModel, lengths, logger, interval: float = 1.0, target: float = 0.8):
+        # Setup logger
+        self.logger = logger
+        # Validate the schedule
+        if interval <= 0:
+            raise ValueError(f"CapacityPlanner: invalid interval {interval}")
+        if not 0 < target <= 1:
+            raise ValueError(f"CapacityPlanner: invalid target utilisation {target}, expected more than 0 and at most 1")
+        # Initialize planner fields
+        self.protocol = protocol
+        self.link = link
+        self.lengths = lengths
+        self.interval = interval
+        self.target = target
+        self.demands = []
+        self.counters = {"messages": 0, "unknown": 0}
+
+    def plan(self):
+        """
+        Computes the demand of every device message of the protocol.
+
+        Args:
+            None
+        Returns:
+            list[Demand]: The demands, in device and message order.
+        Raises:
+            ValueError: If a message has an interval that is not a positive number of seconds.
+        """
+        protocol = self.protocol
+        mode = protocol.conversion.mode
+        self.demands = []
+        for device in protocol.device:
+            for message in device.messages:
+                prototype = protocol.get_prototype(message.name)
+                try:
+                    request = len(protocol.get_transmit_message(prototype, message, device)) if prototype is not None else 0
+                except ValueError as e:
+                    request = 0
+                    self.logger.warning("CapacityPlanner: unable to build message %s of device %s: %s", message.name, device.name, e)
+                length = self.lengths.get(message, device)
+                if request == 0 or length is None:
+                    self.counters["unknown"] += 1
+                    continue
+                response = length.get_size(mode)
+                time = self.link.get_transaction_time(request, response, device.address)
+                interval = getattr(message, "interval", self.interval)
+                if isinstance(interval, bool) or not isinstance(interval, (int, float)) or interval <= 0:
+                    raise ValueError(f"CapacityPlanner: message {message.name} of device {device.name} has interval {interval}, expected a positive number of seconds")
+                self.demands.append(Demand(device, message, request, response, time, interval))
+                self.counters["messages"] += 1
+        return self.demands
+
+    def get_cycle_time(self):
+        """
+        Computes the time a cycle polling every message once takes.
+
+        Args:
+            None
+        Returns:
+            float: The time in seconds.
+        Raises:
+            None
+        """
+        return sum(demand.time for demand in self.demands)
+
+    def get_utilisation(self):
+        """
+        Computes the share of the line the schedule takes.
+
+        Args:
+            None
+        Returns:
+            float: The share, above 1.0 if the schedule cannot be kept.
+        Raises:
+            None
+        """
+        return sum(demand.get_utilisation() for demand in self.demands)
+
+    def get_max_devices(self):
+        """
+        Computes how many devices polling like the average device fit on the line at the target
+        utilisation, at most the 247 addresses of a Modbus serial line.
+
+        Args:
+            None
+        Returns:
+            int: The number of devices.
+        Raises:
+            None
+        """
+        devices = {id(demand.device) for demand in self.demands}
+        utilisation = self.get_utilisation()
+        if utilisation == 0:
+            return MAX_DEVICES
+        return min(int(self.target * len(devices) / utilisation), MAX_DEVICES)
+
+    def report(self):
+        """
+        Outputs the demand of every message and the capacity of the line.
+
+        Args:
+            None
+        Returns:
+            dict: The report, as written by the plan script.
+        Raises:
+            ValueError: If a message has an interval that is not a positive number of seconds.
+        """
+        if not self.demands:
+            self.plan()
+        link = self.link
+        cycle = self.get_cycle_time()
+        utilisation = self.get_utilisation()
+        self.logger.info("CapacityPlanner: %s, gap %.3f ms, turnaround %.3f ms", link.describe(), link.get_gap() * 1000, link.turnaround * 1000)
+        for demand in self.demands:
+            self.logger.info("CapacityPlanner: %s %s: %d+%d bytes, %.3f ms every %g s, %.2f%% of the line", demand.device.name, demand.message.name,
+                             demand.request, demand.response, demand.time * 1000, demand.interval, demand.get_utilisation() * 100)
+        rate = 1 / cycle if cycle > 0 else 0.0
+        self.logger.info("CapacityPlanner: cycle %.3f ms, at most %.2f cycles/s, utilisation %.2f%%%s", cycle * 1000, rate, utilisation * 100,
+                         ", the schedule cannot be kept" if utilisation > 1 else "")
+        self.logger.info("CapacityPlanner: %d devices fit at %.0f%% utilisation", self.get_max_devices(), self.target * 100)
+        self.log()
+        return {
+            "link": {"baud": link.baud, "character_bits": link.character_bits, "gap": link.get_gap(), "turnaround": link.turnaround},
+            "messages": [{"device": demand.device.name, "address": demand.device.address, "message": demand.message.name, "request": demand.request,
+                          "response": demand.response, "time": demand.time, "interval": demand.interval} for demand in self.demands],
+            "cycle_time": cycle,
+            "poll_rate": rate,
+            "utilisation": utilisation,
+            "target": self.target,
+            "max_devices": self.get_max_devices(),
+        }
+
+    def log(self):
+        """
+        Outputs the planner counters.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.logger.info("CapacityPlanner: %s", ", ".join(f"{name}={count}" for name, count in self.counters.items()))
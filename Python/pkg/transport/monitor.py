@@ -0,0 +1,522 @@
+"""
+    Package 'transport' provides mechanism's for the transmission and reception of protocol data.
+"""
+
+import time
+from constants import Direction, Mode
+from pkg.component.length import EXCEPTION_CODE_BYTES, EXCEPTION_FLAG
+from pkg.component.message import DataType, Message
+from pkg.transform.change import get_values
+from pkg.transport.writes import COIL_ON
+
+# Function codes addressing coils and discrete inputs, whose values are bits unless a device message says otherwise
+BIT_FUNCTIONS = frozenset((1, 2, 5, 15))
+# Highest function code, above it the exception flag is set
+MAX_FUNCTION = 127
+
+"""
+    Objects of class Layout hold where the fields of a prototype message lie in a frame, in hex mode bytes
+    and including the prefix: the offset and size of every field ahead of the data bytes, the size of the
+    frame without data bytes, and the byte count field giving the number of data bytes, if any.
+"""
+
+class Layout:
+
+    __slots__ = ("fields", "size", "count", "data_bits")
+
+    def __init__(self, prototype, direction: Direction, prefix: str, suffix: str):
+        self.fields = {}
+        self.size = len(prefix) + len(suffix)
+        self.count = None
+        self.data_bits = 0
+        offset = len(prefix)
+        fixed = True
+        for segment in prototype.get_segments(direction):
+            if segment.name == "data_bytes":
+                # Fields past the data bytes have no fixed offset
+                fixed = False
+                self.data_bits = segment.bits
+                continue
+            size = segment.bits // 8
+            if fixed:
+                self.fields[segment.name] = (offset, size)
+            self.size += size
+            offset += size
+        if self.data_bits:
+            self.count = self.fields.get("byte_count")
+
+"""
+    Objects of class Request hold a request seen on the line that is waiting for its response.
+"""
+
+class Request:
+
+    __slots__ = ("address", "function", "prototype", "fields", "time")
+
+    def __init__(self, address: int, function: int, prototype, fields: dict, time: float):
+        self.address = address
+        self.function = function
+        self.prototype = prototype
+        self.fields = fields
+        self.time = time
+
+"""
+    Objects of class Record describe a transaction seen on the line: the device, or None if no device of
+    the protocol has its address, the message, the starting address and the typed values read or written.
+"""
+
+class Record:
+
+    __slots__ = ("device", "message", "address", "function", "starting_address", "values", "time")
+
+    def __init__(self, device, message, address: int, function: int, starting_address: int, values: tuple, time: float):
+        self.device = device
+        self.message = message
+        self.address = address
+        self.function = function
+        self.starting_address = starting_address
+        self.values = values
+        self.time = time
+
+"""
+    The Monitor class passively decodes the traffic of masters it does not control, from a raw byte stream
+    such as a capture file or pipe, using the prototypes of the protocol. Every frame is looked up by its
+    slave address and function code: a frame validating as the response of the request outstanding for the
+    pair completes it, and a frame validating as a request of the prototype of its function code becomes the
+    outstanding request of the pair. Both lookups are dictionary lookups, so each frame is matched in constant
+    time however many devices share the line. Bytes matching neither are skipped one at a time until the
+    frames line up again.
+
+    Outstanding requests are evicted once unanswered for timeout seconds, or replaced by the next request of
+    the same pair. With a link model, time is that the bytes so far took on the line, so captures replay alike
+    however fast they are read. The values of each completed transaction are typed by the device message of
+    the request, or else by the data type of the function code, and reported as records.
+"""
+
+class Monitor:
+
+    def __init__(self, protocol, logger, lengths=None, timeout: float = 1.0, link=None, callback=None, clock=time.monotonic):
+        # Setup logger
+        self.logger = logger
+        # Initialize monitor fields
+        self.protocol = protocol
+        self.lengths = lengths
+        self.timeout = timeout
+        self.link = link
+        self.callback = callback
+        self.clock = clock
+        self.scale = 2 if protocol.conversion.mode == Mode.ASCII.value else 1
+        self.buffer = bytearray()
+        self.consumed = 0
+        self.pending = {}
+        self.counters = {"requests": 0, "responses": 0, "records": 0, "exceptions": 0, "unknown": 0, "invalid": 0, "expired": 0, "superseded": 0, "skipped": 0}
+        self.__init_prototypes()
+        self.__init_messages()
+
+    def __init_prototypes(self):
+        protocol = self.protocol
+        self.prototypes = {}
+        self.requests = {}
+        self.responses = {}
+        self.header = None
+        for prototype in protocol.prototype:
+            request = Layout(prototype, Direction.TX, protocol.prefix, protocol.suffix)
+            self.requests[prototype] = request
+            self.responses[prototype] = Layout(prototype, Direction.RX, protocol.prefix, protocol.suffix)
+            if self.header is None and "slave_address" in request.fields and "function" in request.fields:
+                self.header = (request.fields["slave_address"][0], request.fields["function"][0])
+        if self.header is None:
+            raise ValueError("Monitor: no prototype defines the slave_address and function segments")
+        # Prototypes are named by their function code, as for the write queue
+        for function in range(1, MAX_FUNCTION + 1):
+            prototype = protocol.get_prototype(f"fc{function:02d}")
+            if prototype is not None:
+                self.prototypes[function] = prototype
+
+    def __init_messages(self):
+        self.devices = {}
+        self.messages = {}
+        self.types = {}
+        for device in self.protocol.device:
+            self.devices.setdefault(device.address, device)
+            for msg in device.messages:
+                function = getattr(msg, "function", None)
+                if function is None:
+                    continue
+                prototype = self.protocol.get_prototype(msg.name)
+                if prototype is not None:
+                    # The prototype a device message names wins over the one named by the function code
+                    self.prototypes[function] = prototype
+                self.messages.setdefault((device.address, function, getattr(msg, "starting_address", None), getattr(msg, "length", None)), (device, msg))
+                data_type = getattr(msg, "data_type", None)
+                if data_type is not None:
+                    self.types.setdefault(function, data_type.lower())
+
+    def run(self, stream, chunk: int = 4096):
+        """
+        Decodes a byte stream until it ends, passing every record to the callback.
+
+        Args:
+            stream: The binary stream, e.g. an open capture file or standard input.
+            chunk (int): The most bytes read at once.
+        Returns:
+            int: The number of records.
+        Raises:
+            None
+        """
+        # Reads return what a pipe holds so far instead of waiting for a whole chunk
+        read = getattr(stream, "read1", stream.read)
+        while True:
+            data = read(chunk)
+            if not data:
+                break
+            self.feed(data)
+        self.finish()
+        return self.counters["records"]
+
+    def feed(self, data: bytes):
+        """
+        Decodes the frames completed by the given bytes, keeping a trailing partial frame for the next call.
+
+        Args:
+            data (bytes): The bytes read from the line.
+        Returns:
+            list[Record]: The records of the transactions completed.
+        Raises:
+            None
+        """
+        self.buffer += data
+        return self.decode(False)
+
+    def finish(self):
+        """
+        Decodes the bytes left at the end of the stream, skipping those of a partial frame.
+
+        Args:
+            None
+        Returns:
+            list[Record]: The records of the transactions completed.
+        Raises:
+            None
+        """
+        return self.decode(True)
+
+    def decode(self, final: bool):
+        """
+        Decodes the frames in the buffer.
+
+        Args:
+            final (bool): True if no more bytes follow.
+        Returns:
+            list[Record]: The records of the transactions completed.
+        Raises:
+            None
+        """
+        records = []
+        buffer = self.buffer
+        position = 0
+        while position < len(buffer):
+            size = self.match(buffer, position, records, final)
+            if size == 0:
+                break
+            position += size
+        del buffer[:position]
+        self.consumed += position
+        if self.callback is not None:
+            for record in records:
+                self.callback(record)
+        return records
+
+    def match(self, buffer: bytearray, position: int, records: list, final: bool):
+        """
+        Matches the frame at a position of the buffer as the response of the outstanding request of its
+        slave address and function code, or else as a request.
+
+        Args:
+            buffer (bytearray): The buffer.
+            position (int): The position of the frame.
+            records (list): The records, a completed transaction's is appended.
+            final (bool): True if no more bytes follow.
+        Returns:
+            int: The bytes consumed, 0 if more bytes are needed.
+        Raises:
+            None
+        """
+        available = len(buffer) - position
+        address_offset, function_offset = self.header
+        if available < (max(address_offset, function_offset) + 1) * self.scale:
+            if not final:
+                return 0
+            self.counters["skipped"] += available
+            return available
+        try:
+            address = self.read(buffer, position, address_offset, 1)
+            function = self.read(buffer, position, function_offset, 1)
+        except ValueError:
+            self.counters["skipped"] += 1
+            return 1
+        now = self.get_time(position)
+        self.evict(now)
+        incomplete = False
+        request = self.pending.get((address, function & MAX_FUNCTION))
+        if request is not None:
+            size = self.get_response_size(request, buffer, position, function)
+            if size is None or size > available:
+                incomplete = True
+            elif self.is_valid(buffer[position:position + size]):
+                self.complete(request, bytes(buffer[position:position + size]), function, now, records)
+                return size
+        prototype = self.prototypes.get(function)
+        if prototype is not None:
+            size = self.get_size(self.requests[prototype], buffer, position)
+            if size is None or size > available:
+                incomplete = True
+            elif self.is_valid(buffer[position:position + size]):
+                self.add(address, function, prototype, bytes(buffer[position:position + size]), now)
+                return size
+        if incomplete and not final:
+            return 0
+        self.counters["skipped"] += 1
+        return 1
+
+    def read(self, buffer: bytearray, position: int, offset: int, size: int):
+        """
+        Reads a field of the frame at a position of the buffer.
+
+        Args:
+            buffer (bytearray): The buffer.
+            position (int): The position of the frame.
+            offset (int): The offset of the field, in hex mode bytes.
+            size (int): The size of the field, in hex mode bytes.
+        Returns:
+            int: The field value.
+        Raises:
+            ValueError: If the field is not valid hexadecimal in ascii mode.
+        """
+        if self.scale == 1:
+            return int.from_bytes(buffer[position + offset:position + offset + size], "big")
+        return int(bytes(buffer[position + offset * 2:position + (offset + size) * 2]), 16)
+
+    def get_size(self, layout: Layout, buffer: bytearray, position: int):
+        """
+        Computes the size of the frame at a position of the buffer from the layout of its prototype.
+
+        Args:
+            layout (Layout): The layout of the prototype message.
+            buffer (bytearray): The buffer.
+            position (int): The position of the frame.
+        Returns:
+            int: The size of the frame in bytes, or None if too few bytes were received to tell.
+        Raises:
+            None
+        """
+        if layout.count is None:
+            return layout.size * self.scale
+        offset, size = layout.count
+        if len(buffer) - position < (offset + size) * self.scale:
+            return None
+        try:
+            count = self.read(buffer, position, offset, size)
+        except ValueError:
+            # Fails validation as any size would
+            return layout.size * self.scale
+        return (layout.size + (layout.data_bits * count + 7) // 8) * self.scale
+
+    def get_response_size(self, request: Request, buffer: bytearray, position: int, function: int):
+        """
+        Computes the size of the response to a request at a position of the buffer, by the response length
+        index for device messages of the protocol, and else by the layout of the prototype.
+
+        Args:
+            request (Request): The outstanding request.
+            buffer (bytearray): The buffer.
+            position (int): The position of the response.
+            function (int): The function code of the response.
+        Returns:
+            int: The size of the response in bytes, or None if too few bytes were received to tell.
+        Raises:
+            None
+        """
+        mode = self.protocol.conversion.mode
+        fields = request.fields
+        if self.lengths is not None:
+            length = self.lengths.get_by_request(request.address, request.function, fields.get("starting_address"), fields.get("length"))
+            if length is not None:
+                try:
+                    return length.resolve(buffer[position:position + length.get_header_size(mode)], mode)
+                except ValueError:
+                    # Fails validation as any size would
+                    return length.get_size(mode)
+        if function & EXCEPTION_FLAG:
+            protocol = self.protocol
+            size = self.header[1] + 1 + EXCEPTION_CODE_BYTES + protocol.checksum.get_size_of_checksum() + len(protocol.suffix)
+            return size * self.scale
+        return self.get_size(self.responses[request.prototype], buffer, position)
+
+    def is_valid(self, frame: bytearray):
+        """
+        Validates the prefix, suffix and checksum of a frame, without logging failures as frames are
+        tried at any offset.
+
+        Args:
+            frame (bytearray): The frame.
+        Returns:
+            bool: True if the frame is valid, False otherwise.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        checksum = protocol.checksum
+        try:
+            message = protocol.conversion.get_hex_message(frame, protocol.prefix, protocol.suffix)
+        except (ValueError, IndexError):
+            return False
+        prefix = len(protocol.prefix)
+        suffix = len(protocol.suffix)
+        if message[:prefix] != protocol.prefix.encode() or message[len(message) - suffix:] != protocol.suffix.encode():
+            return False
+        body = message[:len(message) - suffix - checksum.get_size_of_checksum()]
+        return checksum.calculate_checksum(body, protocol.prefix) == checksum.get_checksum_from_byte_array(message, protocol.suffix)
+
+    def add(self, address: int, function: int, prototype, frame: bytes, now: float):
+        """
+        Makes a request the outstanding request of its slave address and function code.
+
+        Args:
+            address (int): The slave address.
+            function (int): The function code.
+            prototype (Prototype): The prototype of the function code.
+            frame (bytes): The request frame.
+            now (float): The current time in seconds.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        try:
+            fields = self.protocol.decode_message(prototype, Direction.TX, frame)
+        except ValueError as e:
+            self.logger.debug("Monitor: unable to decode request %s: %s", prototype.name, e)
+            self.counters["invalid"] += 1
+            return
+        self.counters["requests"] += 1
+        key = (address, function)
+        # Reinserted last, keeping the requests in the order they were seen for eviction
+        if self.pending.pop(key, None) is not None:
+            self.counters["superseded"] += 1
+        self.pending[key] = Request(address, function, prototype, fields, now)
+
+    def complete(self, request: Request, frame: bytes, function: int, now: float, records: list):
+        """
+        Completes the outstanding request with its response, appending the record of the transaction.
+
+        Args:
+            request (Request): The outstanding request.
+            frame (bytes): The response frame.
+            function (int): The function code of the response.
+            now (float): The current time in seconds.
+            records (list): The records.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        del self.pending[(request.address, request.function)]
+        self.counters["responses"] += 1
+        if function & EXCEPTION_FLAG:
+            self.counters["exceptions"] += 1
+            return
+        try:
+            fields = self.protocol.decode_message(request.prototype, Direction.RX, frame)
+        except ValueError as e:
+            self.logger.debug("Monitor: unable to decode response %s: %s", request.prototype.name, e)
+            self.counters["invalid"] += 1
+            return
+        device, message = self.get_message(request)
+        if "data_bytes" in fields:
+            values = get_values(message, fields["data_bytes"])
+        elif "data_bytes" in request.fields:
+            values = get_values(message, request.fields["data_bytes"])
+        elif "value" in request.fields:
+            value = request.fields["value"]
+            data_type = getattr(message, "data_type", None)
+            values = (int(value == COIL_ON),) if data_type is not None and data_type.lower() == DataType.BIT.value else (value,)
+        else:
+            values = ()
+        self.counters["records"] += 1
+        records.append(Record(device, message, request.address, request.function, request.fields.get("starting_address"), values, now))
+
+    def get_message(self, request: Request):
+        """
+        Retrieves the device and device message of a request, or else describes the request by a message
+        typed by the data type of its function code.
+
+        Args:
+            request (Request): The request.
+        Returns:
+            tuple: The device, None if unknown, and the message.
+        Raises:
+            None
+        """
+        fields = request.fields
+        entry = self.messages.get((request.address, request.function, fields.get("starting_address"), fields.get("length")))
+        if entry is not None:
+            return entry
+        self.counters["unknown"] += 1
+        data_type = self.types.get(request.function)
+        if data_type is None:
+            data_type = DataType.BIT.value if request.function in BIT_FUNCTIONS else DataType.INT16.value
+        config = {"name": request.prototype.name, "function": request.function, "data_type": data_type}
+        for name in ("starting_address", "length"):
+            if name in fields:
+                config[name] = fields[name]
+        return self.devices.get(request.address), Message(config, self.logger)
+
+    def evict(self, now: float):
+        """
+        Evicts the outstanding requests unanswered for longer than the timeout, oldest first.
+
+        Args:
+            now (float): The current time in seconds.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        if self.timeout is None:
+            return
+        pending = self.pending
+        while pending:
+            request = next(iter(pending.values()))
+            if now - request.time <= self.timeout:
+                break
+            del pending[(request.address, request.function)]
+            self.counters["expired"] += 1
+
+    def get_time(self, position: int):
+        """
+        Retrieves the current time, that the bytes so far took on the line with a link model.
+
+        Args:
+            position (int): The position in the buffer.
+        Returns:
+            float: The time in seconds.
+        Raises:
+            None
+        """
+        if self.link is not None:
+            return self.link.get_frame_time(self.consumed + position)
+        return self.clock()
+
+    def log(self):
+        """
+        Outputs the monitor counters.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.logger.info("Monitor: %s, outstanding=%d", ", ".join(f"{name}={count}" for name, count in self.counters.items()), len(self.pending))
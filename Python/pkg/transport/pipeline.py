@@ -0,0 +1,377 @@
+"""
+    Package 'transport' provides mechanism's for the transmission and reception of protocol data.
+"""
+
+import queue
+import threading
+import time
+from constants import Direction, Outcome
+from pkg.transform.change import get_values
+
+"""
+    Objects of class Poll carry a single poll of a device message through the stages of a pipeline, each
+    stage filling in its part. A poll that failed keeps flowing with its outcome set, and later stages
+    pass it on untouched.
+"""
+
+class Poll:
+
+    __slots__ = ("message", "device", "prototype", "tx", "rx", "body", "fields", "values", "changed", "timestamp", "outcome")
+
+    def __init__(self, message, device):
+        self.message = message
+        self.device = device
+        self.prototype = None
+        self.tx = None
+        self.rx = None
+        self.body = None
+        self.fields = None
+        self.values = None
+        self.changed = True
+        self.timestamp = None
+        self.outcome = None
+
+"""
+    The Pipeline class runs polls as a chain of streaming stages: plan, encode, transport, frame decode,
+    checksum, typed decode and sink. Every stage is a generator consuming the polls of the stage before it,
+    so the chain runs in a single thread by default, one poll at a time.
+
+    With threaded set, every stage runs in its own thread, connected to the next stage by a bounded queue.
+    A full queue makes the stage before it wait, so a slow stage applies backpressure instead of letting
+    polls pile up in memory. With drop set, polls the sink cannot keep up with are dropped and counted
+    instead, so a slow sink never stalls polling.
+"""
+
+# Marks the end of the polls in a queue
+END = object()
+
+class Pipeline:
+
+    def __init__(self, protocol, logger, detector=None, sink=None, lengths=None, threaded: bool = False, queue_size: int = 64, drop: bool = False):
+        # Setup logger
+        self.logger = logger
+        # Initialize pipeline fields
+        self.protocol = protocol
+        self.detector = detector
+        self.sink = sink
+        self.lengths = lengths
+        self.threaded = threaded
+        self.queue_size = queue_size
+        self.drop = drop
+        self.stopping = threading.Event()
+        self.counters = {"polled": 0, "stored": 0, "dropped": 0}
+        for outcome in Outcome:
+            self.counters[outcome.value] = 0
+
+    def run(self, cycles: int = 10):
+        """
+        Runs the given number of poll cycles through the stages.
+
+        Args:
+            cycles (int): The number of poll cycles.
+        Returns:
+            None
+        Raises:
+            Exception: Any exception raised by a stage.
+        """
+        stages = (self.encode, self.transport, self.frame_decode, self.checksum, self.typed_decode)
+        self.stopping.clear()
+        polls = self.plan(cycles)
+        for stage in stages:
+            polls = stage(self.connect(polls, stage.__name__))
+        polls = self.store(self.connect(polls, "store", self.drop))
+        for poll in polls:
+            self.counters["polled"] += 1
+            self.counters[poll.outcome.value] += 1
+        self.log()
+
+    def connect(self, polls, name: str, drop: bool = False):
+        """
+        Connects a stage to the polls of the stage before it, through a bounded queue filled by a thread
+        of its own when the pipeline is threaded, and else directly.
+
+        Args:
+            polls: The polls of the stage before.
+            name (str): The name of the stage consuming the polls.
+            drop (bool): Whether polls are dropped rather than waited for when the queue is full.
+        Returns:
+            Generator of Poll: The polls.
+        Raises:
+            None
+        """
+        if not self.threaded:
+            return polls
+        buffer = queue.Queue(self.queue_size)
+        thread = threading.Thread(target=self.produce, args=(polls, buffer, drop), name=f"Pipeline-{name}", daemon=True)
+        thread.start()
+        return self.consume(buffer)
+
+    def produce(self, polls, buffer: queue.Queue, drop: bool):
+        """
+        Moves the polls of a stage into a bounded queue. Runs on the thread of the stage.
+
+        Args:
+            polls: The polls of the stage.
+            buffer (queue.Queue): The queue to the next stage.
+            drop (bool): Whether polls are dropped rather than waited for when the queue is full.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        try:
+            for poll in polls:
+                if drop:
+                    try:
+                        buffer.put_nowait(poll)
+                    except queue.Full:
+                        self.counters["dropped"] += 1
+                elif not self.put(buffer, poll):
+                    return
+        except Exception as e:
+            # Raised again on the consuming side
+            self.put(buffer, e)
+            return
+        self.put(buffer, END)
+
+    def put(self, buffer: queue.Queue, item):
+        """
+        Waits for room in a queue, giving up once the pipeline is stopping.
+
+        Args:
+            buffer (queue.Queue): The queue.
+            item: The poll, exception or end marker.
+        Returns:
+            bool: True if the item was queued, False if the pipeline is stopping.
+        Raises:
+            None
+        """
+        while not self.stopping.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def consume(self, buffer: queue.Queue):
+        """
+        Yields the polls of a queue, until its end marker.
+
+        Args:
+            buffer (queue.Queue): The queue.
+        Returns:
+            Generator of Poll: The polls.
+        Raises:
+            Exception: Any exception raised by the stage filling the queue.
+        """
+        item = None
+        try:
+            while True:
+                try:
+                    item = buffer.get(timeout=0.1)
+                except queue.Empty:
+                    # The stage filling the queue gave up, as the pipeline is stopping
+                    if self.stopping.is_set():
+                        return
+                    continue
+                if item is END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Release the stages before this one, should the pipeline stop early
+            if item is not END:
+                self.stopping.set()
+
+    def plan(self, cycles: int):
+        """
+        Plans the polls of every message of every device, cycle after cycle.
+
+        Args:
+            cycles (int): The number of poll cycles.
+        Returns:
+            Generator of Poll: The planned polls.
+        Raises:
+            None
+        """
+        for _ in range(cycles):
+            for device in self.protocol.device:
+                for msg in device.messages:
+                    yield Poll(msg, device)
+
+    def encode(self, polls):
+        """
+        Sets the message for transmission of each poll.
+
+        Args:
+            polls: The planned polls.
+        Returns:
+            Generator of Poll: The polls.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        for poll in polls:
+            poll.prototype = protocol.get_prototype(poll.message.name)
+            if poll.prototype is None:
+                self.logger.error("Pipeline: unable to find prototype for message: %s", poll.message.name)
+                poll.outcome = Outcome.FAILED
+            else:
+                try:
+                    poll.tx = protocol.get_transmit_message(poll.prototype, poll.message, poll.device)
+                except ValueError as e:
+                    self.logger.error("Pipeline: unable to encode message %s: %s", poll.message.name, e)
+                    poll.outcome = Outcome.FAILED
+            yield poll
+
+    def transport(self, polls):
+        """
+        Exchanges the message of each poll. With a transaction engine set on the protocol, the engine
+        performs the exchange, applying its timeout, retries and circuit breaking, and validates the response.
+
+        Args:
+            polls: The encoded polls.
+        Returns:
+            Generator of Poll: The polls, with the received message if any.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        engine = protocol.engine
+        for poll in polls:
+            if poll.outcome is None:
+                poll.timestamp = time.time()
+                if engine is not None:
+                    transaction = engine.submit(poll.message, poll.device)
+                    engine.run()
+                    poll.rx = transaction.received
+                    poll.outcome = None if transaction.outcome == Outcome.SUCCESS else transaction.outcome
+                else:
+                    protocol.simulation.simulate_transmit(poll.tx)
+                    poll.rx = protocol.get_received_message(poll.prototype, poll.message, poll.device)
+                    if poll.rx is None:
+                        poll.outcome = Outcome.TIMEOUT
+                    else:
+                        protocol.simulation.simulate_receive(poll.rx)
+            yield poll
+
+    def frame_decode(self, polls):
+        """
+        Converts each received message to hexadecimal format and removes prefix and suffix, rejecting
+        messages whose length is not the expected response length.
+
+        Args:
+            polls: The exchanged polls.
+        Returns:
+            Generator of Poll: The polls, with the message body.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        mode = protocol.conversion.mode
+        for poll in polls:
+            if poll.outcome is None:
+                length = self.lengths.get(poll.message, poll.device) if self.lengths is not None else None
+                try:
+                    if length is not None and len(poll.rx) != length.resolve(poll.rx, mode):
+                        raise ValueError(f"unexpected length {len(poll.rx)}")
+                    message = protocol.conversion.get_hex_message(poll.rx, protocol.prefix, protocol.suffix)
+                    poll.body = message[len(protocol.prefix):len(message) - len(protocol.suffix)]
+                except ValueError as e:
+                    self.logger.warning("Pipeline: invalid frame for message %s: %s", poll.message.name, e)
+                    poll.outcome = Outcome.INVALID
+            yield poll
+
+    def checksum(self, polls):
+        """
+        Validates the checksum of each received message, unless a transaction engine already did.
+
+        Args:
+            polls: The decoded frames.
+        Returns:
+            Generator of Poll: The polls.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        validate = protocol.engine is None
+        for poll in polls:
+            if poll.outcome is None and validate:
+                if not protocol.checksum.validate_checksum_in_message(poll.rx, protocol.suffix, protocol.prefix):
+                    self.logger.warning("Pipeline: message validation failed for message: %s", poll.message.name)
+                    poll.outcome = Outcome.INVALID
+            yield poll
+
+    def typed_decode(self, polls):
+        """
+        Decodes the segments and the typed values of each received message, and applies change detection
+        if a change detector is set.
+
+        Args:
+            polls: The validated polls.
+        Returns:
+            Generator of Poll: The polls, with their values.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        compiler = protocol.compiler
+        for poll in polls:
+            if poll.outcome is None:
+                try:
+                    if compiler is not None:
+                        poll.fields = compiler.decode(poll.prototype, Direction.RX, poll.body)
+                    else:
+                        poll.fields = poll.prototype.decode(Direction.RX, poll.body)
+                except ValueError as e:
+                    self.logger.warning("Pipeline: unable to decode message %s: %s", poll.message.name, e)
+                    poll.outcome = Outcome.INVALID
+                    yield poll
+                    continue
+                data = poll.fields.get("data_bytes")
+                if data is not None:
+                    if self.detector is not None:
+                        try:
+                            change = self.detector.update(poll.message, poll.device, data)
+                        except ValueError as e:
+                            self.logger.warning("Pipeline: unable to detect changes of message %s: %s", poll.message.name, e)
+                            change = None
+                        poll.changed = change is not None
+                        poll.values = change.values if change is not None else None
+                    else:
+                        poll.values = get_values(poll.message, data)
+                poll.outcome = Outcome.SUCCESS
+            yield poll
+
+    def store(self, polls):
+        """
+        Appends the changed values of each successful poll to the sink, if a sink is set.
+
+        Args:
+            polls: The decoded polls.
+        Returns:
+            Generator of Poll: The polls.
+        Raises:
+            None
+        """
+        for poll in polls:
+            if self.sink is not None and poll.outcome == Outcome.SUCCESS and poll.changed and poll.values is not None:
+                message = poll.message
+                self.sink.append(poll.timestamp, poll.device.address, getattr(message, "function", 0), getattr(message, "starting_address", 0), poll.values)
+                self.counters["stored"] += 1
+            yield poll
+
+    def log(self):
+        """
+        Outputs the pipeline counters.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.logger.info("Pipeline: %s", ", ".join(f"{name}={count}" for name, count in self.counters.items()))
@@ -0,0 +1,287 @@
+"""
+    Package 'transport' provides mechanism's for the transmission and reception of protocol data.
+"""
+
+import re
+import numpy as np
+from constants import Direction
+from pkg.element.register import RegisterMap, BIT_SPACES, get_register_count, get_register_sizes
+
+"""
+    The Responder class answers requests in the server (slave) role. It owns a register map for each device
+    address of the protocol, parses incoming requests with the same prototype definitions used to build them,
+    answers reads with slices of the register maps and applies writes to them. The register maps may be views of a shared register
+    store, so that other processes can update the device state. Requests outside a register map are answered with
+    Modbus exception responses, requests for unknown device addresses or with invalid checksums are ignored,
+    as a slave on a multi-drop line would.
+"""
+
+# Modbus exception codes
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+ILLEGAL_DATA_VALUE = 0x03
+EXCEPTION_FLAG = 0x80
+
+# Write function codes, and the output value switching a coil on
+WRITE_FUNCTIONS = (5, 6, 15, 16)
+COIL_ON = 0xFF00
+
+PROTOTYPE_NAME_PATTERN = re.compile(r"^fc0*(\d+)$")
+
+class Responder:
+
+    def __init__(self, protocol, logger, seed: int = None, store=None):
+        # Setup logger
+        self.logger = logger
+        # Initialize responder fields
+        self.protocol = protocol
+        self.maps = {}
+        self.messages = {}
+        self.functions = {}
+        self.function_offset = 1
+        self.rng = np.random.default_rng(seed)
+        self.store = store
+        self.__init_functions()
+        self.__init_messages()
+        self.__init_maps(store)
+
+    def __init_functions(self):
+        # Map function codes to prototypes, from the device messages and else from prototype names such as fc03
+        for prototype in self.protocol.prototype:
+            match = PROTOTYPE_NAME_PATTERN.match(prototype.name)
+            if match is not None:
+                self.functions.setdefault(int(match.group(1)), prototype)
+        for device in self.protocol.device:
+            for msg in device.messages:
+                prototype = self.protocol.get_prototype(msg.name)
+                if prototype is not None and hasattr(msg, "function"):
+                    self.functions[msg.function] = prototype
+        # Byte offset of the function code, the same for every prototype of a protocol
+        if len(self.protocol.prototype) > 0:
+            offset = 0
+            for segment in self.protocol.prototype[0].get_segments(Direction.TX):
+                if segment.name == "function":
+                    self.function_offset = offset
+                    break
+                offset += segment.bits // 8
+
+    def __init_messages(self):
+        # Index the device messages, to answer reads with the ranges their data types require
+        for device in self.protocol.device:
+            for msg in device.messages:
+                if hasattr(msg, "function") and hasattr(msg, "starting_address") and hasattr(msg, "length"):
+                    self.messages[(device.address, msg.function, msg.starting_address, msg.length)] = msg
+
+    def __init_maps(self, store):
+        # Shared register maps hold state owned by another process, only private maps are randomized
+        if store is not None:
+            self.maps = store.get_register_maps()
+            return
+        for address, sizes in get_register_sizes(self.protocol.device).items():
+            self.maps[address] = RegisterMap(sizes, self.logger)
+            self.maps[address].randomize(self.rng)
+
+    def refresh(self):
+        """
+        Indexes the devices of the protocol again after they changed, e.g. on a reload. Devices at new
+        addresses get a register map of their own, and maps too small for the ranges now accessed are
+        grown, keeping their values. Maps of a shared register store cannot be grown.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.functions = {}
+        self.messages = {}
+        self.__init_functions()
+        self.__init_messages()
+        for address, sizes in get_register_sizes(self.protocol.device).items():
+            current = self.maps.get(address)
+            if current is not None and all(len(current.arrays[space]) >= size for space, size in sizes.items()):
+                continue
+            if self.store is not None:
+                self.logger.warning("Responder: shared register store does not cover device address %d", address)
+                continue
+            if current is not None:
+                sizes = {space: max(sizes.get(space, 0), len(array)) for space, array in current.arrays.items()}
+            register_map = RegisterMap(sizes, self.logger)
+            register_map.randomize(self.rng)
+            if current is not None:
+                for space, array in current.arrays.items():
+                    register_map.arrays[space][:len(array)] = array
+            self.maps[address] = register_map
+
+    def get_map(self, address: int):
+        """
+        Retrieves the register map of a device address.
+
+        Args:
+            address (int): The device address.
+        Returns:
+            RegisterMap: The register map, or None if the address is unknown.
+        Raises:
+            None
+        """
+        return self.maps.get(address)
+
+    def respond(self, request: bytearray):
+        """
+        Answers a request.
+
+        Args:
+            request (bytearray): The request, in the protocol's transmission mode.
+        Returns:
+            bytearray: The response in the protocol's transmission mode, or None if the request is not answered.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        if request is None or len(request) == 0:
+            return None
+        if not protocol.checksum.validate_checksum_in_message(request, protocol.suffix, protocol.prefix):
+            return None
+        message = protocol.conversion.get_hex_message(request, protocol.prefix, protocol.suffix)
+        body = message[len(protocol.prefix):len(message) - len(protocol.suffix)]
+        if len(body) <= self.function_offset:
+            return None
+        # The slave address leads every request
+        address = body[0]
+        function = body[self.function_offset]
+        register_map = self.maps.get(address)
+        if register_map is None:
+            self.logger.debug("Responder: no device at address %d", address)
+            return None
+        prototype = self.functions.get(function)
+        if prototype is None:
+            return self.get_exception(address, function, ILLEGAL_FUNCTION)
+        try:
+            if protocol.compiler is not None:
+                fields = protocol.compiler.decode(prototype, Direction.TX, body)
+            else:
+                fields = prototype.decode(Direction.TX, body)
+        except ValueError as e:
+            self.logger.warning("Responder: malformed request: %s", e)
+            return None
+        return self.execute(register_map, prototype, address, function, fields)
+
+    def execute(self, register_map: RegisterMap, prototype, address: int, function: int, fields: dict):
+        """
+        Executes a decoded request against a register map.
+
+        Args:
+            register_map (RegisterMap): The register map of the addressed device.
+            prototype (Prototype): The prototype of the request.
+            address (int): The device address.
+            function (int): The function code.
+            fields (dict): The decoded request fields.
+        Returns:
+            bytearray: The response in the protocol's transmission mode.
+        Raises:
+            None
+        """
+        space = register_map.get_space(function)
+        if space is not None and function in WRITE_FUNCTIONS and "starting_address" in fields:
+            return self.write(register_map, prototype, address, function, space, fields)
+        if space is None or "starting_address" not in fields or "length" not in fields:
+            return self.get_exception(address, function, ILLEGAL_FUNCTION)
+        start = fields["starting_address"]
+        count = fields["length"]
+        message = self.messages.get((address, function, start, count))
+        if message is not None:
+            count = get_register_count(message, space)
+        if not register_map.is_valid(space, start, count):
+            return self.get_exception(address, function, ILLEGAL_DATA_ADDRESS)
+        data = register_map.read_bytes(space, start, count)
+        fields["byte_count"] = len(data)
+        fields["data_bytes"] = data
+        return self.encode(prototype, fields)
+
+    def write(self, register_map: RegisterMap, prototype, address: int, function: int, space, fields: dict):
+        """
+        Executes a decoded write request against a register map: a single coil or register given by its
+        value field, or a range given by its length and data bytes.
+
+        Args:
+            register_map (RegisterMap): The register map of the addressed device.
+            prototype (Prototype): The prototype of the request.
+            address (int): The device address.
+            function (int): The function code.
+            space (Space): The space written to.
+            fields (dict): The decoded request fields.
+        Returns:
+            bytearray: The response in the protocol's transmission mode, echoing the request.
+        Raises:
+            None
+        """
+        start = fields["starting_address"]
+        if "value" in fields:
+            value = fields["value"]
+            if space in BIT_SPACES:
+                if value not in (COIL_ON, 0):
+                    return self.get_exception(address, function, ILLEGAL_DATA_VALUE)
+                value = 1 if value == COIL_ON else 0
+            if not register_map.is_valid(space, start, 1):
+                return self.get_exception(address, function, ILLEGAL_DATA_ADDRESS)
+            register_map.write(space, start, (value,))
+        else:
+            count = fields.get("length", 0)
+            data = fields.get("data_bytes")
+            if count == 0 or data is None:
+                return self.get_exception(address, function, ILLEGAL_DATA_VALUE)
+            if not register_map.is_valid(space, start, count):
+                return self.get_exception(address, function, ILLEGAL_DATA_ADDRESS)
+            try:
+                register_map.write_bytes(space, start, count, data)
+            except ValueError:
+                return self.get_exception(address, function, ILLEGAL_DATA_VALUE)
+        return self.encode(prototype, fields)
+
+    def encode(self, prototype, fields: dict):
+        """
+        Builds a response from the receive segments of a prototype.
+
+        Args:
+            prototype (Prototype): The prototype.
+            fields (dict): The value of each segment by name, and the data bytes as bytes.
+        Returns:
+            bytearray: The response in the protocol's transmission mode.
+        Raises:
+            ValueError: If a segment value cannot be found.
+        """
+        protocol = self.protocol
+        msg = protocol.append_str_to_byte_array(bytearray(), protocol.prefix)
+        for segment in prototype.get_segments(Direction.RX):
+            if segment.name == "data_bytes":
+                msg.extend(fields["data_bytes"])
+            elif segment.name == "error_check":
+                msg.extend(protocol.checksum.calculate_checksum(msg, protocol.prefix).to_bytes(segment.bits // 8, "big"))
+            elif segment.name in fields:
+                msg.extend(fields[segment.name].to_bytes(segment.bits // 8, "big"))
+            else:
+                raise ValueError(f"Responder: unable to find value for segment: {segment.name}")
+        msg = protocol.append_str_to_byte_array(msg, protocol.suffix)
+        return protocol.conversion.get_converted_message(msg, protocol.prefix, protocol.suffix)
+
+    def get_exception(self, address: int, function: int, code: int):
+        """
+        Builds a Modbus exception response.
+
+        Args:
+            address (int): The device address.
+            function (int): The function code of the request.
+            code (int): The exception code.
+        Returns:
+            bytearray: The response in the protocol's transmission mode.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        self.logger.debug("Responder: exception %d for function %d at address %d", code, function, address)
+        msg = protocol.append_str_to_byte_array(bytearray(), protocol.prefix)
+        msg.extend((address, (function | EXCEPTION_FLAG) & 0xFF, code))
+        msg.extend(protocol.checksum.calculate_checksum(msg, protocol.prefix).to_bytes(protocol.checksum.get_size_of_checksum(), "big"))
+        msg = protocol.append_str_to_byte_array(msg, protocol.suffix)
+        return protocol.conversion.get_converted_message(msg, protocol.prefix, protocol.suffix)
@@ -0,0 +1,97 @@
+"""
+    Package 'transport' provides mechanism's for the transmission and reception of protocol data.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+    The Runtime class runs several protocols, e.g. Modbus RTU and Modbus ASCII definitions, in one process.
+    Every protocol is added under a tag, which is set on the protocol and on each of its devices, so that
+    devices with the same address on different protocols stay apart, e.g. in the metrics.
+
+    Each protocol stands for a line of its own, keeping its own transaction engine, timeout and circuit
+    breakers. The runtime schedules the poll cycles: in every cycle, the cycle of each protocol runs on a
+    shared worker pool, so a slow line does not hold back the others within the cycle, and the next cycle
+    starts once every protocol finished. Protocols also share the metrics given to their transaction
+    engines. The CRC16 lookup table is shared by all protocols in any case.
+
+    Only the worker pool, the CRC16 table and the metrics are shared. There is no scheduler across
+    protocols: the cycle barrier aside, each transaction engine dispatches the transactions of its own
+    protocol, and frames are built into buffers of each protocol.
+"""
+
+class Runtime:
+
+    def __init__(self, logger, workers: int = None):
+        # Setup logger
+        self.logger = logger
+        # Initialize runtime fields
+        self.workers = workers
+        self.protocols = {}
+
+    def add(self, tag: str, protocol):
+        """
+        Adds a protocol under a tag.
+
+        Args:
+            tag (str): The protocol tag, unique within the runtime.
+            protocol (Protocol): The protocol object.
+        Returns:
+            None
+        Raises:
+            ValueError: If another protocol has the same tag.
+        """
+        if tag in self.protocols:
+            raise ValueError(f"Runtime: protocol tag {tag} is already in use")
+        protocol.set_tag(tag)
+        self.protocols[tag] = protocol
+
+    def get_protocol(self, tag: str):
+        """
+        Retrieves the protocol of a tag, e.g. the tag of a device.
+
+        Args:
+            tag (str): The protocol tag.
+        Returns:
+            Protocol: The protocol object, or None if there is none with the tag.
+        Raises:
+            None
+        """
+        return self.protocols.get(tag)
+
+    def run(self, cycles: int = 10):
+        """
+        Runs the given number of poll cycles of every protocol, the protocols of a cycle in parallel.
+
+        Args:
+            cycles (int): The number of poll cycles.
+        Returns:
+            None
+        Raises:
+            Exception: Any exception raised while polling a protocol.
+        """
+        if len(self.protocols) == 0:
+            return
+        workers = self.workers if self.workers is not None else len(self.protocols)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Runtime") as pool:
+            for _ in range(cycles):
+                futures = [pool.submit(protocol.poll) for protocol in self.protocols.values()]
+                for future in futures:
+                    future.result()
+        self.log()
+
+    def log(self):
+        """
+        Outputs the transaction counters of every protocol.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        for tag, protocol in self.protocols.items():
+            if protocol.engine is not None:
+                self.logger.info("Runtime: protocol %s", tag)
+                protocol.engine.log()
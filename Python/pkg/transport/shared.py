@@ -0,0 +1,375 @@
+"""
+    Package 'transport' provides mechanism's for the transmission and reception of protocol data.
+"""
+
+import hashlib
+import mmap
+import struct
+import time
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+from constants import Space
+from pkg.element.register import RegisterMap, BIT_SPACES
+
+"""
+    The SharedRegisterStore class places the register maps of every device address in a single block of shared
+    memory, or a memory-mapped file, so that simulators and pollers running in separate processes read and update
+    the same device state without serializing or copying it between them.
+
+    The layout is fixed by the register sizes of each device address, and every process derives it from the same
+    protocol file; a digest of the layout in the block header guards against mismatches. Each device address has a
+    generation counter used as a sequence lock: a writer makes the counter odd while updating and even again when
+    done, and readers retry until they copied a range under one unchanged, even counter. This gives consistent
+    multi-register reads without locking readers. Writers to the same device address must be serialized, by the
+    caller or through the optional lock.
+"""
+
+MAGIC = b"DONPREGS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII32s")
+HEADER_SIZE = 64
+ALIGNMENT = 8
+
+class SharedRegisterStore:
+
+    def __init__(self, sizes: dict, logger, name: str = None, path: str = None, create: bool = True, lock=None):
+        # Setup logger
+        self.logger = logger
+        # Initialize store fields
+        self.lock = lock
+        self.created = create
+        self.shm = None
+        self.mmap = None
+        self.layout, size = self.get_layout(sizes)
+        digest = self.get_digest()
+        self.__open(name, path, create, size)
+        if create:
+            HEADER.pack_into(self.buffer, 0, MAGIC, FORMAT_VERSION, len(self.layout), digest)
+        else:
+            magic, version, count, found = HEADER.unpack_from(self.buffer, 0)
+            if magic != MAGIC or version != FORMAT_VERSION or count != len(self.layout) or found != digest:
+                self.close()
+                raise ValueError("SharedRegisterStore: the shared layout does not match the register sizes")
+        self.sequences = {}
+        self.views = {}
+        for address, (sequence_offset, regions) in self.layout.items():
+            self.sequences[address] = np.ndarray((1,), dtype=np.uint64, buffer=self.buffer, offset=sequence_offset)
+            self.views[address] = {}
+            for space, (offset, count) in regions.items():
+                dtype = np.uint8 if space in BIT_SPACES else np.uint16
+                self.views[address][space] = np.ndarray((count,), dtype=dtype, buffer=self.buffer, offset=offset)
+
+    def __open(self, name: str, path: str, create: bool, size: int):
+        if path is not None:
+            with open(path, "w+b" if create else "r+b") as f:
+                if create:
+                    f.truncate(size)
+                self.mmap = mmap.mmap(f.fileno(), size)
+            self.buffer = memoryview(self.mmap)
+            return
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            try:
+                # Attaching processes must not unlink the block when they exit
+                self.shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                # Python versions before 3.13 always track, undo it
+                self.shm = shared_memory.SharedMemory(name=name)
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.buffer = self.shm.buf
+
+    def get_layout(self, sizes: dict):
+        """
+        Computes the fixed layout of the shared block, ordered by device address and space.
+
+        Args:
+            sizes (dict): The size of each space by space, by device address.
+        Returns:
+            dict, int: The offset of the generation counter and the offset and size of each space by device
+            address, and the total size of the block in bytes.
+        Raises:
+            None
+        """
+        layout = {}
+        offset = HEADER_SIZE
+        for address in sorted(sizes):
+            sequence_offset = offset
+            offset += 8
+            regions = {}
+            for space in Space:
+                count = sizes[address].get(space, 0)
+                regions[space] = (offset, count)
+                itemsize = 1 if space in BIT_SPACES else 2
+                offset += (count * itemsize + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+            layout[address] = (sequence_offset, regions)
+        return layout, offset
+
+    def get_digest(self):
+        """
+        Computes the digest identifying the layout of the shared block.
+
+        Args:
+            None
+        Returns:
+            bytes: The SHA-256 digest of the layout.
+        Raises:
+            None
+        """
+        description = []
+        for address, (sequence_offset, regions) in self.layout.items():
+            description.append((address, sequence_offset, [(space.value, region) for space, region in regions.items()]))
+        return hashlib.sha256(repr(description).encode()).digest()
+
+    @property
+    def name(self):
+        """
+        Retrieves the name other processes attach the shared block by.
+
+        Args:
+            None
+        Returns:
+            str: The shared memory name, or None when backed by a memory-mapped file.
+        Raises:
+            None
+        """
+        return self.shm.name if self.shm is not None else None
+
+    def get_view(self, address: int, space: Space):
+        """
+        Retrieves a zero-copy view of a space of a device address. Reads through the view are not
+        synchronized with writers, use read for consistent multi-register reads.
+
+        Args:
+            address (int): The device address.
+            space (Space): The space.
+        Returns:
+            numpy.ndarray: The view.
+        Raises:
+            KeyError: If the device address is not part of the store.
+        """
+        return self.views[address][space]
+
+    def get_generation(self, address: int):
+        """
+        Retrieves the number of completed writes to a device address.
+
+        Args:
+            address (int): The device address.
+        Returns:
+            int: The generation.
+        Raises:
+            KeyError: If the device address is not part of the store.
+        """
+        return int(self.sequences[address][0]) // 2
+
+    def begin_write(self, address: int):
+        """
+        Marks the start of an update of a device address, making its generation counter odd.
+
+        Args:
+            address (int): The device address.
+        Returns:
+            None
+        Raises:
+            KeyError: If the device address is not part of the store.
+        """
+        if self.lock is not None:
+            self.lock.acquire()
+        self.sequences[address][0] += 1
+
+    def end_write(self, address: int):
+        """
+        Marks the end of an update of a device address, making its generation counter even.
+
+        Args:
+            address (int): The device address.
+        Returns:
+            None
+        Raises:
+            KeyError: If the device address is not part of the store.
+        """
+        self.sequences[address][0] += 1
+        if self.lock is not None:
+            self.lock.release()
+
+    def write(self, address: int, space: Space, start: int, values):
+        """
+        Writes a range of bits or registers of a device address.
+
+        Args:
+            address (int): The device address.
+            space (Space): The space.
+            start (int): The first address.
+            values: The values, any sequence or array.
+        Returns:
+            None
+        Raises:
+            KeyError: If the device address is not part of the store.
+            IndexError: If the range is not within the space.
+        """
+        values = np.asarray(values)
+        view = self.views[address][space]
+        if start < 0 or start + len(values) > len(view):
+            raise IndexError(f"SharedRegisterStore: range {start}+{len(values)} outside of {space.value}")
+        self.begin_write(address)
+        try:
+            view[start:start + len(values)] = values
+        finally:
+            self.end_write(address)
+
+    def read(self, address: int, space: Space, start: int, count: int):
+        """
+        Reads a consistent copy of a range of bits or registers of a device address.
+
+        Args:
+            address (int): The device address.
+            space (Space): The space.
+            start (int): The first address.
+            count (int): The number of bits or registers.
+        Returns:
+            numpy.ndarray: The copy of the range.
+        Raises:
+            KeyError: If the device address is not part of the store.
+        """
+        view = self.views[address][space]
+        return self.read_consistent(address, lambda: view[start:start + count].copy())
+
+    def read_consistent(self, address: int, func):
+        """
+        Calls a reading function until it ran while no update of the device address was in progress.
+
+        Args:
+            address (int): The device address.
+            func (callable): The function copying data out of the store, invoked without arguments.
+        Returns:
+            The result of the function.
+        Raises:
+            KeyError: If the device address is not part of the store.
+        """
+        sequence = self.sequences[address]
+        attempts = 0
+        while True:
+            before = int(sequence[0])
+            if before % 2 == 0:
+                result = func()
+                if int(sequence[0]) == before:
+                    return result
+            attempts += 1
+            # Yield to the writer after a few spins
+            if attempts % 64 == 0:
+                time.sleep(0)
+
+    def get_register_maps(self):
+        """
+        Builds a register map for each device address, backed by the shared block.
+
+        Args:
+            None
+        Returns:
+            dict: The register maps by device address.
+        Raises:
+            None
+        """
+        return {address: SharedRegisterMap(self, address, self.logger) for address in self.views}
+
+    def close(self):
+        """
+        Detaches from the shared block. Views obtained from the store must no longer be used.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.sequences = {}
+        self.views = {}
+        self.buffer = None
+        try:
+            if self.shm is not None:
+                self.shm.close()
+            if self.mmap is not None:
+                self.mmap.close()
+        except BufferError:
+            # Views handed out are still alive, the mapping is released with them
+            self.logger.debug("SharedRegisterStore: views still in use, deferring close")
+
+    def unlink(self):
+        """
+        Requests the shared block to be destroyed once every process detached. Only the creating process
+        should unlink a shared memory block, see created.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        if self.shm is not None:
+            self.shm.unlink()
+
+"""
+    Objects of class SharedRegisterMap are register maps backed by a shared register store, whose data byte
+    reads and writes are synchronized with other processes through the store's generation counter.
+"""
+
+class SharedRegisterMap(RegisterMap):
+
+    def __init__(self, store: SharedRegisterStore, address: int, logger):
+        super().__init__({}, logger, arrays=store.views[address])
+        self.store = store
+        self.address = address
+
+    def write(self, space: Space, start: int, values):
+        """
+        Writes a range of bits or registers.
+
+        Args:
+            space (Space): The space.
+            start (int): The first address.
+            values: The values, any sequence or array.
+        Returns:
+            None
+        Raises:
+            IndexError: If the range is not within the space.
+        """
+        self.store.write(self.address, space, start, values)
+
+    def read_bytes(self, space: Space, start: int, count: int):
+        """
+        Retrieves a consistent range in its Modbus data byte representation.
+
+        Args:
+            space (Space): The space.
+            start (int): The first address.
+            count (int): The number of bits or registers.
+        Returns:
+            bytes: The data bytes.
+        Raises:
+            IndexError: If the range is not within the space.
+        """
+        return self.store.read_consistent(self.address, lambda: super(SharedRegisterMap, self).read_bytes(space, start, count))
+
+    def write_bytes(self, space: Space, start: int, count: int, data: bytes):
+        """
+        Writes a range from its Modbus data byte representation.
+
+        Args:
+            space (Space): The space.
+            start (int): The first address.
+            count (int): The number of bits or registers.
+            data (bytes): The data bytes.
+        Returns:
+            None
+        Raises:
+            IndexError: If the range is not within the space.
+            ValueError: If there are too few data bytes.
+        """
+        self.store.begin_write(self.address)
+        try:
+            super().write_bytes(space, start, count, data)
+        finally:
+            self.store.end_write(self.address)
@@ -6,7 +6,9 @@ from pkg.transform.conversion import Conversion
 """
     The Simulation class provides a simulated transport mechanism for testing and development purposes.
     It contains a conversion object which defines how data is represented and logged during transmission 
-    and reception.
+    and reception. With a link model set, the time the simulated frames would take on a serial line is
+    accumulated, as the simulation itself completes every transaction instantly. With a capture file set, the
+    simulated frames are written to it as they would appear on the line, e.g. for the monitor to decode.
 """
 
 class Simulation:
@@ -14,6 +16,38 @@ class Simulation:
     def __init__(self, conversion: Conversion, logger):
         self.logger = logger
         self.conversion = conversion
+        self.link = None
+        self.wire_time = 0.0
+        self.frames = 0
+        self.capture = None
+
+    def set_capture(self, capture):
+        """
+        Sets the binary file the simulated frames are written to.
+
+        Args:
+            capture: The open binary file, or None for no capture.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.capture = capture
+
+    def set_link(self, link):
+        """
+        Sets the link model the time of the simulated frames is computed with.
+
+        Args:
+            link (LinkModel): The link model, or None for no timing.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.link = link
+        self.wire_time = 0.0
+        self.frames = 0
 
     def simulate_transaction(self, tx: bytearray, rx: bytearray):
         """
@@ -49,6 +83,11 @@ class Simulation:
             raise ValueError("Simulation: unable to simulate an empty transmit message")
         
         self.logger.info("Simulated TX: %s", self.conversion.display(tx))   
+        if self.capture is not None:
+            self.capture.write(tx)
+        if self.link is not None:
+            self.frames += 1
+            self.wire_time += self.link.get_frame_time(len(tx)) + self.link.get_gap()
         return True
     
     def simulate_receive(self, rx: bytearray):
@@ -68,6 +107,26 @@ class Simulation:
             raise ValueError("Simulation: unable to simulate an empty receive message")
         
         self.logger.info("Simulated RX: %s", self.conversion.display(rx))     
+        if self.capture is not None:
+            self.capture.write(rx)
+        if self.link is not None:
+            # The device turnaround precedes the response, the device itself is not known here
+            self.frames += 1
+            self.wire_time += self.link.get_turnaround() + self.link.get_frame_time(len(rx)) + self.link.get_gap()
         return True
+
+    def log(self):
+        """
+        Outputs the time the simulated frames would take on the line of the link model, if one is set.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        if self.link is not None:
+            self.logger.info("Simulation: frames=%d, wire time %.3f s at %s", self.frames, self.wire_time, self.link.describe())
     
         
\ No newline at end of file
@@ -0,0 +1,493 @@
+"""
+    Package 'transport' provides mechanism's for the transmission and reception of protocol data.
+"""
+
+import heapq
+import time
+from collections import deque
+from constants import Outcome
+from pkg.component.length import EXCEPTION_FLAG
+
+"""
+    Objects of class RetryPolicy decide whether a failed transaction is attempted again, and how long to
+    wait before it is: the delay starts at backoff seconds and is multiplied by factor for every further
+    attempt, up to max_backoff seconds.
+"""
+
+class RetryPolicy:
+
+    __slots__ = ("retries", "backoff", "factor", "max_backoff")
+
+    def __init__(self, retries: int = 2, backoff: float = 0.01, factor: float = 2.0, max_backoff: float = 1.0):
+        if retries < 0 or backoff < 0 or factor < 1 or max_backoff < 0:
+            raise ValueError("RetryPolicy: retries and delays must not be negative, factor must be at least 1")
+        self.retries = retries
+        self.backoff = backoff
+        self.factor = factor
+        self.max_backoff = max_backoff
+
+    def get_delay(self, attempt: int):
+        """
+        Retrieves the delay before the next attempt of a transaction.
+
+        Args:
+            attempt (int): The number of failed attempts so far, starting at 1.
+        Returns:
+            float: The delay in seconds, or None if no further attempt is made.
+        Raises:
+            None
+        """
+        if attempt > self.retries:
+            return None
+        return min(self.backoff * self.factor ** (attempt - 1), self.max_backoff)
+
+"""
+    Objects of class CircuitBreaker track the consecutive failures of a single device. Once threshold
+    consecutive transactions failed the breaker opens, and transactions for the device are skipped for
+    cooldown seconds instead of each waiting for the full timeout. After the cooldown, transactions are
+    let through again: the first success closes the breaker, the first failure opens it for another cooldown.
+"""
+
+class CircuitBreaker:
+
+    __slots__ = ("logger", "name", "threshold", "cooldown", "failures", "open_until")
+
+    def __init__(self, name: str, threshold: int, cooldown: float, logger):
+        # Setup logger
+        self.logger = logger
+        # Initialize breaker fields
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = None
+
+    def allow(self, now: float):
+        """
+        Checks whether a transaction for the device may be attempted.
+
+        Args:
+            now (float): The current time in seconds.
+        Returns:
+            bool: True unless the breaker is open, False otherwise.
+        Raises:
+            None
+        """
+        return self.open_until is None or now >= self.open_until
+
+    def record_success(self):
+        """
+        Records a successful transaction, closing the breaker.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        if self.open_until is not None:
+            self.logger.info("CircuitBreaker: device %s recovered", self.name)
+        self.failures = 0
+        self.open_until = None
+
+    def record_failure(self, now: float):
+        """
+        Records a failed transaction, opening the breaker once the threshold is reached.
+
+        Args:
+            now (float): The current time in seconds.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.failures += 1
+        if self.threshold > 0 and self.failures >= self.threshold:
+            self.open_until = now + self.cooldown
+            self.logger.warning("CircuitBreaker: device %s failed %d times, skipping it for %.3f seconds", self.name, self.failures, self.cooldown)
+
+"""
+    Objects of class Transaction hold the state of a single message exchange across its attempts.
+"""
+
+class Transaction:
+
+    __slots__ = ("message", "device", "attempts", "sent", "deadline", "outcome", "received", "labels")
+
+    def __init__(self, message, device):
+        self.message = message
+        self.device = device
+        self.attempts = 0
+        self.sent = None
+        self.deadline = None
+        self.outcome = None
+        self.received = None
+        # Metric labels: protocol tag, device address and function code
+        self.labels = (device.protocol, device.address, getattr(message, "function", 0))
+
+"""
+    The TransactionEngine class performs transactions with a deadline per request, derived from the
+    protocol timeout in milliseconds. Deadlines of requests in flight and the delays of pending retries are
+    kept on a single heap, so the engine sleeps exactly until the next of them is due and serves any number
+    of requests in flight, e.g. one on a serial line or several through a gateway.
+
+    A request that is not answered by its deadline, or whose answer fails validation or carries another
+    function code, is retried according to the retry policy. An exception response is final, as the device
+    would answer a retry alike. Every device has a circuit breaker, so a device that keeps failing is skipped for a
+    cooldown period instead of blocking the line for the full timeout in every poll cycle.
+"""
+
+# Heap entry kinds
+DEADLINE = 0
+RETRY = 1
+
+class TransactionEngine:
+
+    def __init__(self, protocol, logger, policy: RetryPolicy = None, threshold: int = 3, cooldown: float = 5.0, max_in_flight: int = 1, lengths=None, callback=None, metrics=None, clock=time.monotonic, sleep=time.sleep):
+        # Setup logger
+        self.logger = logger
+        # Initialize engine fields
+        self.protocol = protocol
+        self.policy = policy if policy is not None else RetryPolicy()
+        self.timeout = max(protocol.timeout, 0) / 1000
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_in_flight = max(max_in_flight, 1)
+        self.lengths = lengths
+        self.callback = callback
+        self.metrics = metrics
+        self.clock = clock
+        self.sleep = sleep
+        self.ready = deque()
+        self.in_flight = set()
+        self.timers = []
+        self.sequence = 0
+        self.breakers = {}
+        # Attempts sent, retried and expired, followed by the final outcomes
+        self.counters = {"sent": 0, "retries": 0, "expired": 0}
+        for outcome in Outcome:
+            self.counters[outcome.value] = 0
+
+    def get_breaker(self, device):
+        """
+        Retrieves the circuit breaker of a device, creating it on first use.
+
+        Args:
+            device (Device): The device object.
+        Returns:
+            CircuitBreaker: The circuit breaker.
+        Raises:
+            None
+        """
+        breaker = self.breakers.get(device.address)
+        if breaker is None:
+            breaker = CircuitBreaker(device.name or str(device.address), self.threshold, self.cooldown, self.logger)
+            self.breakers[device.address] = breaker
+        return breaker
+
+    def submit(self, message, device, first: bool = False):
+        """
+        Queues a transaction for a message, performed by the next run.
+
+        Args:
+            message (Message): The message object.
+            device (Device): The device object.
+            first (bool): Whether the transaction is queued ahead of those already queued, e.g. a write.
+        Returns:
+            Transaction: The queued transaction.
+        Raises:
+            None
+        """
+        transaction = Transaction(message, device)
+        if first:
+            self.ready.appendleft(transaction)
+        else:
+            self.ready.append(transaction)
+        return transaction
+
+    def run(self):
+        """
+        Performs the queued transactions, until every transaction succeeded or finally failed. The pending
+        writes of the protocol are queued ahead as soon as they are due, checked between transactions.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        while self.ready or self.in_flight or self.timers:
+            now = self.clock()
+            self.expire(now)
+            while self.ready and len(self.in_flight) < self.max_in_flight:
+                self.submit_writes()
+                self.dispatch(self.ready.popleft(), self.clock())
+            if self.ready and len(self.in_flight) < self.max_in_flight:
+                continue
+            if self.timers:
+                delay = self.timers[0][0] - self.clock()
+                if delay > 0:
+                    self.sleep(delay)
+
+    def submit_writes(self):
+        """
+        Queues the pending writes of the protocol ahead of the other transactions, if they are due.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        writes = self.protocol.writes
+        if writes is None or not writes.is_due():
+            return
+        try:
+            writes.submit()
+        except ValueError as e:
+            self.logger.error("TransactionEngine: unable to queue the pending writes: %s", e)
+
+    def expire(self, now: float):
+        """
+        Handles every deadline and retry delay that is due.
+
+        Args:
+            now (float): The current time in seconds.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        timers = self.timers
+        while timers and timers[0][0] <= now:
+            due, _, kind, transaction = heapq.heappop(timers)
+            if kind == RETRY:
+                self.ready.append(transaction)
+            elif transaction in self.in_flight and transaction.deadline == due:
+                # Deadlines of answered requests are discarded here rather than removed from the heap
+                self.in_flight.discard(transaction)
+                self.counters["expired"] += 1
+                self.logger.warning("TransactionEngine: timeout for message: %s", transaction.message.name)
+                if self.metrics is not None:
+                    self.metrics.record_failure(transaction.labels, Outcome.TIMEOUT)
+                self.fail(transaction, Outcome.TIMEOUT, now)
+
+    def dispatch(self, transaction: Transaction, now: float):
+        """
+        Transmits a transaction, unless the circuit breaker of its device is open.
+
+        Args:
+            transaction (Transaction): The transaction.
+            now (float): The current time in seconds.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        if not self.get_breaker(transaction.device).allow(now):
+            if self.metrics is not None:
+                self.metrics.record_failure(transaction.labels, Outcome.SKIPPED)
+            self.finish(transaction, Outcome.SKIPPED)
+            return
+        prototype = protocol.get_prototype(transaction.message.name)
+        if prototype is None:
+            self.logger.error("TransactionEngine: unable to find prototype for message: %s", transaction.message.name)
+            self.finish(transaction, Outcome.FAILED)
+            return
+        try:
+            tx = protocol.get_transmit_message(prototype, transaction.message, transaction.device)
+            protocol.simulation.simulate_transmit(tx)
+            rx = protocol.get_received_message(prototype, transaction.message, transaction.device)
+        except ValueError as e:
+            self.logger.error("TransactionEngine: unable to transmit message %s: %s", transaction.message.name, e)
+            self.finish(transaction, Outcome.FAILED)
+            return
+        transaction.attempts += 1
+        self.counters["sent"] += 1
+        if self.metrics is not None:
+            self.metrics.record_sent(transaction.labels, len(tx))
+        transaction.sent = now
+        transaction.deadline = now + self.timeout
+        self.in_flight.add(transaction)
+        if rx is not None:
+            self.complete(transaction, rx)
+        else:
+            self.schedule(transaction.deadline, DEADLINE, transaction)
+
+    def complete(self, transaction: Transaction, rx: bytearray):
+        """
+        Handles the message received for a transaction in flight. Messages arriving after the deadline
+        of the transaction are discarded.
+
+        Args:
+            transaction (Transaction): The transaction.
+            rx (bytearray): The received message.
+        Returns:
+            bool: True if the received message is valid, False otherwise.
+        Raises:
+            None
+        """
+        protocol = self.protocol
+        metrics = self.metrics
+        if transaction not in self.in_flight:
+            self.logger.debug("TransactionEngine: discarding late message for: %s", transaction.message.name)
+            return False
+        self.in_flight.discard(transaction)
+        protocol.simulation.simulate_receive(rx)
+        if not self.is_expected_length(transaction, rx):
+            self.logger.warning("TransactionEngine: unexpected length %d for message: %s", len(rx), transaction.message.name)
+            if metrics is not None:
+                metrics.record_failure(transaction.labels, Outcome.INVALID, len(rx))
+            self.fail(transaction, Outcome.INVALID, self.clock())
+            return False
+        if protocol.checksum.validate_checksum_in_message(rx, protocol.suffix, protocol.prefix):
+            function = self.get_function(transaction, rx)
+            if function is not None and function & EXCEPTION_FLAG:
+                # The device answered, so its breaker is left as it is, and a retry would be rejected alike
+                self.logger.warning("TransactionEngine: exception response for message: %s", transaction.message.name)
+                if metrics is not None:
+                    metrics.record_failure(transaction.labels, Outcome.EXCEPTION, len(rx))
+                self.finish(transaction, Outcome.EXCEPTION)
+                return False
+            if function is not None and function != getattr(transaction.message, "function", function):
+                self.logger.warning("TransactionEngine: unexpected function %d for message: %s", function, transaction.message.name)
+                if metrics is not None:
+                    metrics.record_failure(transaction.labels, Outcome.INVALID, len(rx))
+                self.fail(transaction, Outcome.INVALID, self.clock())
+                return False
+            transaction.received = rx
+            breaker = self.get_breaker(transaction.device)
+            if metrics is not None:
+                metrics.record_received(transaction.labels, len(rx), self.clock() - transaction.sent)
+                if breaker.open_until is not None:
+                    metrics.set_breaker(transaction.device.protocol, transaction.device.address, False)
+            breaker.record_success()
+            self.finish(transaction, Outcome.SUCCESS)
+            return True
+        self.logger.warning("TransactionEngine: message validation failed for message: %s", transaction.message.name)
+        if metrics is not None:
+            metrics.record_failure(transaction.labels, Outcome.INVALID, len(rx))
+        self.fail(transaction, Outcome.INVALID, self.clock())
+        return False
+
+    def is_expected_length(self, transaction: Transaction, rx: bytearray):
+        """
+        Checks the length of a received message against the response length index, if one is set.
+
+        Args:
+            transaction (Transaction): The transaction.
+            rx (bytearray): The received message.
+        Returns:
+            bool: True if the length is as expected or unknown, False otherwise.
+        Raises:
+            None
+        """
+        if self.lengths is None:
+            return True
+        length = self.lengths.get(transaction.message, transaction.device)
+        if length is None:
+            return True
+        try:
+            return len(rx) == length.resolve(rx, self.protocol.conversion.mode)
+        except ValueError:
+            return False
+
+    def get_function(self, transaction: Transaction, rx: bytearray):
+        """
+        Retrieves the function code of a received message, where the response length index tells where it is.
+
+        Args:
+            transaction (Transaction): The transaction.
+            rx (bytearray): The received message.
+        Returns:
+            int: The function code, with the exception flag set for an exception response, or None if unknown.
+        Raises:
+            None
+        """
+        if self.lengths is None:
+            return None
+        length = self.lengths.get(transaction.message, transaction.device)
+        if length is None:
+            return None
+        try:
+            return length.get_function(rx, self.protocol.conversion.mode)
+        except ValueError:
+            return None
+
+    def fail(self, transaction: Transaction, outcome: Outcome, now: float):
+        """
+        Handles a failed attempt, scheduling a retry if the policy allows another attempt. The circuit breaker
+        counts the transaction once it finally failed, not each attempt.
+
+        Args:
+            transaction (Transaction): The transaction.
+            outcome (Outcome): The outcome of the attempt.
+            now (float): The current time in seconds.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        delay = self.policy.get_delay(transaction.attempts)
+        if delay is None:
+            self.finish(transaction, outcome)
+            return
+        self.counters["retries"] += 1
+        self.schedule(now + delay, RETRY, transaction)
+
+    def finish(self, transaction: Transaction, outcome: Outcome):
+        """
+        Records the final outcome of a transaction.
+
+        Args:
+            transaction (Transaction): The transaction.
+            outcome (Outcome): The final outcome.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        transaction.outcome = outcome
+        self.counters[outcome.value] += 1
+        if outcome == Outcome.TIMEOUT or outcome == Outcome.INVALID:
+            # Counted once per transaction, however many attempts it took
+            breaker = self.get_breaker(transaction.device)
+            breaker.record_failure(self.clock())
+            if self.metrics is not None:
+                self.metrics.set_breaker(transaction.device.protocol, transaction.device.address, breaker.open_until is not None)
+        if self.callback is not None:
+            self.callback(transaction)
+
+    def schedule(self, due: float, kind: int, transaction: Transaction):
+        """
+        Adds a deadline or retry delay to the heap.
+
+        Args:
+            due (float): The time the entry is due, in seconds.
+            kind (int): The entry kind, DEADLINE or RETRY.
+            transaction (Transaction): The transaction.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        # The sequence number orders entries due at the same time without comparing transactions
+        self.sequence += 1
+        heapq.heappush(self.timers, (due, self.sequence, kind, transaction))
+
+    def log(self):
+        """
+        Outputs the transaction counters.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.logger.info("TransactionEngine: %s", ", ".join(f"{name}={count}" for name, count in self.counters.items()))
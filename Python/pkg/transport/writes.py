@@ -0,0 +1,287 @@
+"""
+    Package 'transport' provides mechanism's for the transmission and reception of protocol data.
+"""
+
+import threading
+import time
+from constants import Outcome, Space
+from pkg.component.message import DataType, Message
+
+# Largest quantities a single write multiple coils (fc15) or registers (fc16) request may carry
+MAX_COILS = 1968
+MAX_REGISTERS = 123
+
+# Output value switching a coil on, in a write single coil (fc05) request
+COIL_ON = 0xFF00
+
+"""
+    Objects of class WriteQueue collect coil and holding register writes, e.g. the setpoints of a control
+    layer, and perform them in as few requests as possible. Repeated writes to the same coil or register
+    collapse to the last value written, and pending writes to contiguous addresses of a device are merged into
+    a single write multiple coils (fc15) or registers (fc16) request. A lone write is sent as a write single
+    coil (fc05) or register (fc06) request, if the protocol defines one.
+
+    Writes may be queued from any thread. They are flushed by the thread polling the protocol once max_pending
+    distinct addresses are pending or the oldest write waited max_delay seconds, checked between transactions,
+    so the write requests are sent ahead of the polls still to come in the cycle.
+"""
+
+class WriteQueue:
+
+    def __init__(self, protocol, logger, max_pending: int = 256, max_delay: float = 0.05, clock=time.monotonic):
+        # Setup logger
+        self.logger = logger
+        # Initialize queue fields
+        self.protocol = protocol
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self.clock = clock
+        self.pending = {}
+        self.count = 0
+        self.oldest = None
+        self.lock = threading.Lock()
+        self.transactions = []
+        self.counters = {"writes": 0, "collapsed": 0, "requests": 0, "rejected": 0, "failed": 0}
+
+    def write_register(self, device, address: int, value: int):
+        """
+        Queues a holding register write.
+
+        Args:
+            device (Device): The device object.
+            address (int): The register address.
+            value (int): The register value, 16 bits.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.write(device, Space.HOLDING_REGISTERS, address, value & 0xFFFF)
+
+    def write_coil(self, device, address: int, value: bool):
+        """
+        Queues a coil write.
+
+        Args:
+            device (Device): The device object.
+            address (int): The coil address.
+            value (bool): The coil state.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.write(device, Space.COILS, address, 1 if value else 0)
+
+    def write(self, device, space: Space, address: int, value: int):
+        """
+        Queues a write, replacing any pending write to the same address.
+
+        Args:
+            device (Device): The device object.
+            space (Space): The space, COILS or HOLDING_REGISTERS.
+            address (int): The address.
+            value (int): The value.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        with self.lock:
+            values = self.pending.setdefault((device, space), {})
+            if address in values:
+                self.counters["collapsed"] += 1
+            else:
+                self.count += 1
+            values[address] = value
+            self.counters["writes"] += 1
+            if self.oldest is None:
+                self.oldest = self.clock()
+
+    def is_due(self):
+        """
+        Checks whether the pending writes reached the size or time threshold.
+
+        Args:
+            None
+        Returns:
+            bool: True if the pending writes are to be flushed, False otherwise.
+        Raises:
+            None
+        """
+        with self.lock:
+            if self.oldest is None:
+                return False
+            return self.count >= self.max_pending or self.clock() - self.oldest >= self.max_delay
+
+    def take(self):
+        """
+        Removes every pending write.
+
+        Args:
+            None
+        Returns:
+            dict: The pending values by address, by device and space.
+        Raises:
+            None
+        """
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            self.count = 0
+            self.oldest = None
+        return pending
+
+    def flush(self):
+        """
+        Performs every pending write, through the transaction engine of the protocol if one is set.
+
+        Args:
+            None
+        Returns:
+            list[Transaction]: The finished transactions, empty without a transaction engine.
+        Raises:
+            ValueError: If the protocol defines no prototype for the writes.
+        """
+        protocol = self.protocol
+        if protocol.engine is None:
+            messages = self.get_messages(self.take())
+            self.counters["requests"] += len(messages)
+            for message, device in messages:
+                protocol.transact(message, device)
+            return []
+        transactions = self.submit()
+        protocol.engine.run()
+        self.tally()
+        return transactions
+
+    def submit(self):
+        """
+        Queues every pending write on the transaction engine of the protocol, ahead of the transactions
+        already queued, without performing them.
+
+        Args:
+            None
+        Returns:
+            list[Transaction]: The queued transactions.
+        Raises:
+            ValueError: If the protocol defines no prototype for the writes.
+        """
+        messages = self.get_messages(self.take())
+        self.counters["requests"] += len(messages)
+        engine = self.protocol.engine
+        # Queued first in reverse, keeping the order of the writes
+        transactions = [engine.submit(message, device, first=True) for message, device in reversed(messages)]
+        transactions.reverse()
+        self.transactions.extend(transactions)
+        return transactions
+
+    def tally(self):
+        """
+        Counts the writes finished since the last tally that a device rejected or that failed.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        unfinished = []
+        for transaction in self.transactions:
+            if transaction.outcome is None:
+                unfinished.append(transaction)
+            elif transaction.outcome == Outcome.EXCEPTION:
+                self.counters["rejected"] += 1
+                self.logger.warning("WriteQueue: device %s rejected the write at %d", transaction.device.name, transaction.message.starting_address)
+            elif transaction.outcome != Outcome.SUCCESS:
+                self.counters["failed"] += 1
+        self.transactions = unfinished
+
+    def get_messages(self, pending: dict):
+        """
+        Merges pending writes to contiguous addresses into write requests.
+
+        Args:
+            pending (dict): The pending values by address, by device and space.
+        Returns:
+            list[tuple[Message, Device]]: The write request of each run of addresses, and its device.
+        Raises:
+            ValueError: If the protocol defines no prototype for the writes.
+        """
+        messages = []
+        for (device, space), values in pending.items():
+            limit = MAX_COILS if space == Space.COILS else MAX_REGISTERS
+            run = []
+            for address in sorted(values):
+                if run and (address != run[-1] + 1 or len(run) == limit):
+                    messages.append((self.get_message(space, run, values), device))
+                    run = []
+                run.append(address)
+            if run:
+                messages.append((self.get_message(space, run, values), device))
+        return messages
+
+    def get_message(self, space: Space, run: list, values: dict):
+        """
+        Builds the write request of a run of contiguous addresses.
+
+        Args:
+            space (Space): The space, COILS or HOLDING_REGISTERS.
+            run (list[int]): The addresses, in increasing order.
+            values (dict): The values by address.
+        Returns:
+            Message: The write request.
+        Raises:
+            ValueError: If the protocol defines no prototype for the write.
+        """
+        coils = space == Space.COILS
+        single, multiple = (5, 15) if coils else (6, 16)
+        start = run[0]
+        if len(run) == 1 and self.get_prototype_name(single) is not None:
+            value = values[start]
+            if coils:
+                value = COIL_ON if value else 0
+            return Message({"name": self.get_prototype_name(single), "function": single, "starting_address": start, "value": value}, self.logger)
+        name = self.get_prototype_name(multiple)
+        if name is None:
+            raise ValueError(f"WriteQueue: no prototype for function code {multiple}")
+        if coils:
+            # Coils are packed least significant bit first
+            data = bytearray((len(run) + 7) // 8)
+            for index, address in enumerate(run):
+                if values[address]:
+                    data[index >> 3] |= 1 << (index & 7)
+            data_type = DataType.BIT.value
+        else:
+            data = b"".join(values[address].to_bytes(2, "big") for address in run)
+            data_type = DataType.INT16.value
+        return Message({"name": name, "function": multiple, "starting_address": start, "length": len(run), "data_type": data_type, "data": bytes(data)}, self.logger)
+
+    def get_prototype_name(self, function: int):
+        """
+        Retrieves the name of the prototype of a write function code, such as fc16.
+
+        Args:
+            function (int): The function code.
+        Returns:
+            str: The prototype name, or None if the protocol defines no such prototype.
+        Raises:
+            None
+        """
+        name = f"fc{function:02d}"
+        return name if self.protocol.get_prototype(name) is not None else None
+
+    def log(self):
+        """
+        Outputs the queue counters.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.tally()
+        self.logger.info("WriteQueue: %s", ", ".join(f"{name}={count}" for name, count in self.counters.items()))
@@ -0,0 +1,96 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from pkg.component.length import ResponseLengthIndex
+from pkg.component.protocol import Protocol
+from pkg.transport.link import LinkModel, CapacityPlanner
+
+"""
+    DONP bus capacity planner, timing the polls of a protocol file on a serial line of the given baud
+    rate, character framing and device turnaround time. The report gives the time of every transaction,
+    the achievable poll rate and the line utilisation of the schedule, and how many devices fit on the
+    line before deploying.
+
+        Copyright (c) 2025 Kathy Snell, All rights reserved.
+
+"""
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def parse_args(argv: list[str]):
+    """
+    Parses the planner command line.
+
+    Args:
+        argv (list[str]): The command line arguments.
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    Raises:
+        SystemExit: If the arguments are invalid.
+    """
+    parser = argparse.ArgumentParser(description="DONP bus capacity planner")
+    parser.add_argument("protocol", nargs="?", default=os.path.join(ROOT, "modbusRtu.json"), help="protocol JSON file to plan, defaults to the Modbus RTU file")
+    parser.add_argument("--baud", type=int, default=9600, help="baud rate of the line (default 9600)")
+    parser.add_argument("--data-bits", type=int, help="data bits per character, defaults to 8 in hex and 7 in ascii mode")
+    parser.add_argument("--parity", choices=["N", "E", "O"], default="E", help="parity of the characters (default E)")
+    parser.add_argument("--stop-bits", type=int, default=1, help="stop bits per character (default 1)")
+    parser.add_argument("--turnaround", type=float, default=0.0, metavar="MS", help="milliseconds a device takes to answer (default 0)")
+    parser.add_argument("--device-turnaround", action="append", default=[], metavar="ADDRESS=MS", help="turnaround of the device at an address, may be repeated")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between polls of messages without an interval field (default 1)")
+    parser.add_argument("--target", type=float, default=0.8, help="line utilisation devices are fitted to, leaving the rest for retries (default 0.8)")
+    parser.add_argument("--output", default="plan.json", help="report file")
+    return parser.parse_args(argv)
+
+def parse_turnarounds(values: list[str]):
+    """
+    Parses the device turnaround times given on the command line.
+
+    Args:
+        values (list[str]): The ADDRESS=MS values.
+    Returns:
+        dict: The turnaround in seconds by device address.
+    Raises:
+        ValueError: If a value is malformed.
+    """
+    turnarounds = {}
+    for value in values:
+        try:
+            address, milliseconds = value.split("=")
+            turnarounds[int(address, 0)] = float(milliseconds) / 1000
+        except ValueError:
+            raise ValueError(f"Planner: malformed device turnaround {value}, expected address=ms") from None
+    return turnarounds
+
+def main(argv: list[str]):
+    """
+    Plans the protocol file and writes the report.
+
+    Args:
+        argv (list[str]): The command line arguments.
+    Returns:
+        int: The exit status, 1 if the schedule cannot be kept or the plan failed, 0 otherwise.
+    Raises:
+        None
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    logger = logging.getLogger("plan")
+    try:
+        with open(args.protocol, "r", encoding="utf-8") as f:
+            protocol = Protocol(json.load(f))
+        link = LinkModel(protocol.conversion.mode, logger, args.baud, args.data_bits, args.parity, args.stop_bits,
+                         args.turnaround / 1000, parse_turnarounds(args.device_turnaround))
+        planner = CapacityPlanner(protocol, link, ResponseLengthIndex(protocol, logger), logger, args.interval, args.target)
+        report = planner.report()
+    except Exception as e:
+        logger.error("Planner: an exception has occurred: %s", e)
+        return 1
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logger.info("Planner: report written to %s", args.output)
+    return 1 if report["utilisation"] > 1 else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
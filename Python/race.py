@@ -0,0 +1,89 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from pkg.benchmark.runner import Implementation, Runner
+
+"""
+    DONP cross-language benchmark runner, invoking each already built implementation repeatedly after
+    warm-up runs with the same protocol file and seed. Wall, user and system time and peak resident
+    memory are reported as medians with confidence intervals, and the frames emitted by every
+    implementation are checked to be identical.
+
+        Copyright (c) 2025 Kathy Snell, All rights reserved.
+
+"""
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+IMPLEMENTATIONS = [
+    # Snapshots would be written next to the protocol file in the first run and only loaded by the timed runs
+    Implementation("Python", os.path.join(ROOT, "Python"), [sys.executable, "donp.py"], seeded=True, arguments=["--no-snapshot"]),
+    Implementation("Go", os.path.join(ROOT, "Go"), ["./donp"], active=os.path.join(ROOT, "modbusRtu.json")),
+    Implementation("Rust", os.path.join(ROOT, "Rust"), ["./target/release/Rust"], active=os.path.join(ROOT, "modbusRtu.json")),
+    Implementation("C++", os.path.join(ROOT, "C++"), ["./donp"], active=os.path.join(ROOT, "modbusRtu.json")),
+]
+
+def parse_args(argv: list[str]):
+    """
+    Parses the runner command line.
+
+    Args:
+        argv (list[str]): The command line arguments.
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    Raises:
+        SystemExit: If the arguments are invalid.
+    """
+    parser = argparse.ArgumentParser(description="DONP cross-language benchmark runner")
+    parser.add_argument("--protocol", default=os.path.join(ROOT, "modbusRtu.json"), help="protocol file read by every implementation")
+    parser.add_argument("--seed", type=int, default=0, help="seed for reproducible simulated data")
+    parser.add_argument("--warmup", type=int, default=1, help="warm-up runs per implementation")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per implementation")
+    parser.add_argument("--confidence", type=float, default=0.95, help="confidence level of the median interval")
+    parser.add_argument("--only", nargs="*", help="implementations to run, by name")
+    parser.add_argument("--output", default="race.json", help="results file")
+    return parser.parse_args(argv)
+
+def main(argv: list[str]):
+    """
+    Runs the implementations and reports the summary, ordered by median wall time.
+
+    Args:
+        argv (list[str]): The command line arguments.
+    Returns:
+        int: The exit status, 1 if the implementations emitted different frames, 0 otherwise.
+    Raises:
+        None
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    logger = logging.getLogger("race")
+    implementations = [i for i in IMPLEMENTATIONS if args.only is None or i.name in args.only]
+    runner = Runner(implementations, args.protocol, args.seed, logger, warmup=args.warmup, repeat=args.repeat, confidence=args.confidence)
+    try:
+        results = runner.run()
+    except (RuntimeError, OSError) as e:
+        logger.error("Race: %s", e)
+        return 1
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    ranking = sorted(results["implementations"].items(), key=lambda item: item[1]["summary"]["wall"]["median"])
+    for place, (name, result) in enumerate(ranking, start=1):
+        wall = result["summary"]["wall"]
+        rss = result["summary"]["max_rss_kb"]["median"]
+        logger.info("Race: %d. %s wall median=%.6f s [%.6f, %.6f] user=%.6f s sys=%.6f s max RSS=%d KB", place, name,
+                    wall["median"], wall["low"], wall["high"], result["summary"]["user"]["median"], result["summary"]["sys"]["median"], rss)
+    if results["excluded"]:
+        logger.warning("Race: %s not run, they only read their active protocol file", ", ".join(results["excluded"]))
+    if results["frames"]["rx_unchecked"]:
+        logger.warning("Race: receive frames of %s not compared, they ignore the seed", ", ".join(results["frames"]["rx_unchecked"]))
+    logger.info("Race: %s frames compared", " and ".join(results["frames"]["directions"]))
+    if not results["frames"]["identical"]:
+        logger.error("Race: implementations emitted different frames, results are not comparable")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))